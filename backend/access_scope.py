@@ -0,0 +1,115 @@
+"""
+Access Scope
+Which plans a user may see: company, regions, groups and (Amare Toshkent)
+districts. The same rules filter the doctor list query and decide which live
+events reach a user's dashboard, so the two can never disagree.
+"""
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Query
+
+from .models import MasterPlan, User
+
+# Toshkent City district split for Amare VITA1/FORTE1 and VITA2/FORTE2
+# Matched as substrings to handle variations like "Келес шаҳри", "Назарбек шаҳарча", etc.
+DISTRICTS_1 = ('Бектемир', 'Қибрай', 'Мирзо Улуғбек', 'Миробод', 'Сирғали', 'Юнусобод', 'Янгиҳаёт', 'Яшнобод')
+DISTRICTS_2 = ('Олмазор', 'Келес', 'Назарбек', 'Учтепа', 'Чилонзор', 'Шайхонтохур', 'Эшонгузар', 'Яккасарой')
+
+# Synergy combined group access -> the groups it covers
+SYNERGY_GROUPS = {
+    'AB': ('A', 'B', 'AB'),
+    'A2C': ('A2', 'C', 'A2C'),
+    'A2CB2': ('A2', 'C', 'A2C', 'B2'),
+    'B2': ('B2',),
+}
+
+# Amare group access -> (groups, districts or None)
+AMARE_GROUPS = {
+    'ALL': (('VITA', 'FORTE'), None),
+    'VITA': (('VITA',), None),
+    'FORTE': (('FORTE',), None),
+    'VITA1': (('VITA',), DISTRICTS_1),
+    'VITA2': (('VITA',), DISTRICTS_2),
+    'FORTE1': (('FORTE',), DISTRICTS_1),
+    'FORTE2': (('FORTE',), DISTRICTS_2),
+}
+
+# Companies without groups: managers see everything in their regions
+REGION_ONLY_COMPANIES = ('Galassiya', 'Perfetto')
+
+
+@dataclass(frozen=True)
+class PlanScope:
+    """None means "no restriction" for that dimension"""
+    company: Optional[str] = None
+    regions: Optional[Tuple[str, ...]] = None
+    groups: Optional[Tuple[str, ...]] = None
+    districts: Optional[Tuple[str, ...]] = None
+
+    def apply(self, query: Query, model=MasterPlan) -> Query:
+        """Filter a query on `model` (MasterPlan, or anything with the same scope columns)"""
+        if self.company is not None:
+            query = query.filter(model.company == self.company)
+        if self.regions is not None:
+            if len(self.regions) == 1:
+                query = query.filter(model.region == self.regions[0])
+            else:
+                query = query.filter(model.region.in_(self.regions))
+        if self.groups is not None:
+            if len(self.groups) == 1:
+                query = query.filter(model.group_name == self.groups[0])
+            else:
+                query = query.filter(model.group_name.in_(self.groups))
+        if self.districts is not None:
+            query = query.filter(or_(*[model.district.like(f'%{d}%') for d in self.districts]))
+        return query
+
+    def allows(self, company: str, region: Optional[str] = None, group_name: Optional[str] = None,
+               district: Optional[str] = None) -> bool:
+        """
+        Python twin of apply() for a single plan. Company-wide notices (region None)
+        only check the company.
+        """
+        if self.company is not None and company != self.company:
+            return False
+        if region is None:
+            return True
+        if self.regions is not None and region not in self.regions:
+            return False
+        if self.groups is not None and group_name not in self.groups:
+            return False
+        if self.districts is not None and not any(d in (district or '') for d in self.districts):
+            return False
+        return True
+
+
+def manager_scope(user: User) -> PlanScope:
+    """Plans a manager is assigned, based on company, region(s) and group_access"""
+    # Handle multi-region access (comma-separated regions)
+    regions = tuple(r.strip() for r in user.region.split(',')) if user.region else None
+    access = user.group_access
+
+    if user.company == 'Synergy':
+        # Synergy: A, B, C, A2, B2, AB, A2C, A2CB2 groups
+        groups = None if access == 'ALL' else SYNERGY_GROUPS.get(access, (access,))
+        return PlanScope(user.company, regions, groups)
+
+    if user.company == 'Amare':
+        # Amare: VITA, FORTE groups with district-based Toshkent
+        groups, districts = AMARE_GROUPS.get(access, ((access,), None))
+        return PlanScope(user.company, regions, groups, districts)
+
+    if user.company in REGION_ONLY_COMPANIES:
+        return PlanScope(user.company, regions)
+
+    # Default: exact match for other companies
+    return PlanScope(user.company, regions, None if access == 'ALL' else (access,))
+
+
+def user_scope(user: User, company: Optional[str] = None) -> PlanScope:
+    """Admins see every company (optionally narrowed to one); managers get manager_scope"""
+    if user.role == 'admin':
+        return PlanScope(company)
+    return manager_scope(user)
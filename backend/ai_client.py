@@ -0,0 +1,372 @@
+"""
+Gemini AI Client
+Shared access to the Gemini model with rate limiting, bounded concurrency,
+retries with backoff, per-call timeouts and a circuit breaker
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+import google.generativeai as genai
+
+
+# HTTP statuses worth retrying (rate limited / upstream trouble)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class AIClientError(Exception):
+    """Model call failed. `status` is the upstream HTTP status when known."""
+
+    def __init__(self, message: str, status: Optional[int] = None,
+                 retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class AIUnavailableError(AIClientError):
+    """Circuit breaker is open and the call could not wait for recovery"""
+
+
+# ==================== RATE LIMITING ====================
+
+class TokenBucket:
+    """Token-bucket rate limiter (`rate` tokens per second, bursts up to `capacity`)"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it"""
+        if self.rate <= 0:
+            return  # Rate limiting disabled
+        while True:
+            self._refill()
+            # No await between the check and the decrement, so this is safe on one event loop
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# ==================== CIRCUIT BREAKER ====================
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker.
+    Opens after `failure_threshold` consecutive failures, lets a single trial call
+    through once `reset_timeout` seconds have passed, and closes again on success.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = self.CLOSED
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker will allow a trial call"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self) -> None:
+        """Hand the half-open trial back without a verdict (the trial call was cancelled)"""
+        if self._state == self.HALF_OPEN:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._state = self.CLOSED
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+# ==================== TRANSPORTS ====================
+
+class GenaiTransport:
+    """Calls Gemini through the google-generativeai SDK (uses genai.configure credentials)"""
+
+    def __init__(self):
+        self._models: Dict[Any, Any] = {}
+
+    def _model(self, model_name: str, system_instruction: Optional[str]):
+        # One model object per (model, static instruction) pair, reused across requests
+        key = (model_name, system_instruction)
+        if key not in self._models:
+            self._models[key] = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        return self._models[key]
+
+    async def __call__(self, model_name: str, parts: List[Any], timeout: float,
+                       system_instruction: Optional[str] = None) -> str:
+        try:
+            response = await self._model(model_name, system_instruction).generate_content_async(
+                parts, request_options={"timeout": timeout}
+            )
+        except Exception as e:
+            code = getattr(e, "code", None)
+            status = code if isinstance(code, int) else None
+            # No HTTP status: connection / transport failure - transient, like RestTransport's URLError
+            raise AIClientError(str(e), status=status, retryable=status is None or status in RETRYABLE_STATUS)
+        try:
+            return response.text
+        except ValueError as e:
+            # Blocked or empty candidate: asking again gets the same answer
+            raise AIClientError(f"No text in response: {e}")
+
+
+class RestTransport:
+    """
+    Calls the Gemini REST API (`:generateContent`) directly.
+    Pointing `base_url` at a local fake server (see fake_gemini.py) makes the
+    whole client testable offline.
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key or ""
+
+    @staticmethod
+    def _to_rest_part(part: Any) -> Dict[str, Any]:
+        if isinstance(part, dict) and "data" in part:
+            return {"inline_data": {"mime_type": part.get("mime_type", "image/jpeg"), "data": part["data"]}}
+        return {"text": str(part)}
+
+    def _post(self, model_name: str, parts: List[Any], timeout: float,
+              system_instruction: Optional[str] = None) -> str:
+        url = f"{self.base_url}/v1beta/models/{model_name}:generateContent?key={self.api_key}"
+        payload = {"contents": [{"role": "user", "parts": [self._to_rest_part(p) for p in parts]}]}
+        if system_instruction:
+            payload["system_instruction"] = {"parts": [{"text": system_instruction}]}
+        body = json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as resp:
+                payload = json.loads(resp.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            retry_after = e.headers.get("Retry-After") if e.headers else None
+            raise AIClientError(
+                f"HTTP {e.code}: {e.reason}",
+                status=e.code,
+                retryable=e.code in RETRYABLE_STATUS,
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        except (urllib.error.URLError, OSError) as e:
+            # Connection refused / reset / socket timeout - treat as transient
+            raise AIClientError(f"Connection error: {e}", retryable=True)
+
+        try:
+            candidate_parts = payload["candidates"][0]["content"]["parts"]
+            return "".join(p.get("text", "") for p in candidate_parts)
+        except (KeyError, IndexError, TypeError):
+            raise AIClientError(f"Malformed response: {str(payload)[:200]}")
+
+    async def __call__(self, model_name: str, parts: List[Any], timeout: float,
+                       system_instruction: Optional[str] = None) -> str:
+        return await asyncio.to_thread(self._post, model_name, parts, timeout, system_instruction)
+
+
+# ==================== CLIENT ====================
+
+class AIClient:
+    """
+    Rate-limited, fault-tolerant model client. One instance is shared by the whole
+    process (see get_ai_client) so the limits apply globally, not per request.
+    """
+
+    def __init__(
+        self,
+        transport=None,
+        model_name: str = "gemini-2.5-flash",
+        max_concurrency: int = 4,
+        rate_per_second: float = 5.0,
+        burst: int = 10,
+        timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 10.0,
+        breaker: Optional[CircuitBreaker] = None,
+        max_queue: int = 50,
+        queue_timeout: float = 30.0,
+    ):
+        self.transport = transport or GenaiTransport()
+        self.model_name = model_name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.breaker = breaker or CircuitBreaker()
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.queued = 0
+        self.stats = {"calls": 0, "successes": 0, "failures": 0, "retries": 0, "timeouts": 0, "rejected": 0}
+
+    @classmethod
+    def from_env(cls) -> "AIClient":
+        """Build the client from AI_* environment variables"""
+        base_url = os.getenv("GEMINI_API_BASE")
+        transport = RestTransport(base_url, os.getenv("GOOGLE_API_KEY")) if base_url else GenaiTransport()
+        return cls(
+            transport=transport,
+            model_name=os.getenv("AI_MODEL", "gemini-2.5-flash"),
+            max_concurrency=int(os.getenv("AI_MAX_CONCURRENCY", "4")),
+            rate_per_second=float(os.getenv("AI_RATE_PER_SECOND", "5")),
+            burst=int(os.getenv("AI_BURST", "10")),
+            timeout=float(os.getenv("AI_TIMEOUT", "60")),
+            max_retries=int(os.getenv("AI_MAX_RETRIES", "3")),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("AI_BREAKER_THRESHOLD", "5")),
+                reset_timeout=float(os.getenv("AI_BREAKER_RESET", "30")),
+            ),
+            max_queue=int(os.getenv("AI_QUEUE_SIZE", "50")),
+            queue_timeout=float(os.getenv("AI_QUEUE_TIMEOUT", "30")),
+        )
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Exponential backoff with full jitter, never shorter than the server's Retry-After"""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            delay = max(delay, retry_after)
+        return delay
+
+    async def _wait_for_breaker(self) -> None:
+        """
+        Fail fast when the queue of callers waiting on an open breaker is full,
+        otherwise wait (bounded by queue_timeout) for it to let a call through.
+        """
+        if self.breaker.allow():
+            return
+        if self.queued >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise AIUnavailableError("AI service degraded (circuit open, queue full)", status=503)
+
+        self.queued += 1
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            while not self.breaker.allow():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["rejected"] += 1
+                    raise AIUnavailableError("AI service degraded (circuit open)", status=503)
+                await asyncio.sleep(min(max(self.breaker.retry_after(), 0.05), remaining))
+        finally:
+            self.queued -= 1
+
+    async def generate(self, parts: List[Any], model_name: Optional[str] = None,
+                       timeout: Optional[float] = None,
+                       system_instruction: Optional[str] = None) -> str:
+        """
+        Send `parts` (image dicts and prompt strings) to the model and return the response text.
+        `system_instruction` carries static instructions; keeping it identical across calls
+        lets the API reuse the cached prefix instead of re-processing it every time.
+        """
+        model_name = model_name or self.model_name
+        timeout = timeout or self.timeout
+        self.stats["calls"] += 1
+
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_breaker()
+            # No await since allow(): half-open here means this call holds the single trial
+            trial = self.breaker.state == CircuitBreaker.HALF_OPEN
+            try:
+                await self.bucket.acquire()
+                async with self.semaphore:
+                    text = await asyncio.wait_for(
+                        self.transport(model_name, parts, timeout, system_instruction), timeout
+                    )
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                error = AIClientError(f"Model call timed out after {timeout}s", status=504, retryable=True)
+            except AIClientError as e:
+                error = e
+            except BaseException:
+                # Cancelled (hedge loser, client gone) or crashed: says nothing about the
+                # upstream, but a trial that never reports would keep the breaker half-open
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                self.stats["successes"] += 1
+                return text
+
+            if not error.retryable:
+                # Bad request / auth problems say nothing about upstream health either way:
+                # neither reset the failure count nor let them close a half-open breaker
+                if trial:
+                    self.breaker.release_trial()
+                self.stats["failures"] += 1
+                raise error
+
+            self.breaker.record_failure()
+            if attempt == self.max_retries:
+                self.stats["failures"] += 1
+                raise error
+            self.stats["retries"] += 1
+            await asyncio.sleep(self._backoff(attempt, error.retry_after))
+
+        raise AIClientError("Retries exhausted")  # Unreachable
+
+
+def parse_ai_json(response_text: str) -> Dict[str, Any]:
+    """Parse the model's JSON answer, stripping markdown code fences if present"""
+    response_text = response_text.strip()
+    if response_text.startswith('```'):
+        response_text = re.sub(r'^```json?\s*', '', response_text)
+        response_text = re.sub(r'\s*```$', '', response_text)
+    return json.loads(response_text)
+
+
+_client: Optional[AIClient] = None
+
+
+def get_ai_client() -> AIClient:
+    """Process-wide shared client"""
+    global _client
+    if _client is None:
+        _client = AIClient.from_env()
+    return _client
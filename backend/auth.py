@@ -6,7 +6,7 @@ import os
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 import bcrypt
@@ -23,9 +23,13 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480  # 8 hours
+# /events tokens travel in the URL (and so in access logs): short-lived and good for nothing else
+STREAM_TOKEN_SCOPE = "events"
+STREAM_TOKEN_EXPIRE_SECONDS = 60
 
 # OAuth2 scheme for token extraction
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -55,6 +59,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def create_stream_token(user: User) -> str:
+    """Short-lived token that only opens the /events stream"""
+    return create_access_token(
+        data={"sub": user.email, "scope": STREAM_TOKEN_SCOPE},
+        expires_delta=timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    )
+
+
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     """Authenticate a user by email and password"""
     user = db.query(User).filter(User.email == email).first()
@@ -65,20 +77,19 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     return user
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Dependency to get the current authenticated user from JWT token"""
+def user_from_token(token: Optional[str], db: Session, scope: Optional[str] = None) -> User:
+    """Resolve a JWT to its user, or raise 401. `scope` must match the token's (None = full access token)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not token:
+        raise credentials_exception
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
+        if email is None or payload.get("scope") != scope:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
@@ -89,6 +100,29 @@ async def get_current_user(
     return user
 
 
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> User:
+    """Dependency to get the current authenticated user from JWT token"""
+    return user_from_token(token, db)
+
+
+async def get_stream_user(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    access_token: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+) -> User:
+    """
+    Like get_current_user, but also accepts ?access_token= - the browser's
+    EventSource cannot send an Authorization header. In the URL only a stream
+    token (create_stream_token) is accepted, never the full access token.
+    """
+    if token:
+        return user_from_token(token, db)
+    return user_from_token(access_token, db, scope=STREAM_TOKEN_SCOPE)
+
+
 async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
     """Dependency to ensure the current user is an admin"""
     if current_user.role != "admin":
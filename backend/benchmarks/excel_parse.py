@@ -0,0 +1,303 @@
+"""
+Excel Parsing Microbenchmarks
+Times the importer hot path - find_header_row, clean_amount, clean_phone,
+normalize_region and the per-row loop of process_excel_file - over generated
+workbooks (1k / 10k / 100k rows) in both the headed and the headerless
+(COLUMN_MAP_FALLBACK) layouts. Reports rows/sec and peak Python memory.
+
+Usage (from the project root):
+    python -m backend.benchmarks.excel_parse
+    python -m backend.benchmarks.excel_parse --sizes 1000,10000 --save-baseline backend/benchmarks/excel_baseline.json
+    python -m backend.benchmarks.excel_parse --baseline backend/benchmarks/excel_baseline.json   # exit 1 on regression
+    python -m backend.benchmarks.excel_parse --engine columnar --with-db
+    python -m backend.benchmarks.excel_parse --format csv
+
+Rows are parsed into a discarding session so the numbers cover parsing only;
+pass --with-db to include inserts into an in-memory SQLite database.
+
+This is a standalone script, not a pytest(-benchmark) suite - the backend has no
+pytest setup. It plays the same role: --baseline fails (exit 1) when rows/sec or
+cleaner calls/sec fall, or peak memory grows, by more than --tolerance against
+the committed excel_baseline.json.
+"""
+import argparse
+import csv
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from io import BytesIO, StringIO
+from typing import Any, Callable, Dict, List, Tuple
+
+from openpyxl import Workbook, load_workbook
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.services import (
+    clean_amount, clean_phone, find_header_in_rows, find_header_row, normalize_region,
+    import_plan_file, read_csv_rows, read_parquet_rows, IMPORT_ENGINES, PLAN_FORMATS,
+)
+
+HEADERS = ['ФИО', 'Регион', 'Район', 'Сумма', 'Форма', 'Место работы', 'Специальность',
+           'Номер телефона', 'Группа', 'МП']
+
+# Values as they actually arrive in managers' sheets - mixed scripts, spacing and formats.
+# The region list deliberately includes values that miss the direct REGION_MAP lookup.
+RAW_REGIONS = ['НАМАНГАН', 'Ташкент (обл)', 'ТАШКЕНТ (ОБЩ)', 'г.Ташкент', 'Samarqand', 'Сурхандарья',
+               'Farg\'ona viloyati', 'Андижан обл', 'Nukus', 'Бухара', 'Qashqadaryo', 'Chirchiq sh.']
+RAW_AMOUNTS = [500000, 1200000, '1 200 000', '600,000', '3 000 000 сум', 300000.0, '1000000', None]
+RAW_PHONES = ['+998 (90) 123-45-67', '998901234567', '90 123 45 67', 901234567, '+998-93-555-00-11', None]
+NAMES = ['Саидова Нилуфар', 'Karimov Aziz', 'Рахимова Дилноза', 'Tursunov Bobur', 'Юсупова Гулчехра']
+TYPES = ['Card', 'Cash', 'Наличные', 'Dollar', 'Карта']
+
+
+def build_rows(rows: int, headers: bool = True, seed: int = 7) -> List[list]:
+    """Generated plan sheet in the standard 10-column layout"""
+    rng = random.Random(seed)
+    sheet = [HEADERS] if headers else []
+    for _ in range(rows):
+        sheet.append([
+            rng.choice(NAMES),
+            rng.choice(RAW_REGIONS),
+            'Markaz',
+            # Headerless files are detected by a numeric column D in the first row
+            rng.choice(RAW_AMOUNTS) if headers else rng.choice([500000, 1200000, '1 200 000']),
+            rng.choice(TYPES),
+            'QVP',
+            'Терапевт',
+            rng.choice(RAW_PHONES),
+            rng.choice(['A', 'B', 'a2', 'C']),
+            f'RM {rng.randint(1, 40)}',
+        ])
+    return sheet
+
+
+def build_workbook(rows: int, headers: bool = True, seed: int = 7) -> bytes:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for row in build_rows(rows, headers, seed):
+        ws.append(row)
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def build_csv(rows: int, headers: bool = True, seed: int = 7) -> bytes:
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    for row in build_rows(rows, headers, seed):
+        writer.writerow(['' if v is None else v for v in row])
+    return buffer.getvalue().encode('utf-8')
+
+
+def build_parquet(rows: int, headers: bool = True, seed: int = 7) -> bytes:
+    """Parquet always carries column names, so there is no headerless variant"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    sheet = build_rows(rows, True, seed)
+    columns = {name: pa.array([None if r[i] is None else str(r[i]) for r in sheet[1:]], pa.string())
+               for i, name in enumerate(sheet[0])}
+    buffer = BytesIO()
+    pq.write_table(pa.table(columns), buffer)
+    return buffer.getvalue()
+
+
+BUILDERS = {'xlsx': build_workbook, 'csv': build_csv, 'parquet': build_parquet}
+
+
+class DiscardSession:
+    """Session stand-in that drops rows, so process_excel_file is measured without the DB"""
+
+    def __init__(self):
+        self.added = 0
+
+    def add(self, instance) -> None:
+        self.added += 1
+
+    def execute(self, statement, params=None) -> None:
+        # Columnar engine bulk insert
+        self.added += len(params or [])
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+
+# ==================== MEASUREMENT ====================
+
+def measure(func: Callable[[], Any], repeat: int) -> Tuple[float, int]:
+    """(best wall time in seconds, peak traced bytes). Memory is traced in a separate run."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def bench_cleaners(calls: int, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """Per-call cost of the cell cleaners over the raw value corpora"""
+    cases = {
+        "clean_amount": (clean_amount, RAW_AMOUNTS),
+        "clean_phone": (clean_phone, RAW_PHONES),
+        "normalize_region": (normalize_region, RAW_REGIONS),
+    }
+    results = {}
+    for name, (func, values) in cases.items():
+        corpus = (values * (calls // len(values) + 1))[:calls]
+        seconds, peak = measure(lambda: [func(v) for v in corpus], repeat)
+        results[name] = {
+            "calls": calls,
+            "seconds": round(seconds, 4),
+            "calls_per_sec": round(calls / seconds),
+            "peak_kb": round(peak / 1024, 1),
+        }
+    return results
+
+
+def bench_workbook(rows: int, headers: bool, repeat: int, with_db: bool, engine: str = 'row',
+                   file_format: str = 'xlsx') -> Dict[str, Any]:
+    content = BUILDERS[file_format](rows, headers)
+    layout = "header" if headers else "headerless"
+
+    if file_format == 'xlsx':
+        ws = load_workbook(filename=BytesIO(content), data_only=True).active
+        detect = lambda: find_header_row(ws)
+    else:
+        first_rows = (read_csv_rows if file_format == 'csv' else read_parquet_rows)(content)[:10]
+        detect = lambda: find_header_in_rows(first_rows)
+    header_seconds, _ = measure(detect, repeat)
+    header_row, col_map = detect()
+    expected_layout = "headerless" if header_row == 0 else "header"
+    if expected_layout != layout:
+        raise RuntimeError(f"{layout} workbook was detected as {expected_layout}")
+
+    if with_db:
+        db_engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=db_engine)
+        make_session = sessionmaker(bind=db_engine)
+    else:
+        make_session = DiscardSession
+
+    def run():
+        db = make_session()
+        result = import_plan_file(content, "Synergy", db, month=12, engine=engine,
+                                  filename=f"plan.{file_format}")
+        if with_db:
+            db.close()
+        if not result["success"] or result["inserted_count"] != rows:
+            raise RuntimeError(f"Import failed: {result['inserted_count']} rows, {result['errors'][:3]}")
+
+    seconds, peak = measure(run, repeat)
+    return {
+        "rows": rows,
+        "layout": layout,
+        "find_header_row_ms": round(header_seconds * 1000, 3),
+        "seconds": round(seconds, 4),
+        "rows_per_sec": round(rows / seconds),
+        "peak_mb": round(peak / (1024 * 1024), 2),
+        "file_kb": round(len(content) / 1024, 1),
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions: throughput lower or peak memory higher than baseline by more than `tolerance`"""
+    regressions = []
+    for key, base in baseline.get("workbooks", {}).items():
+        current = results["workbooks"].get(key)
+        if not current:
+            continue
+        if current["rows_per_sec"] < base["rows_per_sec"] * (1 - tolerance):
+            regressions.append(f"{key}: {current['rows_per_sec']} rows/s vs baseline {base['rows_per_sec']}")
+        if current["peak_mb"] > base["peak_mb"] * (1 + tolerance):
+            regressions.append(f"{key}: peak {current['peak_mb']} MB vs baseline {base['peak_mb']} MB")
+    for name, base in baseline.get("cleaners", {}).items():
+        current = results["cleaners"].get(name)
+        if current and current["calls_per_sec"] < base["calls_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: {current['calls_per_sec']} calls/s vs baseline {base['calls_per_sec']}")
+    return regressions
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    print(f"\n{'function':<20}{'calls':>10}{'calls/s':>14}{'peak KB':>10}")
+    print("-" * 54)
+    for name, r in results["cleaners"].items():
+        print(f"{name:<20}{r['calls']:>10}{r['calls_per_sec']:>14,}{r['peak_kb']:>10}")
+
+    print(f"\n{'workbook':<22}{'header ms':>11}{'parse s':>10}{'rows/s':>11}{'peak MB':>10}{'file KB':>10}")
+    print("-" * 74)
+    for key, r in results["workbooks"].items():
+        print(f"{key:<22}{r['find_header_row_ms']:>11}{r['seconds']:>10}{r['rows_per_sec']:>11,}"
+              f"{r['peak_mb']:>10}{r['file_kb']:>10}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Excel import microbenchmarks")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated row counts")
+    parser.add_argument("--layouts", default="header,headerless")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (best is kept)")
+    parser.add_argument("--cleaner-calls", type=int, default=100000)
+    parser.add_argument("--with-db", action="store_true", help="insert into in-memory SQLite too")
+    parser.add_argument("--engine", choices=IMPORT_ENGINES, default="row", help="import engine to measure")
+    parser.add_argument("--format", choices=PLAN_FORMATS, default="xlsx",
+                        help="plan file format (csv/parquet always use the columnar pipeline)")
+    parser.add_argument("--baseline", default=None, help="compare with this baseline JSON")
+    parser.add_argument("--save-baseline", default=None, help="write results as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    layouts = [l for l in args.layouts.split(",") if l]
+    if args.format == 'parquet':
+        layouts = [l for l in layouts if l == 'header']
+
+    results: Dict[str, Any] = {
+        "config": {"with_db": args.with_db, "repeat": args.repeat, "engine": args.engine,
+                   "format": args.format},
+        "cleaners": bench_cleaners(args.cleaner_calls, args.repeat),
+        "workbooks": {},
+    }
+    for rows in sizes:
+        for layout in layouts:
+            # Large cases are slow under tracemalloc; one timed run is plenty there
+            repeat = args.repeat if rows <= 10000 else 1
+            print(f"Benchmarking {rows:,} rows ({layout}) ...", flush=True)
+            results["workbooks"][f"{layout}_{rows}"] = bench_workbook(
+                rows, layout == "header", repeat, args.with_db, args.engine, args.format
+            )
+    print_report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ REGRESSIONS vs baseline:")
+            for line in regressions:
+                print(f"   - {line}")
+            return 1
+        print("\n✅ No regressions vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
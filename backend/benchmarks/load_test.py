@@ -0,0 +1,338 @@
+"""
+Load Test Harness
+Generates a synthetic database, starts the API (uvicorn subprocess) against it with
+a local fake Gemini of configurable latency, then drives the login, manager list,
+verify, stats, leaderboard and upload flows with concurrent clients.
+Reports throughput and p50/p95/p99 per flow and compares against a stored baseline.
+
+Usage (from the project root):
+    python -m backend.benchmarks.load_test --rows 10000 --clients 16 --duration 30
+    python -m backend.benchmarks.load_test --save-baseline backend/benchmarks/baseline.json
+    python -m backend.benchmarks.load_test --baseline backend/benchmarks/baseline.json   # exit 1 on regression
+
+Baselines are machine-specific: re-record them on the machine that runs the comparison.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+from openpyxl import Workbook
+
+from backend.fake_gemini import FakeGeminiConfig, start_fake_server
+from backend.benchmarks.synthetic import generate_dataset
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# Relative weight of each flow in the traffic mix
+FLOW_WEIGHTS = {
+    "manager_list": 30,
+    "verify": 20,
+    "stats": 15,
+    "leaderboard": 15,
+    "login": 15,
+    "upload": 5,
+}
+
+
+# ==================== HTTP HELPERS ====================
+
+class ApiClient:
+    """One keep-alive connection per client thread"""
+
+    def __init__(self, host: str, port: int):
+        self.conn = http.client.HTTPConnection(host, port, timeout=120)
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        try:
+            self.conn.request(method, path, body=body, headers=headers or {})
+            response = self.conn.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            self.conn.close()  # Reconnects on next request
+            raise
+
+
+def multipart(fields: Dict[str, Any], files: Dict[str, Tuple[str, bytes, str]]) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content, content_type) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def random_receipt_png(rng: random.Random) -> bytes:
+    """Noise image - each one hashes differently, so duplicate detection never trips"""
+    image = Image.frombytes("L", (48, 48), bytes(rng.getrandbits(8) for _ in range(48 * 48)))
+    buffer = BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def small_plan_workbook(rows: int = 200) -> bytes:
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['ФИО', 'Регион', 'Район', 'Сумма', 'Форма', 'Место работы', 'Специальность', 'Телефон', 'Группа', 'МП'])
+    for i in range(rows):
+        ws.append([f'Bench Doctor {i}', 'Наманган', 'Chust', 500000, 'Card', 'QVP', 'Терапевт',
+                   f'+998 90 {i % 1000:03d} 00 00', 'A', 'RM 1'])
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+# ==================== SCENARIO ====================
+
+class Scenario:
+    def __init__(self, host: str, port: int, dataset: Dict[str, Any], seed: int = 1):
+        self.host = host
+        self.port = port
+        self.dataset = dataset
+        self.month = dataset["month"]
+        self.managers = list(dataset["managers"])
+        self.tokens: Dict[str, str] = {}
+        self.workbook = small_plan_workbook()
+        self.seed = seed
+
+    def login(self, client: ApiClient, email: str) -> Tuple[int, Optional[str]]:
+        body = urllib.parse.urlencode({"username": email, "password": self.dataset["password"]}).encode()
+        status, data = client.request("POST", "/token", body,
+                                      {"Content-Type": "application/x-www-form-urlencoded"})
+        return status, json.loads(data)["access_token"] if status == 200 else None
+
+    def prepare_tokens(self) -> None:
+        client = ApiClient(self.host, self.port)
+        for email in [self.dataset["admin"]] + self.managers:
+            status, token = self.login(client, email)
+            if status != 200:
+                raise RuntimeError(f"Login failed for {email}: HTTP {status}")
+            self.tokens[email] = token
+
+    def auth(self, email: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.tokens[email]}"}
+
+    def run_flow(self, flow: str, client: ApiClient, rng: random.Random) -> int:
+        admin = self.dataset["admin"]
+        company = rng.choice(self.dataset["companies"])
+        manager = rng.choice(self.managers)
+
+        if flow == "login":
+            return self.login(client, manager)[0]
+        if flow == "manager_list":
+            return client.request("GET", f"/manager/doctors?month={self.month}", headers=self.auth(manager))[0]
+        if flow == "stats":
+            return client.request("GET", f"/admin/stats?company={company}&month={self.month}",
+                                  headers=self.auth(admin))[0]
+        if flow == "leaderboard":
+            return client.request("GET", f"/admin/leaderboard?company={company}&month={self.month}",
+                                  headers=self.auth(admin))[0]
+        if flow == "verify":
+            plan_id = rng.choice(self.dataset["managers"][manager])
+            body, content_type = multipart(
+                {"plan_id": plan_id, "payment_method": rng.choice(["card", "cash"])},
+                {"file": ("receipt.png", random_receipt_png(rng), "image/png")},
+            )
+            return client.request("POST", "/manager/verify", body,
+                                  {**self.auth(manager), "Content-Type": content_type})[0]
+        if flow == "upload":
+            # Next month, so uploads never change the data the read flows measure
+            body, content_type = multipart(
+                {"company_name": company, "month": self.month % 12 + 1},
+                {"file": ("plan.xlsx", self.workbook,
+                          "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+            )
+            return client.request("POST", "/admin/upload-plan", body,
+                                  {**self.auth(admin), "Content-Type": content_type})[0]
+        raise ValueError(f"Unknown flow: {flow}")
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+
+def drive(scenario: Scenario, flows: Dict[str, int], clients: int, duration: float) -> Dict[str, Any]:
+    """Run `clients` concurrent loops for `duration` seconds; returns per-flow results"""
+    samples: Dict[str, List[float]] = {flow: [] for flow in flows}
+    errors: Dict[str, int] = {flow: 0 for flow in flows}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    names, weights = list(flows), list(flows.values())
+
+    def client_loop(index: int):
+        rng = random.Random(scenario.seed * 1000 + index)
+        client = ApiClient(scenario.host, scenario.port)
+        while time.perf_counter() < deadline:
+            flow = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = scenario.run_flow(flow, client, rng)
+            except Exception:
+                status = 0
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[flow].append(elapsed)
+                if status >= 400 or status == 0:
+                    errors[flow] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client_loop, range(clients)))
+    wall = time.perf_counter() - started
+
+    results = {}
+    for flow, latencies in samples.items():
+        ordered = sorted(latencies)
+        results[flow] = {
+            "requests": len(ordered),
+            "errors": errors[flow],
+            "throughput_rps": round(len(ordered) / wall, 2),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 1),
+        }
+    total = sum(len(v) for v in samples.values())
+    return {"wall_seconds": round(wall, 2), "total_rps": round(total / wall, 2), "flows": results}
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions: p95 slower or throughput lower than baseline by more than `tolerance`"""
+    regressions = []
+    for flow, base in baseline.get("flows", {}).items():
+        current = results["flows"].get(flow)
+        if not current or not current["requests"]:
+            continue
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{flow}: p95 {current['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if base["throughput_rps"] and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{flow}: throughput {current['throughput_rps']}/s vs baseline {base['throughput_rps']}/s"
+            )
+        if current["errors"] > base.get("errors", 0) and current["errors"] > current["requests"] * 0.01:
+            regressions.append(f"{flow}: {current['errors']} errors (baseline {base.get('errors', 0)})")
+    return regressions
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    print(f"\n{'flow':<14}{'reqs':>8}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    print("-" * 67)
+    for flow, r in results["flows"].items():
+        print(f"{flow:<14}{r['requests']:>8}{r['errors']:>6}{r['throughput_rps']:>9}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+    print(f"\nTotal: {results['total_rps']} req/s over {results['wall_seconds']}s")
+
+
+# ==================== SERVER ====================
+
+def start_api(port: int, env: Dict[str, str]) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=str(PROJECT_ROOT), env={**os.environ, **env},
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            status, _ = ApiClient("127.0.0.1", port).request("GET", "/health")
+            if status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API server did not start")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Synergy API load test")
+    parser.add_argument("--rows", type=int, default=10000, help="master_plan rows to generate")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    parser.add_argument("--flows", default=",".join(FLOW_WEIGHTS), help="comma-separated flows to run")
+    parser.add_argument("--ai-latency", type=float, default=0.8, help="fake Gemini latency (s)")
+    parser.add_argument("--ai-jitter", type=float, default=0.3, help="fake Gemini latency jitter (s)")
+    parser.add_argument("--ai-error-rate", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workdir", default=None, help="keep the benchmark DB/uploads here")
+    parser.add_argument("--baseline", default=None, help="compare with this baseline JSON")
+    parser.add_argument("--save-baseline", default=None, help="write results as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression (0.2 = 20%%)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    flows = {f: FLOW_WEIGHTS[f] for f in args.flows.split(",") if f}
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="synergy_bench_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    database_url = f"sqlite:///{workdir / 'bench.db'}"
+
+    print(f"Generating {args.rows:,} plan rows in {workdir} ...")
+    started = time.perf_counter()
+    dataset = generate_dataset(database_url, args.rows, seed=args.seed)
+    print(f"  done in {time.perf_counter() - started:.1f}s")
+
+    fake, fake_url = start_fake_server(config=FakeGeminiConfig(args.ai_latency, args.ai_jitter, args.ai_error_rate))
+    api = start_api(args.port, {
+        "DATABASE_URL": database_url,
+        "UPLOADS_DIR": str(workdir / "uploads"),
+        "GEMINI_API_BASE": fake_url,
+        "GOOGLE_API_KEY": "bench",
+        # The stub has no quota; keep the client limits out of the measurement
+        "AI_RATE_PER_SECOND": "0",
+        "AI_MAX_CONCURRENCY": str(max(4, args.clients)),
+    })
+    try:
+        scenario = Scenario("127.0.0.1", args.port, dataset, seed=args.seed)
+        scenario.prepare_tokens()
+        print(f"Driving {args.clients} clients for {args.duration}s: {', '.join(flows)}")
+        results = drive(scenario, flows, args.clients, args.duration)
+    finally:
+        api.terminate()
+        api.wait()
+        fake.shutdown()
+
+    results["config"] = {"rows": args.rows, "clients": args.clients, "duration": args.duration,
+                         "ai_latency": args.ai_latency, "ai_jitter": args.ai_jitter}
+    print_report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print(f"\n⚠️  Baseline was recorded with {baseline.get('config')} - results may not be comparable")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ REGRESSIONS vs baseline:")
+            for line in regressions:
+                print(f"   - {line}")
+            return 1
+        print("\n✅ No regressions vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Doctor List Read Path Benchmark
+Compares the ORM path (hydrate MasterPlan + latest Payment, build a
+DoctorResponse per row, FastAPI-style re-validation and JSON encoding) with the
+lean path in backend/read_path.py (column-only Core select, slotted rows, orjson),
+plus the cost and size of gzip on the lean body. Runs on a generated database
+where most plans have a payment with a realistic ai_log.
+
+Usage (from the project root):
+    python -m backend.benchmarks.read_path
+    python -m backend.benchmarks.read_path --sizes 10000 --save-baseline backend/benchmarks/read_path_baseline.json
+    python -m backend.benchmarks.read_path --baseline backend/benchmarks/read_path_baseline.json   # exit 1 on regression
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List
+
+# backend.main creates its tables on import; keep that away from the real sql_app.db
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from backend.benchmarks.excel_parse import measure
+from backend.benchmarks.synthetic import generate_dataset
+from backend.main import DoctorResponse
+from backend.models import MasterPlan, Payment, PlanStatus
+from backend.payments import recompute_payment_totals
+from backend.plan_status import plan_status_label
+from backend.read_path import GZIP_LEVEL, ORJSON_AVAILABLE, dumps, fetch_doctor_rows
+
+# Share of plans with a recorded payment, and the size of a typical stored AI log
+PAID_SHARE = 0.6
+AI_LOG = json.dumps({
+    "extracted_amount": 500000, "extracted_month": 12, "identity_match": True,
+    "has_signature": True, "has_stamp": True, "has_complete_date": True,
+    "extracted_transaction_id": None, "reasoning": "Receipt matches the plan. " * 40,
+    "ai_route": {"route": "primary", "model": "gemini", "latency_ms": 2100},
+})
+AI_LOG_GZ = zlib.compress(AI_LOG.encode("utf-8"), 6)
+
+
+def add_payments(database_url: str, seed: int = 42) -> int:
+    """One payment for PAID_SHARE of the plans, then the denormalized totals"""
+    rng = random.Random(seed)
+    engine = create_engine(database_url)
+    session = sessionmaker(bind=engine)()
+    plans = session.query(MasterPlan.id, MasterPlan.target_amount).all()
+    now = datetime.utcnow()
+    payments = [
+        {"plan_id": plan_id, "amount_paid": target, "payment_method": "card", "verified_at": now,
+         "proof_image_path": f"Synergy/REGION/A/2026_10/doc_{plan_id}.jpg", "ai_log_gz": AI_LOG_GZ}
+        for plan_id, target in plans if rng.random() < PAID_SHARE
+    ]
+    session.execute(Payment.__table__.insert(), payments)
+    recompute_payment_totals(session)
+    session.execute(MasterPlan.__table__.update().where(MasterPlan.paid_total > 0).values(status_code=PlanStatus.VERIFIED))
+    session.commit()
+    session.close()
+    engine.dispose()
+    return len(payments)
+
+
+def orm_path(session) -> bytes:
+    """What the endpoints did before: ORM objects -> DoctorResponse -> validate + encode"""
+    plans = session.query(MasterPlan).options(joinedload(MasterPlan.latest_payment)).all()
+    models = [
+        DoctorResponse(
+            id=p.id, company=p.company, region=p.region, district=p.district or '',
+            group_name=p.group_name, manager_name=p.manager_name or '', doctor_name=p.doctor_name,
+            specialty=p.specialty or '', workplace=p.workplace or '', phone=p.phone or '',
+            card_number=p.card_number or '', target_amount=p.target_amount, planned_type=p.planned_type,
+            month=p.month, status=plan_status_label(p), status_code=PlanStatus(p.status_code).name.lower(),
+            proof_image=p.latest_payment.proof_image_path if p.latest_payment else None,
+            amount_paid=p.paid_total, payment_count=p.payment_count,
+        )
+        for p in plans
+    ]
+    # FastAPI: validate against response_model, dump to JSON-able data, then json.dumps
+    adapter = TypeAdapter(List[DoctorResponse])
+    content = adapter.dump_python(adapter.validate_python(models), mode="json")
+    body = json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    session.expunge_all()
+    return body
+
+
+def lean_path(session) -> bytes:
+    return dumps(fetch_doctor_rows(session, session.query(MasterPlan)))
+
+
+def bench_size(rows: int, repeat: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'read_path.db')}"
+        generate_dataset(database_url, rows)
+        paid = add_payments(database_url)
+        engine = create_engine(database_url)
+        session = sessionmaker(bind=engine)()
+        try:
+            orm_body = orm_path(session)
+            lean_body = lean_path(session)
+            if json.loads(orm_body) != json.loads(lean_body):
+                raise AssertionError(f"{rows} rows: lean and ORM paths returned different JSON")
+
+            result: Dict[str, Any] = {"rows": rows, "paid_rows": paid}
+            for name, func in (("orm", lambda: orm_path(session)), ("lean", lambda: lean_path(session))):
+                seconds, peak = measure(func, repeat)
+                result[name] = {
+                    "seconds": round(seconds, 4),
+                    "rows_per_sec": round(rows / seconds),
+                    "peak_mb": round(peak / (1024 * 1024), 2),
+                }
+            seconds, _ = measure(lambda: gzip.compress(lean_body, compresslevel=GZIP_LEVEL), repeat)
+            result["gzip"] = {"seconds": round(seconds, 4), "level": GZIP_LEVEL}
+            result["body_kb"] = round(len(lean_body) / 1024, 1)
+            result["gzip_kb"] = round(len(gzip.compress(lean_body, compresslevel=GZIP_LEVEL)) / 1024, 1)
+            result["speedup"] = round(result["orm"]["seconds"] / result["lean"]["seconds"], 2)
+        finally:
+            session.close()
+            engine.dispose()
+    return result
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions: lean throughput lower or peak memory higher than baseline by more than `tolerance`"""
+    regressions = []
+    for key, base in baseline.get("sizes", {}).items():
+        current = results["sizes"].get(key)
+        if not current:
+            continue
+        if current["lean"]["rows_per_sec"] < base["lean"]["rows_per_sec"] * (1 - tolerance):
+            regressions.append(f"{key}: {current['lean']['rows_per_sec']} rows/s vs baseline {base['lean']['rows_per_sec']}")
+        if current["lean"]["peak_mb"] > base["lean"]["peak_mb"] * (1 + tolerance):
+            regressions.append(f"{key}: peak {current['lean']['peak_mb']} MB vs baseline {base['lean']['peak_mb']} MB")
+    return regressions
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    print(f"\n{'rows':>8}{'orm s':>9}{'orm MB':>9}{'lean s':>9}{'lean MB':>9}{'speedup':>9}"
+          f"{'body KB':>10}{'gzip KB':>10}{'gzip s':>9}")
+    print("-" * 82)
+    for r in results["sizes"].values():
+        print(f"{r['rows']:>8,}{r['orm']['seconds']:>9}{r['orm']['peak_mb']:>9}{r['lean']['seconds']:>9}"
+              f"{r['lean']['peak_mb']:>9}{r['speedup']:>8}x{r['body_kb']:>10}{r['gzip_kb']:>10}{r['gzip']['seconds']:>9}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Doctor list read path benchmark")
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated plan row counts")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (best is kept)")
+    parser.add_argument("--baseline", default=None, help="compare with this baseline JSON")
+    parser.add_argument("--save-baseline", default=None, help="write results as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {"config": {"repeat": args.repeat, "orjson": ORJSON_AVAILABLE}, "sizes": {}}
+    for rows in [int(s) for s in args.sizes.split(",") if s]:
+        print(f"Benchmarking {rows:,} rows ...", flush=True)
+        results["sizes"][str(rows)] = bench_size(rows, args.repeat if rows <= 10000 else 1)
+    print_report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print(f"\n⚠️ Baseline config {baseline.get('config')} differs from this run {results['config']}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ REGRESSIONS vs baseline:")
+            for line in regressions:
+                print(f"   - {line}")
+            return 1
+        print("\n✅ No regressions vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
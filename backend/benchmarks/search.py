@@ -0,0 +1,120 @@
+"""
+Doctor Search Benchmark
+Times backend/search_index.py on a generated database against the ILIKE scan it
+replaces in /admin/data: common and rare names (queried in the other script),
+a misspelled name, a workplace, a phone suffix and a full phone number. The
+synthetic names repeat a lot, so a few rare doctors are added to measure
+selective queries too.
+
+Usage (from the project root):
+    python -m backend.benchmarks.search
+    python -m backend.benchmarks.search --rows 1000000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+# backend.main creates its tables on import; keep that away from the real sql_app.db
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from backend.benchmarks.synthetic import generate_dataset
+from backend.models import MasterPlan, PlanStatus
+from backend.search_index import name_filter, search_plans
+
+RARE_DOCTORS = [
+    ("Ўринбоева Гулнора", "Наманган вилоят шифохонаси", "991234000"),
+    ("Khamidov Jahongir", "Oilaviy poliklinika 12", "935551234"),
+    ("Жўраев Ботир", "Чуст тумани ТТБ", "977770042"),
+]
+
+# (label, query, ILIKE pattern the old endpoint would have needed)
+QUERIES = [
+    ("common name, other script", "Saidova", "%Saidova%"),
+    ("rare name, other script", "Orinboeva", "%Orinboeva%"),
+    ("rare name, Russian spelling", "Хамидов", "%Хамидов%"),
+    ("misspelled name", "Jo'rayef", "%Jo'rayef%"),
+    ("workplace", "chust tumani", "%chust tumani%"),
+    ("phone suffix", "1234000", None),
+    ("full phone number", "+998 99 123 40 00", None),
+]
+
+
+def timed(func: Callable[[], object], repeat: int) -> float:
+    """Median milliseconds of `repeat` runs"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(rows: int, repeat: int) -> List[Dict[str, object]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'search.db')}"
+        print(f"Generating {rows:,} rows ...", flush=True)
+        generate_dataset(database_url, rows)
+        engine = create_engine(database_url)
+        session = sessionmaker(bind=engine)()
+        try:
+            session.add_all([
+                MasterPlan(company="Synergy", region="NAMANGAN", group_name="A", doctor_name=name,
+                           workplace=workplace, phone=phone, target_amount=1000, planned_type="Card",
+                           month=12, status_code=PlanStatus.PENDING)
+                for name, workplace, phone in RARE_DOCTORS
+            ])
+            session.commit()
+
+            results = []
+            for label, query, pattern in QUERIES:
+                hits = search_plans(session, query, limit=20)
+                result = {
+                    "label": label, "query": query, "hits": len(hits),
+                    "top": session.get(MasterPlan, hits[0][0]).doctor_name if hits else None,
+                    "search_ms": round(timed(lambda: search_plans(session, query, limit=20), repeat), 2),
+                }
+                if pattern:
+                    result["ilike_hits"] = session.query(func.count(MasterPlan.id)).filter(
+                        MasterPlan.doctor_name.ilike(pattern)).scalar()
+                    result["ilike_ms"] = round(timed(lambda: session.query(MasterPlan.id).filter(
+                        MasterPlan.doctor_name.ilike(pattern)).limit(20).all(), repeat), 2)
+                results.append(result)
+
+            # /admin/data doctor_name filter: full match count through the index
+            count = session.query(func.count(MasterPlan.id)).filter(name_filter(session, "Orinboeva"))
+            results.append({
+                "label": "/admin/data name filter", "query": "Orinboeva", "hits": count.scalar(), "top": None,
+                "search_ms": round(timed(count.scalar, repeat), 2),
+            })
+        finally:
+            session.close()
+            engine.dispose()
+    return results
+
+
+def print_report(results: List[Dict[str, object]]) -> None:
+    print(f"\n{'case':<30}{'query':<20}{'hits':>6}{'ms':>9}{'ilike hits':>12}{'ilike ms':>10}  top")
+    print("-" * 106)
+    for r in results:
+        print(f"{r['label']:<30}{r['query']:<20}{r['hits']:>6}{r['search_ms']:>9}"
+              f"{r.get('ilike_hits', '-'):>12}{r.get('ilike_ms', '-'):>10}  {r['top'] or ''}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Doctor search benchmark")
+    parser.add_argument("--rows", type=int, default=100000, help="plan rows to generate")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per query (median is kept)")
+    args = parser.parse_args()
+    print_report(run(args.rows, args.repeat))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Synthetic Data Generator
+Builds a benchmark database with realistic companies, managers and master_plan rows
+(10k - 1M) without touching the real sql_app.db
+"""
+import random
+from typing import Any, Dict, List
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+from backend.database import Base
+from backend.models import User, MasterPlan, PlanStatus
+from backend.auth import get_password_hash
+
+BENCH_PASSWORD = 'bench123'
+
+# Company -> groups used by the real importers / access rules
+COMPANY_GROUPS = {
+    'Synergy': ['A', 'B', 'C', 'A2', 'B2'],
+    'Amare': ['VITA', 'FORTE'],
+    'Galassiya': ['GALASSIYA'],
+    'Perfetto': ['PERFETTO'],
+}
+# Share of plan rows per company (Synergy is by far the largest)
+COMPANY_WEIGHTS = {'Synergy': 0.55, 'Amare': 0.25, 'Galassiya': 0.1, 'Perfetto': 0.1}
+
+REGIONS = [
+    'TOSHKENT CITY', 'TOSHKENT OBL', 'TOSHKENT OBSH', 'SURXANDARYO', 'QASHQADARYO',
+    'SAMARQAND', 'BUXORO', 'NAMANGAN', 'ANDIJON', "FARG'ONA", 'JIZZAX', 'NAVOIY', 'XORAZM', 'NUKUS',
+]
+DISTRICTS = ['Бектемир', 'Юнусобод', 'Чилонзор', 'Яккасарой', 'Chust', 'Kosonsoy', 'Markaz', 'Urgut', 'Kattaqo\'rg\'on']
+SURNAMES = ['Саидова', 'Karimov', 'Рахимова', 'Tursunov', 'Юсупова', 'Aliyev', 'Абдуллаева', 'Ergashev', 'Nazarova', 'Холматов']
+FIRST_NAMES = ['Нилуфар', 'Aziz', 'Дилноза', 'Bobur', 'Гулчехра', 'Sardor', 'Малика', 'Jasur', 'Zarina', 'Шахзод']
+SPECIALTIES = ['Терапевт', 'Pediatr', 'Кардиолог', 'Nevrolog', 'Гинеколог', 'LOR']
+WORKPLACES = ['Oilaviy poliklinika', 'ГКБ №1', 'Markaziy shifoxona', 'Частная клиника', 'QVP']
+AMOUNTS = [100000, 200000, 300000, 500000, 600000, 1000000, 1200000, 3000000]
+
+
+def _fast_sqlite(engine: Engine) -> None:
+    """Bulk-load pragmas; the benchmark DB is disposable"""
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_conn, _):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.close()
+
+
+def manager_email(company: str, region: str) -> str:
+    return f"{company.lower()}.{region.lower().replace(' ', '_').replace(chr(39), '')}@bench.local"
+
+
+def generate_dataset(database_url: str, rows: int, month: int = 12, seed: int = 42,
+                     batch_size: int = 10000) -> Dict[str, Any]:
+    """
+    Create tables and fill them. Returns a summary with the admin/manager logins
+    and, per manager, the plan ids they may verify.
+    """
+    rng = random.Random(seed)
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    if database_url.startswith("sqlite"):
+        _fast_sqlite(engine)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    # One bcrypt hash for every account - hashing per user would dominate setup time
+    hashed = get_password_hash(BENCH_PASSWORD)
+    users = [{"email": "admin@bench.local", "hashed_password": hashed, "role": "admin",
+              "company": "Synergy", "region": None, "group_access": "ALL"}]
+    for company in COMPANY_GROUPS:
+        for region in REGIONS:
+            users.append({"email": manager_email(company, region), "hashed_password": hashed,
+                          "role": "manager", "company": company, "region": region, "group_access": "ALL"})
+
+    companies = list(COMPANY_WEIGHTS)
+    weights = [COMPANY_WEIGHTS[c] for c in companies]
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), users)
+        remaining = rows
+        while remaining > 0:
+            batch: List[Dict[str, Any]] = []
+            for _ in range(min(batch_size, remaining)):
+                company = rng.choices(companies, weights)[0]
+                batch.append({
+                    "company": company,
+                    "region": rng.choice(REGIONS),
+                    "district": rng.choice(DISTRICTS),
+                    "group_name": rng.choice(COMPANY_GROUPS[company]),
+                    "manager_name": f"RM {rng.randint(1, 40)}",
+                    "doctor_name": f"{rng.choice(SURNAMES)} {rng.choice(FIRST_NAMES)}",
+                    "specialty": rng.choice(SPECIALTIES),
+                    "workplace": rng.choice(WORKPLACES),
+                    "phone": f"9{rng.randint(0, 99999999):08d}",
+                    "card_number": f"8600{rng.randint(0, 999999999999):012d}" if rng.random() < 0.5 else "",
+                    "target_amount": rng.choice(AMOUNTS),
+                    "planned_type": rng.choice(['Card', 'Cash', 'Cash', 'Dollar']),
+                    "month": month,
+                    "status_code": PlanStatus.PENDING,
+                })
+            conn.execute(MasterPlan.__table__.insert(), batch)
+            remaining -= len(batch)
+
+        # Plans each manager may verify (same company + region), sampled to keep memory flat
+        plan_ids: Dict[str, List[int]] = {}
+        for company in COMPANY_GROUPS:
+            for region in REGIONS:
+                result = conn.execute(
+                    MasterPlan.__table__.select()
+                    .with_only_columns(MasterPlan.__table__.c.id)
+                    .where(MasterPlan.__table__.c.company == company, MasterPlan.__table__.c.region == region)
+                    .limit(500)
+                )
+                plan_ids[manager_email(company, region)] = [r[0] for r in result]
+
+    engine.dispose()
+    return {
+        "rows": rows,
+        "month": month,
+        "password": BENCH_PASSWORD,
+        "admin": "admin@bench.local",
+        "managers": {email: ids for email, ids in plan_ids.items() if ids},
+        "companies": list(COMPANY_GROUPS),
+    }
@@ -0,0 +1,98 @@
+"""
+Admin Dashboard Bundle
+Rows, totals and the region/group leaderboard for one company/month in a single
+response, all derived from one query: with rows, totals are summed from the
+fetched rows; without, from one GROUP BY region, group, status aggregate.
+Replaces three parallel requests that each re-scanned the same plans.
+"""
+from typing import Any, Dict, Iterable, List, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
+
+from .models import MasterPlan, PlanStatus
+from .read_path import fetch_doctor_rows, json_bytes_response
+
+DASHBOARD_SECTIONS = ('rows', 'stats', 'leaderboard')
+
+_STATUS_NAMES = {status.value: status.name.lower() for status in PlanStatus}
+
+# (region, group_name, status name) -> [count, target, paid]
+Groups = Dict[Tuple[str, str, str], List[int]]
+
+
+def _group_rows(rows) -> Groups:
+    groups: Groups = {}
+    for row in rows:
+        totals = groups.setdefault((row.region, row.group_name, row.status_code), [0, 0, 0])
+        totals[0] += 1
+        totals[1] += row.target_amount
+        totals[2] += row.amount_paid
+    return groups
+
+
+def _group_aggregate(db: Session, query: Query) -> Groups:
+    statement = query.with_entities(
+        MasterPlan.region, MasterPlan.group_name, MasterPlan.status_code,
+        func.count(MasterPlan.id), func.sum(MasterPlan.target_amount), func.sum(MasterPlan.paid_total)
+    ).group_by(MasterPlan.region, MasterPlan.group_name, MasterPlan.status_code).statement
+    return {
+        (region, group_name, _STATUS_NAMES.get(code, 'pending')): [count, target or 0, paid or 0]
+        for region, group_name, code, count, target, paid in db.execute(statement)
+    }
+
+
+def stats_from_groups(groups: Groups) -> Dict[str, Any]:
+    """Same fields as /admin/stats"""
+    status_counts: Dict[str, int] = {}
+    total_doctors = total_budget = total_paid = 0
+    for (_, _, status), (count, target, paid) in groups.items():
+        status_counts[status] = status_counts.get(status, 0) + count
+        total_doctors += count
+        total_budget += target
+        total_paid += paid
+    return {
+        'total_doctors': total_doctors,
+        'total_budget': total_budget,
+        'total_paid': total_paid,
+        'total_debt': max(total_budget - total_paid, 0),
+        'pending_count': status_counts.get('pending', 0),
+        'verified_count': status_counts.get('verified', 0),
+        'status_counts': status_counts,
+    }
+
+
+def leaderboard_from_groups(groups: Groups) -> List[Dict[str, Any]]:
+    """Same rows as /admin/leaderboard: per region and group, highest debt first"""
+    board: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for (region, group_name, _), (_, target, paid) in groups.items():
+        entry = board.setdefault((region, group_name), {
+            'region': region, 'group_name': group_name, 'target': 0, 'paid': 0, 'debt': 0
+        })
+        entry['target'] += target
+        entry['paid'] += paid
+    for entry in board.values():
+        entry['debt'] = entry['target'] - entry['paid']
+    return sorted(board.values(), key=lambda x: x['debt'], reverse=True)
+
+
+def dashboard_bundle(db: Session, query: Query, sections: Iterable[str]) -> Dict[str, Any]:
+    sections = set(sections)
+    bundle: Dict[str, Any] = {}
+    if 'rows' in sections:
+        rows = fetch_doctor_rows(db, query)
+        bundle['rows'] = rows
+        groups = _group_rows(rows)
+    elif sections & {'stats', 'leaderboard'}:
+        groups = _group_aggregate(db, query)
+    if 'stats' in sections:
+        bundle['stats'] = stats_from_groups(groups)
+    if 'leaderboard' in sections:
+        bundle['leaderboard'] = leaderboard_from_groups(groups)
+    return bundle
+
+
+def dashboard_response(request: Request, db: Session, query: Query, sections: Iterable[str]) -> Response:
+    """dashboard_bundle + json_bytes_response (blocking; run it off the event loop)"""
+    return json_bytes_response(request, dashboard_bundle(db, query, sections))
@@ -0,0 +1,168 @@
+"""
+Duplicate Receipt Detection
+Perceptual (difference) hashes of proof images, kept in an in-memory BK-tree so
+near-duplicates - the same receipt re-shot, re-compressed or lightly cropped - are
+found in well under a millisecond across all payments, before any model call.
+Only exact copies are rejected there, found through the indexed Payment.image_hash
+column so payments recorded by other workers count too; near matches are decided
+after extraction.
+"""
+import threading
+from io import BytesIO
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageOps
+from sqlalchemy.orm import Session
+
+from .models import Payment
+
+
+HASH_SIZE = 8                 # 8x8 gradient bits -> 64-bit hash
+# Paper receipts are mostly white, so distinct ones can sit ~12 bits apart and
+# re-encoded / rescaled copies land well under 6. Card/Click screenshots share an
+# app template: two real payments differing only in amount, ID and date hash 0-1
+# bits apart. A hash match alone therefore never rejects - only byte-identical
+# files do (identical_proof); near matches are settled by the transaction ID or
+# an admin.
+DUPLICATE_MAX_DISTANCE = 6    # Probably the same receipt - review unless the transaction ID differs
+SUSPECT_MAX_DISTANCE = 10     # Possibly the same receipt - record in the log
+
+
+def dhash(content: bytes) -> Optional[int]:
+    """64-bit difference hash of an image, or None if it cannot be decoded"""
+    try:
+        image = Image.open(BytesIO(content))
+        # JPEG can decode straight at a reduced scale - much cheaper for phone photos
+        image.draft("L", (HASH_SIZE * 16, HASH_SIZE * 16))
+        image = ImageOps.exif_transpose(image)
+        pixels = list(
+            image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS).getdata()
+        )
+    except Exception:
+        return None
+
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            right = pixels[row * (HASH_SIZE + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hash_to_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over Hamming distance; each node is [hash, payment_ids, children]"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value: int, payment_id: int) -> None:
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [payment_id], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(payment_id)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [payment_id], {}]
+                return
+            node = child
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, int]]:
+        """All (distance, payment_id) within max_distance, closest first"""
+        if self.root is None:
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                found.extend((distance, pid) for pid in node[1])
+            # Triangle inequality: only children in [d - max, d + max] can match
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return sorted(found)
+
+
+class ProofHashIndex:
+    """
+    Per-process index of Payment.image_hash values for near matches. Each lookup
+    first picks up the payments recorded since the last one (by any worker), an
+    indexed range query on Payment.id.
+    """
+
+    def __init__(self):
+        self.tree = BKTree()
+        self.last_id = 0
+        self.indexed = set()  # Payment ids already in the tree (added locally or loaded)
+        self._lock = threading.Lock()
+
+    def _catch_up(self, db: Session) -> None:
+        rows = db.query(Payment.id, Payment.image_hash).filter(
+            Payment.id > self.last_id, Payment.image_hash.isnot(None)
+        ).order_by(Payment.id).all()
+        with self._lock:
+            for payment_id, image_hash in rows:
+                self._add(int(image_hash, 16), payment_id)
+                self.last_id = max(self.last_id, payment_id)
+
+    def _add(self, value: int, payment_id: int) -> None:
+        if payment_id not in self.indexed:
+            self.indexed.add(payment_id)
+            self.tree.add(value, payment_id)
+
+    def find_duplicates(self, db: Session, value: int,
+                        max_distance: int = SUSPECT_MAX_DISTANCE) -> List[Tuple[int, int]]:
+        """(distance, payment_id) of indexed proofs within max_distance, closest first"""
+        self._catch_up(db)
+        with self._lock:
+            return self.tree.search(value, max_distance)
+
+    def add(self, value: int, payment_id: int) -> None:
+        with self._lock:
+            self._add(value, payment_id)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.tree = BKTree()
+            self.last_id = 0
+            self.indexed = set()
+
+
+proof_index = ProofHashIndex()
+
+
+def identical_proof(db: Session, content: bytes, value: int, uploads_dir: Path) -> Optional[Payment]:
+    """
+    The payment whose stored proof file is byte-for-byte `content`, if any. Candidates
+    come from the database (same hash), not the per-process tree, so a copy recorded
+    by another worker a moment ago is still found.
+    """
+    candidates = db.query(Payment).filter(Payment.image_hash == hash_to_hex(value)).order_by(Payment.id)
+    for payment in candidates:
+        if not payment.proof_image_path:
+            continue
+        path = uploads_dir / payment.proof_image_path
+        try:
+            if path.stat().st_size == len(content) and path.read_bytes() == content:
+                return payment
+        except OSError:
+            continue
+    return None
@@ -0,0 +1,308 @@
+"""
+Live Plan Events
+Writes that change a plan (verification, admin correction, review decision) and
+bulk writes (import, month rollover) publish a compact event to a broker; every
+open dashboard holds one server-sent events stream (GET /events) and receives
+only the events its user's access scope allows, instead of re-fetching lists.
+
+The broker fans events out in-process. The backend decides how events reach the
+broker of every worker: 'local' (single process, the default) or 'redis'
+(pub/sub channel, for several uvicorn workers). Set EVENT_BACKEND / REDIS_URL.
+
+Optional: `redis`
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from .access_scope import PlanScope
+from .metrics import registry
+from .models import MasterPlan, PlanStatus
+from .plan_status import plan_status_label
+
+logger = logging.getLogger("synergy.events")
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+EVENT_BACKEND = os.getenv("EVENT_BACKEND", "local")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+EVENT_CHANNEL = os.getenv("EVENT_CHANNEL", "synergy:plan-events")
+# Events kept for Last-Event-ID replay after a reconnect
+EVENT_REPLAY = int(os.getenv("EVENT_REPLAY", "2000"))
+# Per-stream buffer; a client this far behind is told to resync instead
+SUBSCRIBER_QUEUE = int(os.getenv("EVENT_SUBSCRIBER_QUEUE", "500"))
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", "15"))
+
+EVENTS_PUBLISHED = registry.counter(
+    "synergy_events_published_total", "Plan events published", ("kind",)
+)
+EVENTS_PUBLISH_FAILED = registry.counter(
+    "synergy_events_publish_failed_total", "Plan events the backend failed to publish", ("kind",)
+)
+EVENTS_DROPPED = registry.counter(
+    "synergy_events_overflow_total", "Streams told to resync because their buffer overflowed"
+)
+
+
+@dataclass(slots=True)
+class PlanEvent:
+    """
+    kind 'plan' is one plan's new state; 'reload' tells dashboards of a company to
+    re-fetch (imports and rollovers touch too many rows to send one by one).
+    region/group_name/district are used for scoping and are not sent.
+    """
+    kind: str
+    company: str
+    data: Dict[str, Any]
+    region: Optional[str] = None
+    group_name: Optional[str] = None
+    district: Optional[str] = None
+
+
+def plan_event(plan: MasterPlan) -> PlanEvent:
+    """Current state of a plan, read after the write was committed"""
+    latest = plan.latest_payment
+    return PlanEvent(
+        kind='plan',
+        company=plan.company,
+        region=plan.region,
+        group_name=plan.group_name,
+        district=plan.district,
+        data={
+            'plan_id': plan.id,
+            'month': plan.month,
+            'status': plan_status_label(plan),
+            'status_code': PlanStatus(plan.status_code).name.lower(),
+            'amount_paid': plan.paid_total,
+            'payment_count': plan.payment_count,
+            'proof_image': latest.proof_image_path if latest else None,
+        },
+    )
+
+
+def reload_event(company: str, month: int, reason: str, count: int) -> PlanEvent:
+    return PlanEvent(kind='reload', company=company,
+                     data={'month': month, 'reason': reason, 'count': count})
+
+
+# ==================== BACKENDS ====================
+
+class LocalBackend:
+    """Single process: publishing is delivering"""
+
+    def start(self, deliver: Callable[[PlanEvent], None]) -> None:
+        self._deliver = deliver
+
+    def publish(self, event: PlanEvent) -> None:
+        self._deliver(event)
+
+
+class RedisBackend:
+    """
+    Publish to a Redis channel; a listener thread in each worker delivers what
+    arrives (including this worker's own events) to the local subscribers.
+    """
+
+    def __init__(self, url: str = REDIS_URL, channel: str = EVENT_CHANNEL):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("EVENT_BACKEND=redis requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+
+    def start(self, deliver: Callable[[PlanEvent], None]) -> None:
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+
+        def listen():
+            for message in pubsub.listen():
+                try:
+                    deliver(PlanEvent(**json.loads(message['data'])))
+                except (TypeError, ValueError):
+                    continue
+
+        threading.Thread(target=listen, name="plan-events-redis", daemon=True).start()
+
+    def publish(self, event: PlanEvent) -> None:
+        self.client.publish(self.channel, json.dumps(asdict(event), ensure_ascii=False))
+
+
+BACKENDS = {'local': LocalBackend, 'redis': RedisBackend}
+
+
+# ==================== BROKER ====================
+
+@dataclass(eq=False)
+class Subscription:
+    """One open stream: its scope, event loop and bounded queue"""
+    scope: PlanScope
+    month: Optional[int]
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=SUBSCRIBER_QUEUE))
+    overflowed: bool = False
+
+    def wants(self, event: PlanEvent) -> bool:
+        if self.month is not None and event.data.get('month') != self.month:
+            return False
+        return self.scope.allows(event.company, event.region, event.group_name, event.district)
+
+    def _put(self, item: Tuple[str, PlanEvent]) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Too far behind to be worth catching up: drop the backlog, ask for a re-fetch
+            self.overflowed = True
+            EVENTS_DROPPED.inc()
+
+    def offer(self, event_id: str, event: PlanEvent) -> None:
+        """Thread-safe; called from whichever thread delivers the event"""
+        if self.wants(event):
+            self.loop.call_soon_threadsafe(self._put, (event_id, event))
+
+
+class EventBroker:
+    """
+    Fans events out to the subscriptions of this process. Event ids are
+    "<boot>-<seq>": after a reconnect, missed events are replayed from a bounded
+    buffer, and a client whose id is from another boot (restart, other worker) or
+    older than the buffer is told to resync.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.boot = format(int(time.time() * 1000), 'x')
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._recent: deque = deque(maxlen=EVENT_REPLAY)
+        self._subscribers: List[Subscription] = []
+        backend.start(self._deliver)
+
+    def publish(self, event: PlanEvent) -> None:
+        """Call after the write is committed. Never raises into the request."""
+        EVENTS_PUBLISHED.inc(event.kind)
+        try:
+            self.backend.publish(event)
+        except Exception:
+            EVENTS_PUBLISH_FAILED.inc(event.kind)
+            logger.exception("Event publish failed (%s, %s)", event.kind, event.company)
+
+    def _deliver(self, event: PlanEvent) -> None:
+        # Offers happen under the lock so every stream sees events in id order
+        with self._lock:
+            self._seq += 1
+            self._recent.append((self._seq, event))
+            event_id = f"{self.boot}-{self._seq}"
+            for subscription in self._subscribers:
+                subscription.offer(event_id, event)
+
+    def subscribe(self, scope: PlanScope, month: Optional[int] = None,
+                  last_event_id: Optional[str] = None) -> Tuple[Subscription, List[Tuple[str, PlanEvent]], bool]:
+        """
+        Register a stream. Returns (subscription, replay, resync): replay holds the
+        missed events the scope allows, resync is True when they cannot be replayed.
+        Must be called on the stream's event loop.
+        """
+        subscription = Subscription(scope, month, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.append(subscription)
+            replay, resync = self._missed(last_event_id)
+        return subscription, [(i, e) for i, e in replay if subscription.wants(e)], resync
+
+    def _missed(self, last_event_id: Optional[str]) -> Tuple[List[Tuple[str, PlanEvent]], bool]:
+        if not last_event_id:
+            return [], False
+        boot, _, seq = last_event_id.partition('-')
+        if boot != self.boot or not seq.isdigit() or int(seq) > self._seq:
+            return [], True
+        last = int(seq)
+        missed = [(f"{self.boot}-{s}", e) for s, e in self._recent if s > last]
+        return missed, len(missed) < self._seq - last
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+def sse_message(event: str, data: Any, event_id: Optional[str] = None) -> bytes:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+async def event_stream(broker: EventBroker, subscription: Subscription,
+                       replay: List[Tuple[str, PlanEvent]], resync: bool,
+                       is_disconnected: Callable) -> AsyncIterator[bytes]:
+    """SSE body: replayed events, then live ones, with keepalive comments in between"""
+    try:
+        yield b"retry: 3000\n\n"
+        if resync:
+            yield sse_message('resync', {})
+        for event_id, event in replay:
+            yield sse_message(event.kind, event.data, event_id)
+        while True:
+            if subscription.overflowed:
+                # Drain what is buffered; the client re-fetches everything anyway
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.overflowed = False
+                yield sse_message('resync', {})
+                continue
+            try:
+                event_id, event = await asyncio.wait_for(subscription.queue.get(), EVENT_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    break
+                yield b": keepalive\n\n"
+                continue
+            yield sse_message(event.kind, event.data, event_id)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+_broker: Optional[EventBroker] = None
+
+
+def get_broker() -> EventBroker:
+    """Process-wide broker on the EVENT_BACKEND backend"""
+    global _broker
+    if _broker is None:
+        if EVENT_BACKEND not in BACKENDS:
+            raise RuntimeError(f"Unknown EVENT_BACKEND '{EVENT_BACKEND}'. Use one of: {', '.join(BACKENDS)}")
+        _broker = EventBroker(BACKENDS[EVENT_BACKEND]())
+    return _broker
+
+
+def publish_plans(plans) -> None:
+    """Publish the current state of each (committed) plan"""
+    broker = get_broker()
+    for plan in plans:
+        broker.publish(plan_event(plan))
+
+
+def _collect_subscribers() -> List[str]:
+    count = _broker.subscriber_count if _broker is not None else 0
+    return ["# HELP synergy_event_streams Open live event streams in this process",
+            "# TYPE synergy_event_streams gauge",
+            f"synergy_event_streams {count}"]
+
+
+registry.collectors.append(_collect_subscribers)
@@ -0,0 +1,138 @@
+"""
+AI Extraction Columns
+Copies the fields worth querying out of each AI / OCR result into
+payment_extractions (typed, indexed), so questions like "low-confidence
+verifications this month" or "payments where only last4 matched" are index
+lookups instead of a scan with json.loads per row. The raw log stays on the
+payment, compressed and deferred.
+"""
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, not_, or_
+from sqlalchemy.orm import Session
+
+from .models import MasterPlan, Payment, PaymentExtraction
+
+# Match filters for query_extractions
+MATCH_FILTERS = {
+    'phone': PaymentExtraction.phone_matched.is_(True),
+    'last4_only': and_(
+        PaymentExtraction.last4_matched.is_(True),
+        not_(PaymentExtraction.phone_matched.is_(True)),
+        not_(PaymentExtraction.name_matched.is_(True)),
+    ),
+    'name_only': and_(
+        PaymentExtraction.name_matched.is_(True),
+        not_(PaymentExtraction.phone_matched.is_(True)),
+        not_(PaymentExtraction.last4_matched.is_(True)),
+    ),
+    'none': not_(or_(
+        PaymentExtraction.phone_matched.is_(True),
+        PaymentExtraction.last4_matched.is_(True),
+        PaymentExtraction.name_matched.is_(True),
+    )),
+}
+
+
+def _flag(value) -> Optional[bool]:
+    """Model booleans arrive as true / "true" / 1 (same leniency as the gatekeeper rules)"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return bool(value)
+
+
+def _number(value, cast):
+    try:
+        return cast(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def extraction_fields(ai_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Typed PaymentExtraction column values from an ai_result dict"""
+    route_info = ai_result.get("ai_route") or {}
+    route = route_info.get("route")
+    latency = (route_info.get("latencies") or {}).get(route)
+    phone = ai_result.get("extracted_phone")
+    return {
+        'source': 'local_ocr' if ai_result.get("source") == "local_ocr" else 'ai',
+        'model_name': route_info.get("model"),
+        'route': route,
+        'latency_ms': round(latency * 1000) if isinstance(latency, (int, float)) else None,
+        'confidence': _number(ai_result.get("confidence"), float),
+        'extracted_phone': str(phone) if phone not in (None, "") else None,
+        'extracted_amount': _number(ai_result.get("extracted_amount"), int),
+        'extracted_month': _number(ai_result.get("extracted_month"), int),
+        'phone_matched': _flag(ai_result.get("phone_matched")),
+        'last4_matched': _flag(ai_result.get("last4_matched")),
+        'name_matched': _flag(ai_result.get("name_matched")),
+        'is_authentic': _flag(ai_result.get("is_authentic")),
+    }
+
+
+def extraction_from_result(ai_result: Dict[str, Any]) -> PaymentExtraction:
+    return PaymentExtraction(**extraction_fields(ai_result))
+
+
+def extraction_summary(extraction: Optional[PaymentExtraction]) -> Optional[Dict[str, Any]]:
+    if extraction is None:
+        return None
+    return {
+        'source': extraction.source,
+        'model_name': extraction.model_name,
+        'route': extraction.route,
+        'latency_ms': extraction.latency_ms,
+        'confidence': extraction.confidence,
+        'extracted_phone': extraction.extracted_phone,
+        'extracted_amount': extraction.extracted_amount,
+        'extracted_month': extraction.extracted_month,
+        'phone_matched': extraction.phone_matched,
+        'last4_matched': extraction.last4_matched,
+        'name_matched': extraction.name_matched,
+        'is_authentic': extraction.is_authentic,
+    }
+
+
+def query_extractions(
+    db: Session,
+    company: str,
+    month: Optional[int] = None,
+    max_confidence: Optional[float] = None,
+    match: Optional[str] = None,
+    model_name: Optional[str] = None,
+    include_superseded: bool = False,
+    limit: int = 500,
+) -> List[Dict[str, Any]]:
+    """Verified payments filtered on the extraction columns (never touches ai_log)"""
+    query = db.query(
+        PaymentExtraction, Payment.id, Payment.plan_id, Payment.amount_paid, Payment.verified_at,
+        MasterPlan.doctor_name, MasterPlan.region, MasterPlan.month
+    ).join(Payment, Payment.id == PaymentExtraction.payment_id).join(
+        MasterPlan, MasterPlan.id == Payment.plan_id
+    ).filter(MasterPlan.company == company)
+    if month:
+        query = query.filter(MasterPlan.month == month)
+    if max_confidence is not None:
+        query = query.filter(PaymentExtraction.confidence < max_confidence)
+    if match:
+        query = query.filter(MATCH_FILTERS[match])
+    if model_name:
+        query = query.filter(PaymentExtraction.model_name == model_name)
+    if not include_superseded:
+        query = query.filter(Payment.superseded_by_id.is_(None))
+    rows = query.order_by(PaymentExtraction.confidence.asc(), Payment.id).limit(limit).all()
+    return [
+        {
+            'payment_id': payment_id,
+            'plan_id': plan_id,
+            'doctor_name': doctor_name,
+            'region': region,
+            'month': plan_month,
+            'amount_paid': amount_paid,
+            'verified_at': verified_at.isoformat() if verified_at else None,
+            **extraction_summary(extraction),
+        }
+        for extraction, payment_id, plan_id, amount_paid, verified_at, doctor_name, region, plan_month in rows
+    ]
@@ -0,0 +1,135 @@
+"""
+Fake Gemini Server
+Local stand-in for the Gemini `:generateContent` REST endpoint, used to exercise
+the AI client offline (latency, rate limiting, upstream failures)
+
+Usage:
+    python -m backend.fake_gemini --port 8081 --latency 0.8 --error-rate 0.1
+    GEMINI_API_BASE=http://127.0.0.1:8081 python -m uvicorn backend.main:app
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+
+def fake_extraction(prompt: str, receipt_phone: str = '', receipt_name: str = '',
+                    receipt_amount: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Build a plausible extraction that matches the expectations stated in the prompt.
+    Prompts without an Expected Phone (receipt identification) read `receipt_phone`
+    and `receipt_amount` as written.
+    """
+    amount = re.search(r'Expected Amount:\s*([\d,]+)', prompt)
+    month = re.search(r'Expected Month:.*\((\d+)\)', prompt)
+    phone = re.search(r'Expected Phone:\s*"(\d*)"', prompt)
+    phone_digits = phone.group(1) if phone else receipt_phone
+    return {
+        "extracted_name": receipt_name,
+        "extracted_phone": phone_digits,
+        "extracted_phone_last4": phone_digits[-4:],
+        "extracted_amount": int(amount.group(1).replace(',', '')) if amount else 0,
+        "written_amount": receipt_amount,
+        "extracted_month": int(month.group(1)) if month else None,
+        "extracted_transaction_id": None,
+        "has_complete_date": True,
+        "has_signature": True,
+        "has_stamp": True,
+        "is_authentic": True,
+        "identity_match": True,
+        "phone_matched": bool(phone_digits),
+        "last4_matched": False,
+        "name_matched": False,
+        "confidence": 0.95,
+        "reason": "fake_gemini"
+    }
+
+
+class FakeGeminiConfig:
+    """Mutable behaviour knobs, shared by all handler threads"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503,
+                 receipt_phone: str = '', receipt_name: str = '', receipt_amount: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # What an identification prompt (no plan context) "reads" off the receipt
+        self.receipt_phone = receipt_phone
+        self.receipt_name = receipt_name
+        self.receipt_amount = receipt_amount
+        self.requests = 0
+
+
+def make_handler(config: FakeGeminiConfig):
+    class FakeGeminiHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output clean
+
+        def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            config.requests += 1
+
+            time.sleep(max(0.0, config.latency + random.uniform(-config.jitter, config.jitter)))
+
+            if not self.path.split("?")[0].endswith(":generateContent"):
+                self._send(404, {"error": {"code": 404, "message": "Not found"}})
+                return
+            if config.error_rate and random.random() < config.error_rate:
+                self._send(config.error_status,
+                           {"error": {"code": config.error_status, "message": "Injected failure"}},
+                           headers={"Retry-After": "1"} if config.error_status == 429 else None)
+                return
+
+            prompt = "\n".join(
+                part.get("text", "")
+                for content in [request.get("system_instruction") or {}] + request.get("contents", [])
+                for part in content.get("parts", [])
+            )
+            text = json.dumps(fake_extraction(prompt, config.receipt_phone, config.receipt_name, config.receipt_amount))
+            self._send(200, {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]})
+
+    return FakeGeminiHandler
+
+
+def start_fake_server(host: str = "127.0.0.1", port: int = 0,
+                      config: Optional[FakeGeminiConfig] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the fake server on a background thread. Returns (server, base_url)"""
+    config = config or FakeGeminiConfig()
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Gemini generateContent server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- random seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of failed responses")
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    cfg = FakeGeminiConfig(args.latency, args.jitter, args.error_rate, args.error_status)
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(cfg))
+    print(f"Fake Gemini listening on http://{args.host}:{args.port}")
+    httpd.serve_forever()
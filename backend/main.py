@@ -4,31 +4,60 @@ Main application with Auth, Manager, and Admin routes
 """
 import os
 import json
+import asyncio
 import re
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List
+from typing import Any, Optional, List, Dict
 
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Query, Query
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Query, Query, Request, Response
+from fastapi.responses import PlainTextResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
+from sqlalchemy import func, text
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import google.generativeai as genai
 
 from .database import get_db, engine, Base
-from .models import User, MasterPlan, Payment
+from .models import User, MasterPlan, Payment, PlanStatus
 from .auth import (
     authenticate_user,
     create_access_token,
+    create_stream_token,
     get_current_user,
     get_current_admin,
-    get_password_hash
+    get_stream_user,
+    get_password_hash,
+    STREAM_TOKEN_EXPIRE_SECONDS
 )
-from .services import process_excel_file
+from .services import import_plan_file, IMPORT_ENGINES, DEFAULT_IMPORT_ENGINE
+from .plan_validation import dry_run_plan_file
+from .plan_rollover import rollover_month, RolloverError
+from .statements import reconcile_statement, StatementError
+from .payments import append_payment, supersede_payments, payment_history
+from .plan_status import status_for_balance, plan_status_label, parse_status_label
+from .read_path import doctor_list_response, doctor_changes_response
+from .sync import plan_changes
+from .dashboard import dashboard_response, DASHBOARD_SECTIONS
+from .search_index import name_filter, search_response
+from .extractions import extraction_from_result, extraction_summary, query_extractions, MATCH_FILTERS
+from .access_scope import manager_scope, user_scope
+from .events import get_broker, plan_event, reload_event, event_stream
+from .review_queue import (
+    enqueue_review, claim_items, extend_lease, release_item, resolve_item, queue_stats,
+    ReviewLeaseError, REVIEW_MIN_CONFIDENCE, REVIEW_LEASE_SECONDS
+)
+from .ai_client import get_ai_client, AIClientError
+from .model_router import get_model_router
+from .prompts import build_forensic_prompt, build_identify_prompt, MONTH_NAMES
+from .plan_matching import apply_plan_match, match_receipt, MAX_CANDIDATES
+from .ocr import run_ocr_prepass, ocr_fallback, ocr_stats
+from .dedupe import dhash, hash_to_hex, proof_index, identical_proof, DUPLICATE_MAX_DISTANCE
+from .metrics import registry, StageTimer, RequestMetricsMiddleware, instrument_engine
 
 # Load environment variables
 load_dotenv()
@@ -48,6 +77,10 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Per-route request / SQL metrics and the Server-Timing header
+instrument_engine(engine)
+app.add_middleware(RequestMetricsMiddleware)
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -63,7 +96,7 @@ app.add_middleware(
 )
 
 # Create uploads directory
-UPLOADS_DIR = Path(__file__).parent / "uploads"
+UPLOADS_DIR = Path(os.getenv("UPLOADS_DIR") or Path(__file__).parent / "uploads")
 UPLOADS_DIR.mkdir(exist_ok=True)
 
 # Mount static files
@@ -100,14 +133,19 @@ class DoctorResponse(BaseModel):
     planned_type: str
     month: int
     status: str
+    status_code: str = "pending"
     proof_image: Optional[str] = None
     amount_paid: Optional[int] = 0
+    payment_count: int = 0
 
 class VerifyResponse(BaseModel):
     success: bool
     message: str
     extracted_amount: int
     new_status: str
+    review_id: Optional[int] = None  # Set when the receipt was sent to the review queue
+    plan_id: Optional[int] = None  # /manager/verify/auto: the plan the receipt was matched to
+    matched_by: Optional[str] = None  # ... and how (see plan_matching.py)
 
 class StatsResponse(BaseModel):
     total_doctors: int
@@ -116,6 +154,7 @@ class StatsResponse(BaseModel):
     total_debt: int
     pending_count: int
     verified_count: int
+    status_counts: Dict[str, int] = {}
 
 
 # ==================== AUTH ROUTES ====================
@@ -154,127 +193,39 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
 
 @app.get("/manager/doctors", response_model=List[DoctorResponse])
 async def get_manager_doctors(
+    request: Request,
     month: Optional[int] = Query(None, description="Month filter (1-12)"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get doctors assigned to current manager based on company, region, and group"""
-    
-    # Handle multi-region access (comma-separated regions)
-    user_regions = [r.strip() for r in current_user.region.split(',')] if current_user.region else []
-    
-    # Base query
-    query = db.query(MasterPlan).filter(
-        MasterPlan.company == current_user.company
-    )
-    
-    # Apply region filter (support multiple regions)
-    if len(user_regions) == 1:
-        query = query.filter(MasterPlan.region == user_regions[0])
-    elif len(user_regions) > 1:
-        query = query.filter(MasterPlan.region.in_(user_regions))
+    # Company / region / group / district rules live in access_scope.py (shared with live events)
+    query = manager_scope(current_user).apply(db.query(MasterPlan))
     
     # Apply month filter if provided
     if month:
         query = query.filter(MasterPlan.month == month)
     
-    # ===== COMPANY-SPECIFIC GROUP LOGIC =====
-    
-    if current_user.company == 'Synergy':
-        # Synergy: A, B, C, A2, B2, AB, A2C, A2CB2 groups
-        if current_user.group_access == 'ALL':
-            pass  # Return all (A, B, C, A2, B2)
-        elif current_user.group_access == 'AB':
-            query = query.filter(MasterPlan.group_name.in_(['A', 'B', 'AB']))
-        elif current_user.group_access == 'A2C':
-            query = query.filter(MasterPlan.group_name.in_(['A2', 'C', 'A2C']))
-        elif current_user.group_access == 'A2CB2':
-            # A2, C, and B2 combined access
-            query = query.filter(MasterPlan.group_name.in_(['A2', 'C', 'A2C', 'B2']))
-        elif current_user.group_access == 'B2':
-            query = query.filter(MasterPlan.group_name == 'B2')
-        else:
-            query = query.filter(MasterPlan.group_name == current_user.group_access)
-    
-    elif current_user.company == 'Amare':
-        # Amare: VITA, FORTE groups with district-based Toshkent
-        if current_user.group_access == 'ALL':
-            # Return all vita and forte
-            query = query.filter(MasterPlan.group_name.in_(['VITA', 'FORTE']))
-        elif current_user.group_access == 'VITA':
-            query = query.filter(MasterPlan.group_name == 'VITA')
-        elif current_user.group_access == 'FORTE':
-            query = query.filter(MasterPlan.group_name == 'FORTE')
-        elif current_user.group_access in ['VITA1', 'VITA2', 'FORTE1', 'FORTE2']:
-            # Toshkent City district-based filtering
-            # VITA1/FORTE1 districts: Бектемир, Қибрай, Мирзо Улуғбек, Миробод, Сирғали, Юнусобод, Янгиҳаёт, Яшнобод
-            # VITA2/FORTE2 districts: Олмазор, Келес, Назарбек, Учтепа, Чилонзор, Шайхонтохур, Эшонгузар, Яккасарой
-            
-            # Use LIKE with wildcards to handle variations like "Келес шаҳри", "Назарбек шаҳарча", etc.
-            districts_1 = ['Бектемир', 'Қибрай', 'Мирзо Улуғбек', 'Миробод', 'Сирғали', 'Юнусобод', 'Янгиҳаёт', 'Яшнобод']
-            districts_2 = ['Олмазор', 'Келес', 'Назарбек', 'Учтепа', 'Чилонзор', 'Шайхонтохур', 'Эшонгузар', 'Яккасарой']
-            
-            if current_user.group_access == 'VITA1':
-                query = query.filter(MasterPlan.group_name == 'VITA')
-                # Use OR conditions with LIKE for case-insensitive partial matching
-                district_conditions = [MasterPlan.district.like(f'%{d}%') for d in districts_1]
-                query = query.filter(or_(*district_conditions))
-            elif current_user.group_access == 'VITA2':
-                query = query.filter(MasterPlan.group_name == 'VITA')
-                district_conditions = [MasterPlan.district.like(f'%{d}%') for d in districts_2]
-                query = query.filter(or_(*district_conditions))
-            elif current_user.group_access == 'FORTE1':
-                query = query.filter(MasterPlan.group_name == 'FORTE')
-                district_conditions = [MasterPlan.district.like(f'%{d}%') for d in districts_1]
-                query = query.filter(or_(*district_conditions))
-            elif current_user.group_access == 'FORTE2':
-                query = query.filter(MasterPlan.group_name == 'FORTE')
-                district_conditions = [MasterPlan.district.like(f'%{d}%') for d in districts_2]
-                query = query.filter(or_(*district_conditions))
-        else:
-            query = query.filter(MasterPlan.group_name == current_user.group_access)
-    
-    elif current_user.company == 'Galassiya':
-        # Galassiya: NO groups - region-only filtering
-        # Managers see ALL doctors in their assigned regions
-        # No group filter applied - they see everything in the region
-        pass
-    
-    elif current_user.company == 'Perfetto':
-        # Perfetto: NO groups - region-only filtering (same as Galassiya)
-        # Managers see ALL doctors in their assigned regions
-        # No group filter applied - they see everything in the region
-        pass
-    
-    else:
-        # Default: exact match for other companies
-        if current_user.group_access != 'ALL':
-            query = query.filter(MasterPlan.group_name == current_user.group_access)
-    
-    doctors = query.all()
-    
-    return [
-        DoctorResponse(
-            id=d.id,
-            company=d.company,
-            region=d.region,
-            district=d.district or '',
-            group_name=d.group_name,
-            manager_name=d.manager_name or '',
-            doctor_name=d.doctor_name,
-            specialty=d.specialty or '',
-            workplace=d.workplace or '',
-            phone=d.phone or '',
-            card_number=d.card_number or '',
-            target_amount=d.target_amount,
-            planned_type=d.planned_type,
-            month=d.month,
-            status=d.status,
-            proof_image=sorted(d.payments, key=lambda x: x.verified_at or datetime.min, reverse=True)[0].proof_image_path if d.payments else None,
-            amount_paid=sorted(d.payments, key=lambda x: x.verified_at or datetime.min, reverse=True)[0].amount_paid if d.payments else 0
-        )
-        for d in doctors
-    ]
+    # Column-only select + slotted rows encoded straight to bytes (see read_path.py)
+    return await asyncio.to_thread(doctor_list_response, request, db, query)
+
+
+@app.get("/manager/doctors/changes")
+async def get_manager_doctor_changes(
+    request: Request,
+    since: int = Query(0, ge=0, description="Highest version the client has (0 = everything)"),
+    month: Optional[int] = Query(None, description="Month filter (1-12)"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Delta sync for /manager/doctors: rows inserted or updated after `since` (same
+    shape as the list), ids deleted after it, and the new `version` to send next
+    time. Apply `deleted` first, then `upserted`. reset=true means the server
+    did not recognize `since`: replace the local list with `upserted`.
+    """
+    changes = plan_changes(db, manager_scope(current_user), since, month)
+    return await asyncio.to_thread(doctor_changes_response, request, db, changes)
 
 # Helper function for saving files
 async def save_proof_file(file: UploadFile, plan: MasterPlan) -> str:
@@ -306,6 +257,8 @@ async def save_proof_file(file: UploadFile, plan: MasterPlan) -> str:
 
 @app.post("/manager/verify", response_model=VerifyResponse)
 async def verify_payment(
+    request: Request,
+    response: Response,
     file: UploadFile = File(...),
     plan_id: int = Form(...),
     payment_method: str = Form(...),
@@ -314,8 +267,13 @@ async def verify_payment(
 ):
     """Verify payment using Forensic AI"""
     
+    # Per-stage timings -> /metrics histograms and the Server-Timing header
+    timer = StageTimer("verify")
+    request.state.timer = timer
+    
     # Get the plan item
-    plan = db.query(MasterPlan).filter(MasterPlan.id == plan_id).first()
+    with timer.stage("plan_lookup"):
+        plan = db.query(MasterPlan).filter(MasterPlan.id == plan_id).first()
     if not plan:
         raise HTTPException(status_code=404, detail="Plan not found")
     
@@ -323,226 +281,103 @@ async def verify_payment(
     if plan.company != current_user.company or plan.region != current_user.region:
         raise HTTPException(status_code=403, detail="Access denied to this plan")
     
-    # ===== STEP A: Storage Strategy =====
-    relative_path = await save_proof_file(file, plan)
+    with timer.stage("file_read"):
+        content = await file.read()
+        await file.seek(0)
     
-    # Read content again for AI (since save_proof_file reset cursor)
-    content = await file.read()
+    image_hash, matches = await check_duplicate_image(db, content, timer)
+    return await verify_receipt_for_plan(response, timer, db, plan, file, content, payment_method, image_hash, matches)
+
+
+async def check_duplicate_image(db: Session, content: bytes, timer: StageTimer):
+    """
+    Reject an exact copy of an image already submitted (HTTP 400). Returns
+    (image_hash, near matches) for the verification to weigh after extraction.
+    """
+    # ===== STEP A0: Duplicate Image Check (before any AI cost) =====
+    with timer.stage("image_hash"):
+        image_hash = await asyncio.to_thread(dhash, content)
+    matches = []
+    if image_hash is not None:
+        with timer.stage("duplicate_image_lookup"):
+            matches = proof_index.find_duplicates(db, image_hash)
+            # Templated app screenshots hash alike, so only the same file is certain
+            existing_payment = await asyncio.to_thread(identical_proof, db, content, image_hash, UPLOADS_DIR)
+        if existing_payment:
+            existing_plan = existing_payment.plan
+            doctor_info = existing_plan.doctor_name if existing_plan else "Unknown"
+            raise HTTPException(
+                status_code=400,
+                detail=f"❌ REJECTED: Duplicate Receipt. This image matches a receipt already submitted for doctor: {doctor_info}. Each receipt can only be submitted once."
+            )
+    return image_hash, matches
+
+
+def usable_amount(value) -> Optional[int]:
+    """The model's extracted_amount as a positive whole number, else None"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        return None
+    return value
+
+
+async def verify_receipt_for_plan(
+    response: Response, timer: StageTimer, db: Session, plan: MasterPlan, file: UploadFile,
+    content: bytes, payment_method: str, image_hash, matches, ai_result: Optional[Dict[str, Any]] = None
+) -> VerifyResponse:
+    """
+    Store the receipt, read it with OCR / Forensic AI against `plan` (unless `ai_result`
+    already holds the reading), apply the gatekeeper rules and record it
+    """
+    # ===== STEP A: Storage Strategy =====
+    with timer.stage("file_save"):
+        relative_path = await save_proof_file(file, plan)
     
     # ===== STEP B: Forensic AI Prompt =====
     try:
         import base64
         
-        # Prepare image for Gemini
-        base64_image = base64.b64encode(content).decode('utf-8')
-        mime_type = file.content_type or 'image/jpeg'
-        
-        # Build the forensic prompt
-        mode = "Cash/Paper" if payment_method.lower() == "cash" else "Card/Click"
+        # Clean Card/Click screenshots can be verified locally without a model call
+        if ai_result is None:
+            with timer.stage("ocr"):
+                ai_result = await run_ocr_prepass(content, plan, payment_method)
         
-        # Month names for prompt
-        month_names = {
-            1: 'January', 2: 'February', 3: 'March', 4: 'April',
-            5: 'May', 6: 'June', 7: 'July', 8: 'August',
-            9: 'September', 10: 'October', 11: 'November', 12: 'December'
-        }
-        expected_month_name = month_names.get(plan.month, 'Unknown')
-        
-        # Determine Currency and Rules
-        is_dollar_plan = False
-        if plan.planned_type and ('dollar' in plan.planned_type.lower() or 'usd' in plan.planned_type.lower()):
-            is_dollar_plan = True
-            currency_label = "USD (Dollars)"
+        if ai_result is None:
+            # Prepare image for Gemini
+            with timer.stage("base64"):
+                base64_image = base64.b64encode(content).decode('utf-8')
+            mime_type = file.content_type or 'image/jpeg'
             
-            # DOLLAR SPECIFIC RULES
-            amount_logic = """
-6. **AMOUNT EXTRACTION (DOLLAR MODE - CRITICAL)**:
-   - This is a DOLLAR ($) Transaction.
-   - Expected Amount is around: $ {plan.target_amount}
-   
-   **WHERE TO LOOK FOR AMOUNT (check ALL of these fields):**
-   - "Рекомендация:" (Recommendation) - PRIMARY location
-   - "Количество:" (Quantity) - SECONDARY location, often shows numbers like "3000 МЛ"
-   - "Подпись:" (Signature area) - sometimes amount is written near signature
-   - "Сумма:" (Sum) - if present
-   
-   - The written amount is usually the EXACT number (e.g., "50", "150", "200").
-   - DO NOT multiply by 1000.
-   - DO NOT treat as thousands.
-   - Extract the exact numeric value found.
-"""
-        else:
-            is_dollar_plan = False
-            currency_label = "UZS (So'm)"
+            # Static instructions are precompiled; only the plan's CONTEXT is rendered here
+            with timer.stage("prompt_build"):
+                prompt = build_forensic_prompt(plan, payment_method)
             
-            # UZS SPECIFIC RULES
-            amount_logic = """
-6. **AMOUNT EXTRACTION (UZS MODE - CRITICAL)**:
-   - This is a UZS (Sum) Transaction.
-   - Expected Amount is around: {plan.target_amount:,} UZS
-   
-   **WHERE TO LOOK FOR AMOUNT (check ALL of these fields - IMPORTANT!):**
-   - "Рекомендация:" (Recommendation) - PRIMARY location
-   - "Количество:" (Quantity) - SECONDARY location, often shows numbers like "3000 МЛ" or "3000"
-   - "Подпись:" (Signature area) - sometimes amount is written near signature
-   - "Сумма:" (Sum) - if present
-   
-   **IMPORTANT**: If "Количество" shows something like "3000 МЛ" or "3000", this IS the amount!
-   Ignore "МЛ" (milliliters label) - extract just the number.
-   
-   **SMART CONVERSION LOGIC (Paper Checks)**:
-    Doctors write numbers in different ways. You must deduce the intent based on the Expected Amount ({plan.target_amount:,}).
-   
-   If you find a small number like "100", "50", "200", "3000":
-   
-   A) **Standard Shorthand (x 1,000)**:
-      * "100" means 100,000 UZS.
-      * "500" means 500,000 UZS.
-      * "3000" means 3,000,000 UZS (3 million).
-      * USE THIS IF: (Found Value * 1000) is close to Expected Amount.
-   
-   B) **Dollar-to-Sum Conversion (x 12,000)**:
-      * Sometimes "100$" or just "100" means 100 DOLLARS worth of Sum.
-      * Rate: 1 USD ≈ 12,000 UZS.
-      * "100" or "100$" -> 1,200,000 UZS.
-      * "50" or "50$" -> 600,000 UZS.
-      * USE THIS IF: (Found Value * 12000) is close to Expected Amount.
-   
-   **DECISION RULES:**
-   - "100" with Expected ~100,000 -> Result is 100,000.
-   - "100" with Expected ~1,200,000 -> Result is 1,200,000.
-   - "3000" with Expected ~3,000,000 -> Result is 3,000,000.
-   - "50" with Expected ~50,000 -> Result is 50,000.
-   - "50" with Expected ~600,000 -> Result is 600,000.
-   
-   ALWAYS return the calculated UZS value (e.g. 3000000), not the small number.
-"""
-
-        forensic_prompt = f"""
-ROLE: Senior Forensic Auditor. Verify this Uzbek payment receipt (РЕЦЕПТ).
-
-CONTEXT:
-- Expected Doctor Name: "{plan.doctor_name}"
-- Expected Phone: "{plan.phone}"
-- Expected Amount: {plan.target_amount}
-- Payment Mode: {mode}
-- Expected Currency: {currency_label}
-- Expected Month: {expected_month_name} ({plan.month})
-
-CRITICAL RULES:
-
-1. **PHONE NUMBER EXTRACTION (HIGHEST PRIORITY)**:
-   - CAREFULLY look for phone numbers near "Телефон:", "Tel:", "Phone:" or similar labels
-   - Uzbek phone formats: (XX) XXX XXXX, +998XXXXXXXXX, 8X XXX XXXX, 9X XXX XXXX
-   - EXTRACT ALL DIGITS you can read, even if partially unclear
-   - Common prefixes: 80, 90, 91, 93, 94, 95, 97, 98, 99, 88, 33, 71
-   - If you see something like "(80) 903 9992" or "80 903 9992", extract as "809039992"
-   - IGNORE spaces, dashes, parentheses - just get the digits
-   - Put the raw digits in extracted_phone field
-   - **ALSO extract the LAST 4 READABLE DIGITS separately** into `extracted_phone_last4` field
-   - Even if the full number is messy, try to read at least the last 4 digits clearly
-
-2. **IDENTITY VERIFICATION (SOFT MATCHING FOR MESSY HANDWRITING)**:
-   - Doctor handwriting is often messy. Use this SOFT matching approach:
-   
-   **MATCH PRIORITY (in order):**
-   a) FULL PHONE MATCH: Compare extracted phone with expected phone "{plan.phone}"
-      - Normalize both: remove +998, spaces, dashes, parentheses
-      - Match if last 9 digits are the same → identity_match = true
-   
-   b) LAST 4 DIGITS FALLBACK: If full phone is unclear/doesn't match:
-      - Compare the last 4 digits of extracted_phone_last4 with the last 4 digits of "{plan.phone}"
-      - If they match → identity_match = true, set `last4_matched = true`
-      - This is for receipts where most of the number is messy but the last 4 are readable
-   
-   c) NAME MATCH: If phone methods don't work:
-      - Fuzzy match the name (Latin/Cyrillic interchangeable)
-      - Partial matches OK: "Саид" matches "Саидова"
-      - If name matches → identity_match = true
-   
-   **FINAL RULE**: If ANY of the above (full phone, last 4 digits, OR name) matches → identity_match = true
-
-3. **NAME EXTRACTION (SECONDARY)**:
-   - Look for name near "Ф.И.О врача:", "ФИО:", "Врач:", "Shifokor:"
-   - Handwritten names may be hard to read - extract what you can
-   - Latin/Cyrillic interchangeable (e.g., "Саидова" = "Saidova")
-   - Partial matches are OK: "Саид" matches "Саидова"
-
-4. DATE VALIDATION (EXTREMELY LENIENT for Handwriting):
-   - CRITICAL: Doctors have messy handwriting. Do NOT be strict.
-   - If the date lines have ANY ink, scribbles, or marks -> set `has_complete_date = true`.
-   - ONLY return `has_complete_date = false` if the lines are COMPLETELY BLANK (empty underscores with no writing).
-   - MONTH MATCHING:
-     * If the month is written clearly, extract it.
-     * If the month is MESSY, AMBIGUOUS, or hard to read (e.g., looks like "11", "II", "//", "N", or just a scribble), ASSUME it matches the Expected Month ({plan.month})!
-     * Set `extracted_month = {plan.month}` if there is any doubt.
-
-5. AUTHENTICITY CHECK (for Cash/Paper receipts only):
-   - If payment mode is "Cash/Paper":
-     * Look for handwritten SIGNATURE near 'Imzo', 'Подпись'
-     * Look for official INK STAMP (blue/purple circle with text/logo)
-     * If signature found -> has_signature = true, else false
-     * If stamp found -> has_stamp = true, else false
-     * If EITHER signature OR stamp found -> is_authentic = true
-     * If BOTH are missing -> is_authentic = false
-   - If payment mode is "Card/Click":
-     * Signature and stamp are NOT required
-     * Set has_signature = true, has_stamp = true, is_authentic = true (bypass check)
-
-{amount_logic}
-
-7. TRANSACTION ID EXTRACTION (for duplicate detection):
-   - Look for "ID транзакции", "Transaction ID", "Чек №", "Check #", or similar fields
-   - Extract the full numeric/alphanumeric transaction identifier
-   - Common locations: near bottom of receipt, labeled as ID, Transaction, or Check number
-   - If found, include in extracted_transaction_id field
-
-OUTPUT STRICTLY AS JSON (no markdown, no explanation):
-{{
-    "extracted_name": "name found on receipt (even if unclear)",
-    "extracted_phone": "all phone digits you can read (e.g. 809039992)",
-    "extracted_phone_last4": "last 4 readable digits of phone (e.g. 9992)",
-    "extracted_amount": 500000,
-    "extracted_month": 11,
-    "extracted_transaction_id": "290022691",
-    "has_complete_date": true,
-    "has_signature": true,
-    "has_stamp": true,
-    "is_authentic": true,
-    "identity_match": true,
-    "phone_matched": true,
-    "last4_matched": false,
-    "name_matched": false,
-    "confidence": 0.95,
-    "reason": "Brief explanation of how identity was verified (full phone, last 4 digits, or name)"
-}}
-"""
-        
-        # Call Gemini
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content([
-            {"mime_type": mime_type, "data": base64_image},
-            forensic_prompt
-        ])
-        
-        # Parse response
-        response_text = response.text.strip()
-        # Clean markdown if present
-        if response_text.startswith('```'):
-            response_text = re.sub(r'^```json?\s*', '', response_text)
-            response_text = re.sub(r'\s*```$', '', response_text)
-        
-        ai_result = json.loads(response_text)
+            # Call Gemini through the router (hedged / fallback routes over the shared client)
+            with timer.stage("ai_call"):
+                ai_result, route_info = await get_model_router().extract(
+                    [{"mime_type": mime_type, "data": base64_image}, prompt.context],
+                    system_instruction=prompt.system_instruction,
+                    local_extractor=ocr_fallback(content, plan, payment_method)
+                )
+            timer.record("json_parse", route_info.pop("parse_seconds", 0.0))
+            ai_result["ai_route"] = route_info
         
-    except Exception as e:
-        # AI failed - log and continue with manual review flag
-        ai_result = {
-            "extracted_amount": 0,
-            "extracted_month": None,
-            "is_authentic": None,
-            "identity_match": None,
-            "error": str(e)
-        }
+    except (AIClientError, ValueError) as e:
+        # AI failed - never record a zero payment; the saved receipt goes to an admin instead
+        with timer.stage("review_enqueue"):
+            item = enqueue_review(
+                db, plan, 'ai_unavailable', payment_method, relative_path,
+                image_hash=hash_to_hex(image_hash) if image_hash is not None else None, error=str(e)
+            )
+        response.status_code = 202
+        return VerifyResponse(
+            success=True,
+            message="⏳ AI verification is unavailable right now. The receipt was sent to an admin for review.",
+            extracted_amount=0,
+            new_status=plan_status_label(plan),
+            review_id=item.id
+        )
     
     # ===== STEP C: Gatekeeper Logic =====
     
@@ -584,12 +419,7 @@ OUTPUT STRICTLY AS JSON (no markdown, no explanation):
     # Rule 5: Month validation (use plan's actual month) - for all payment types
     extracted_month = ai_result.get("extracted_month")
     if extracted_month is not None and extracted_month != plan.month:
-        month_names = {
-            1: 'January', 2: 'February', 3: 'March', 4: 'April',
-            5: 'May', 6: 'June', 7: 'July', 8: 'August',
-            9: 'September', 10: 'October', 11: 'November', 12: 'December'
-        }
-        expected_name = month_names.get(plan.month, str(plan.month))
+        expected_name = MONTH_NAMES.get(plan.month, str(plan.month))
         raise HTTPException(
             status_code=400,
             detail=f"❌ REJECTED: Wrong Month. Found {extracted_month or 'nothing'}, expected {expected_name} ({plan.month})."
@@ -606,9 +436,10 @@ OUTPUT STRICTLY AS JSON (no markdown, no explanation):
     extracted_transaction_id = ai_result.get("extracted_transaction_id")
     if extracted_transaction_id:
         # Check if this transaction ID was already used
-        existing_payment = db.query(Payment).filter(
-            Payment.transaction_id == str(extracted_transaction_id)
-        ).first()
+        with timer.stage("duplicate_query"):
+            existing_payment = db.query(Payment).filter(
+                Payment.transaction_id == str(extracted_transaction_id)
+            ).first()
         if existing_payment:
             # Find the plan associated with the existing payment
             existing_plan = db.query(MasterPlan).filter(MasterPlan.id == existing_payment.plan_id).first()
@@ -618,34 +449,92 @@ OUTPUT STRICTLY AS JSON (no markdown, no explanation):
                 detail=f"❌ REJECTED: Duplicate Receipt. This transaction ID ({extracted_transaction_id}) was already used for doctor: {doctor_info}. Each receipt can only be submitted once."
             )
     
-    # ===== STEP D: Database Update =====
+    extracted_amount = usable_amount(ai_result.get("extracted_amount"))
+    
+    # Near (but not certain) image matches are kept in the log for the admin to review
+    if image_hash is not None and matches:
+        ai_result["possible_duplicate_of"] = [
+            {"payment_id": payment_id, "distance": distance} for distance, payment_id in matches[:5]
+        ]
+    
+    # A close image match is only cleared by a fresh transaction ID (Rule 7 rejected a reused one);
+    # paper receipts and screenshots without an ID go to an admin instead of being recorded twice
+    close_match = bool(matches) and matches[0][0] <= DUPLICATE_MAX_DISTANCE
+    if close_match and (payment_method.lower() == "cash" or not extracted_transaction_id):
+        with timer.stage("review_enqueue"):
+            item = enqueue_review(
+                db, plan, 'possible_duplicate', payment_method, relative_path, ai_result=ai_result,
+                image_hash=hash_to_hex(image_hash)
+            )
+        response.status_code = 202
+        return VerifyResponse(
+            success=True,
+            message="🔎 This receipt looks like one already submitted. Sent to an admin for review.",
+            extracted_amount=extracted_amount or 0,
+            new_status=plan_status_label(plan),
+            review_id=item.id
+        )
+    
+    # Low-confidence answers are decided by a human, not recorded silently
+    confidence = ai_result.get("confidence")
+    if isinstance(confidence, (int, float)) and confidence < REVIEW_MIN_CONFIDENCE:
+        with timer.stage("review_enqueue"):
+            item = enqueue_review(
+                db, plan, 'low_confidence', payment_method, relative_path, ai_result=ai_result,
+                image_hash=hash_to_hex(image_hash) if image_hash is not None else None
+            )
+        response.status_code = 202
+        return VerifyResponse(
+            success=True,
+            message=f"🔎 Receipt read with low confidence ({confidence:.0%}). Sent to an admin for review.",
+            extracted_amount=extracted_amount or 0,
+            new_status=plan_status_label(plan),
+            review_id=item.id
+        )
     
-    extracted_amount = ai_result.get("extracted_amount", 0)
-    difference = plan.target_amount - extracted_amount
+    # ===== STEP D: Database Update =====
     
-    # Determine status
-    if difference == 0:
-        new_status = "✅ Verified"
-    elif difference > 0:
-        new_status = f"⚠️ Underpaid (Debt: {difference:,} UZS)"
-    else:
-        new_status = f"⚠️ Overpaid (+{abs(difference):,} UZS)"
+    # No usable amount (missing, null, "500,000", zero): an admin enters it, nothing is recorded
+    if extracted_amount is None:
+        with timer.stage("review_enqueue"):
+            item = enqueue_review(
+                db, plan, 'no_amount', payment_method, relative_path, ai_result=ai_result,
+                image_hash=hash_to_hex(image_hash) if image_hash is not None else None
+            )
+        response.status_code = 202
+        return VerifyResponse(
+            success=True,
+            message="🔎 The amount could not be read from the receipt. Sent to an admin for review.",
+            extracted_amount=0,
+            new_status=plan_status_label(plan),
+            review_id=item.id
+        )
     
     # Create payment record with transaction_id for duplicate detection
     payment = Payment(
-        plan_id=plan.id,
         amount_paid=extracted_amount,
         proof_image_path=relative_path,
         payment_method=payment_method,
         verified_at=datetime.utcnow(),
         ai_log=json.dumps(ai_result),
-        transaction_id=str(extracted_transaction_id) if extracted_transaction_id else None
+        extraction=extraction_from_result(ai_result),
+        transaction_id=str(extracted_transaction_id) if extracted_transaction_id else None,
+        image_hash=hash_to_hex(image_hash) if image_hash is not None else None
     )
-    db.add(payment)
+    # Appended to the plan's history; paid_total now includes this receipt
+    with timer.stage("payment_append"):
+        append_payment(db, plan, payment)
     
     # Update plan status
-    plan.status = new_status
-    db.commit()
+    plan.status_code = status_for_balance(plan.target_amount, plan.paid_total)
+    plan.status_note = None
+    new_status = plan_status_label(plan)
+    with timer.stage("db_commit"):
+        db.commit()
+    
+    if image_hash is not None:
+        proof_index.add(image_hash, payment.id)
+    get_broker().publish(plan_event(plan))
     
     return VerifyResponse(
         success=True,
@@ -655,38 +544,239 @@ OUTPUT STRICTLY AS JSON (no markdown, no explanation):
     )
 
 
+@app.post("/manager/verify/auto", response_model=VerifyResponse)
+async def verify_payment_auto(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    payment_method: str = Form(...),
+    month: int = Form(..., ge=1, le=12),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Verify a receipt without choosing the doctor first. The phone (or its last 4
+    digits) read off the receipt finds the plan among the manager's plans for
+    `month` (plan_matching.py); with exactly one candidate the receipt is verified
+    as /manager/verify would, from the same single model reading. No match -> 404,
+    several -> 409 naming them.
+    """
+    import base64
+    
+    timer = StageTimer("verify_auto")
+    request.state.timer = timer
+    
+    with timer.stage("file_read"):
+        content = await file.read()
+        await file.seek(0)
+    image_hash, matches = await check_duplicate_image(db, content, timer)
+    
+    # One plan-less model call reads who the receipt is for and everything the gatekeeper checks
+    try:
+        prompt = build_identify_prompt(payment_method, month)
+        with timer.stage("identify"):
+            identity, route_info = await get_model_router().extract(
+                [{"mime_type": file.content_type or 'image/jpeg', "data": base64.b64encode(content).decode('utf-8')},
+                 prompt.context],
+                system_instruction=prompt.system_instruction
+            )
+    except (AIClientError, ValueError):
+        raise HTTPException(
+            status_code=503,
+            detail="⏳ AI is unavailable right now, so the doctor could not be matched. Select the doctor and upload again."
+        )
+    
+    phone = identity.get("extracted_phone") or identity.get("extracted_phone_last4")
+    with timer.stage("plan_match"):
+        match = match_receipt(
+            db, manager_scope(current_user), month, identity.get("extracted_phone"),
+            identity.get("extracted_phone_last4"), identity.get("extracted_name")
+        )
+    if not match.plans:
+        raise HTTPException(
+            status_code=404,
+            detail=f"❌ No doctor in your {MONTH_NAMES.get(month, month)} plan matches this receipt (phone: {phone or 'not readable'}). Select the doctor manually."
+        )
+    if len(match.plans) > 1:
+        names = ", ".join(f"{p.doctor_name} (#{p.id})" for p in match.plans[:MAX_CANDIDATES])
+        raise HTTPException(
+            status_code=409,
+            detail=f"⚠️ Several doctors match this receipt: {names}. Select the doctor manually."
+        )
+    
+    timer.record("json_parse", route_info.pop("parse_seconds", 0.0))
+    
+    # The plan-dependent checks (identity, shorthand amounts) are applied locally, not by a second model call
+    plan = match.plans[0]
+    ai_result = apply_plan_match(identity, plan, match.matched_by)
+    ai_result["ai_route"] = route_info
+    result = await verify_receipt_for_plan(
+        response, timer, db, plan, file, content, payment_method, image_hash, matches, ai_result=ai_result
+    )
+    result.plan_id = plan.id
+    result.matched_by = match.matched_by
+    return result
+
+
 # ==================== ADMIN ROUTES ====================
 
 @app.post("/admin/upload-plan")
 async def upload_plan(
+    request: Request,
     file: UploadFile = File(...),
     company_name: str = Form(...),
     month: int = Form(12),
+    engine: str = Form(DEFAULT_IMPORT_ENGINE),
+    dry_run: bool = Form(False),
     current_user: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
-    """Upload Excel file to populate master_plan table"""
+    """
+    Upload a plan file (XLSX, CSV, Parquet, or a zip of them - detected from
+    content/extension) to populate master_plan table. Every sheet is imported and
+    all rows go in as one transaction. engine ('row' or 'columnar') applies to
+    single-sheet XLSX.
+    
+    dry_run=true parses and validates without writing and returns per-row
+    diagnostics plus region/group totals against last month's plan.
+    """
+    if engine not in IMPORT_ENGINES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown import engine '{engine}'. Use one of: {', '.join(IMPORT_ENGINES)}"
+        )
+    
+    timer = StageTimer("upload_plan")
+    request.state.timer = timer
     
     # Read file content
-    content = await file.read()
+    with timer.stage("file_read"):
+        content = await file.read()
     
-    # Process Excel
-    result = process_excel_file(content, company_name, db, month)
+    if dry_run:
+        result = await asyncio.to_thread(
+            dry_run_plan_file, content, company_name, db, month, filename=file.filename, timer=timer
+        )
+        if not result['success']:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Failed to process file: {result['errors']}"
+            )
+        validation = result['validation']
+        result['message'] = (
+            f"Dry run: {result['would_insert_count']} records would be imported, "
+            f"{validation['rows_with_issues']} with issues"
+        )
+        return result
+    
+    # Process the file off the event loop - multi-sheet / zip imports wait on the process pool
+    result = await asyncio.to_thread(
+        import_plan_file, content, company_name, db, month, engine=engine, timer=timer,
+        filename=file.filename
+    )
     
     if not result['success']:
         raise HTTPException(
             status_code=400,
             detail=f"Failed to process file: {result['errors']}"
         )
+    get_broker().publish(reload_event(company_name, month, 'import', result['inserted_count']))
     
     return {
         "success": True,
         "message": f"Successfully imported {result['inserted_count']} records",
         "inserted_count": result['inserted_count'],
-        "errors": result['errors']
+        "errors": result['errors'],
+        "sources": result.get('sources')
     }
 
 
+@app.post("/admin/rollover-month")
+async def rollover_plan_month(
+    request: Request,
+    company_name: str = Form(...),
+    to_month: int = Form(...),
+    from_month: Optional[int] = Form(None),
+    replace: bool = Form(False),
+    delta_file: Optional[UploadFile] = File(None),
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Prepare a month by cloning the previous month's plan (INSERT ... SELECT, status
+    reset to Pending), optionally applying a delta sheet: changed rows are matched by
+    phone or name, unmatched rows are added, and a target amount of 0 drops the doctor.
+    """
+    if not 1 <= to_month <= 12 or (from_month is not None and not 1 <= from_month <= 12):
+        raise HTTPException(status_code=400, detail="Months must be between 1 and 12")
+    
+    timer = StageTimer("rollover")
+    request.state.timer = timer
+    
+    delta_content = await delta_file.read() if delta_file else None
+    try:
+        result = await asyncio.to_thread(
+            rollover_month, db, company_name, to_month, from_month=from_month,
+            delta_content=delta_content or None,
+            delta_filename=delta_file.filename if delta_file else None,
+            replace=replace, timer=timer
+        )
+    except RolloverError as e:
+        raise HTTPException(status_code=e.status, detail=f"❌ Rollover refused: {e}")
+    get_broker().publish(reload_event(
+        company_name, to_month, 'rollover', result['cloned'] + result['added'] - result['removed']
+    ))
+    
+    result["message"] = (
+        f"Month {result['to_month']} prepared from month {result['from_month']}: "
+        f"{result['cloned']} cloned, {result['updated']} updated, {result['added']} added, "
+        f"{result['removed']} removed"
+    )
+    return result
+
+
+@app.post("/admin/reconcile-statement")
+async def reconcile_card_statement(
+    request: Request,
+    file: UploadFile = File(...),
+    company_name: str = Form(...),
+    month: int = Form(...),
+    dry_run: bool = Form(False),
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Reconcile a Card/Click statement export (CSV/XLSX) against the month's plans:
+    transactions matched by card number or phone (and amount, when several plans
+    share them) are recorded as payments in bulk; the rest are listed for
+    per-receipt verification. dry_run=true reports the matches without writing.
+    """
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
+    
+    timer = StageTimer("reconcile")
+    request.state.timer = timer
+    
+    with timer.stage("file_read"):
+        content = await file.read()
+    try:
+        result = await asyncio.to_thread(
+            reconcile_statement, db, content, file.filename, company_name, month,
+            dry_run=dry_run, timer=timer
+        )
+    except StatementError as e:
+        raise HTTPException(status_code=400, detail=f"❌ Statement rejected: {e}")
+    if result['plans_updated']:
+        get_broker().publish(reload_event(company_name, month, 'statement', result['plans_updated']))
+    
+    result["message"] = (
+        f"{result['matched']} of {result['transactions']} transactions "
+        f"{'match' if dry_run else 'recorded'} ({result['matched_amount']:,} UZS); "
+        f"{result['unmatched_count']} left for receipt verification"
+    )
+    return result
+
+
 @app.get("/admin/stats", response_model=StatsResponse)
 async def get_admin_stats(
     company: Optional[str] = None,
@@ -697,8 +787,13 @@ async def get_admin_stats(
 ):
     """Get statistics for admin dashboard"""
     
-    # Base query
-    query = db.query(MasterPlan)
+    # One COUNT / SUM ... GROUP BY status_code (indexed) instead of loading every plan
+    query = db.query(
+        MasterPlan.status_code,
+        func.count(MasterPlan.id),
+        func.sum(MasterPlan.target_amount),
+        func.sum(MasterPlan.paid_total)
+    )
     
     # Apply filters
     if company:
@@ -708,35 +803,40 @@ async def get_admin_stats(
     if month:
         query = query.filter(MasterPlan.month == month)
     
-    plans = query.all()
-    
-    # Calculate stats
-    total_doctors = len(plans)
-    total_budget = sum(p.target_amount for p in plans)
-    
-    # Get total paid from payments
-    plan_ids = [p.id for p in plans]
-    if plan_ids:
-        total_paid = db.query(func.sum(Payment.amount_paid)).filter(
-            Payment.plan_id.in_(plan_ids)
-        ).scalar() or 0
-    else:
-        total_paid = 0
+    status_counts = {}
+    total_doctors = total_budget = total_paid = 0
+    for code, count, budget, paid in query.group_by(MasterPlan.status_code):
+        status_counts[PlanStatus(code).name.lower()] = count
+        total_doctors += count
+        total_budget += budget or 0
+        total_paid += paid or 0
     
     total_debt = total_budget - total_paid
-    pending_count = len([p for p in plans if p.status == 'Pending'])
-    verified_count = len([p for p in plans if '✅' in p.status])
     
     return StatsResponse(
         total_doctors=total_doctors,
         total_budget=total_budget,
         total_paid=total_paid,
         total_debt=total_debt if total_debt > 0 else 0,
-        pending_count=pending_count,
-        verified_count=verified_count
+        pending_count=status_counts.get('pending', 0),
+        verified_count=status_counts.get('verified', 0),
+        status_counts=status_counts
     )
 
 
+@app.get("/admin/ai-routing")
+async def get_ai_routing(current_user: User = Depends(get_current_admin)):
+    """Per-route win counts and latency percentiles of the extraction router, plus OCR pre-pass stats"""
+    router = get_model_router()
+    primary_latency = router.latency.get("primary")
+    return {
+        **router.summary(),
+        "circuit": get_ai_client().breaker.state,
+        "client": get_ai_client().stats,
+        "ocr": ocr_stats.summary(primary_latency.percentile(0.5) if primary_latency else None)
+    }
+
+
 @app.get("/admin/users")
 async def get_all_users(
     current_user: User = Depends(get_current_admin),
@@ -759,11 +859,13 @@ async def get_all_users(
 
 @app.get("/admin/data", response_model=List[DoctorResponse])
 async def get_admin_data(
+    request: Request,
     company: str = Query(..., description="Company name (required)"),
     region: Optional[str] = Query(None, description="Region filter"),
     group: Optional[str] = Query(None, description="Group filter"),
-    doctor_name: Optional[str] = Query(None, description="Doctor name filter (partial match)"),
+    doctor_name: Optional[str] = Query(None, description="Doctor name filter (partial match, Cyrillic or Latin)"),
     month: Optional[int] = Query(None, description="Month filter (1-12)"),
+    status: Optional[str] = Query(None, description="Status filter (pending, verified, underpaid, overpaid, rejected, manual)"),
     current_user: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
@@ -776,34 +878,36 @@ async def get_admin_data(
     if group:
         query = query.filter(MasterPlan.group_name == group)
     if doctor_name:
-        query = query.filter(MasterPlan.doctor_name.ilike(f"%{doctor_name}%"))
+        query = query.filter(name_filter(db, doctor_name))
     if month:
         query = query.filter(MasterPlan.month == month)
-    plans = query.all()
-    result = []
-    for p in plans:
-        result.append(
-            DoctorResponse(
-                id=p.id,
-                company=p.company,
-                region=p.region,
-                district=p.district or "",
-                group_name=p.group_name,
-                manager_name=p.manager_name or "",
-                doctor_name=p.doctor_name,
-                specialty=p.specialty or "",
-                workplace=p.workplace or "",
-                phone=p.phone or "",
-                card_number=p.card_number or "",
-                target_amount=p.target_amount,
-                planned_type=p.planned_type,
-                month=p.month,
-                status=p.status,
-                proof_image=sorted(p.payments, key=lambda x: x.verified_at or datetime.min, reverse=True)[0].proof_image_path if p.payments else None,
-                amount_paid=sorted(p.payments, key=lambda x: x.verified_at or datetime.min, reverse=True)[0].amount_paid if p.payments else 0
-            )
-        )
-    return result
+    if status:
+        if status.upper() not in PlanStatus.__members__:
+            raise HTTPException(status_code=400, detail=f"Unknown status '{status}'")
+        query = query.filter(MasterPlan.status_code == PlanStatus[status.upper()])
+    return await asyncio.to_thread(doctor_list_response, request, db, query)
+
+
+@app.get("/admin/search")
+async def search_doctors(
+    request: Request,
+    q: str = Query(..., min_length=1, description="Name or workplace (Cyrillic or Latin), or phone number suffix"),
+    company: Optional[str] = Query(None, description="Company filter"),
+    month: Optional[int] = Query(None, description="Month filter (1-12)"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum results"),
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Ranked fuzzy doctor search over the trigram index (see search_index.py):
+    substring matches first, then near spellings. Rows have the /admin/data shape.
+    """
+    query = db.query(MasterPlan)
+    if company:
+        query = query.filter(MasterPlan.company == company)
+    if month:
+        query = query.filter(MasterPlan.month == month)
+    return await asyncio.to_thread(search_response, request, db, query, q, company, month, limit)
 
 
 @app.get("/admin/leaderboard")
@@ -832,22 +936,7 @@ async def get_leaderboard(
                 "debt": 0
             }
         leaderboard[key]["target"] += p.target_amount
-    
-    # Get payments for each plan
-    plan_ids = [p.id for p in plans]
-    if plan_ids:
-        payments = db.query(Payment).filter(Payment.plan_id.in_(plan_ids)).all()
-        payment_map = {}
-        for payment in payments:
-            if payment.plan_id not in payment_map:
-                payment_map[payment.plan_id] = 0
-            payment_map[payment.plan_id] += payment.amount_paid
-        
-        # Calculate paid amounts
-        for p in plans:
-            key = f"{p.region}_{p.group_name}"
-            if p.id in payment_map:
-                leaderboard[key]["paid"] += payment_map[p.id]
+        leaderboard[key]["paid"] += p.paid_total
     
     # Calculate debt
     for key in leaderboard:
@@ -858,6 +947,39 @@ async def get_leaderboard(
     return result
 
 
+@app.get("/admin/dashboard")
+async def get_admin_dashboard(
+    request: Request,
+    company: str = Query(..., description="Company name (required)"),
+    month: Optional[int] = Query(None, description="Month filter (1-12)"),
+    region: Optional[str] = Query(None, description="Region filter"),
+    group: Optional[str] = Query(None, description="Group filter"),
+    sections: str = Query(",".join(DASHBOARD_SECTIONS), description="Comma-separated: rows, stats, leaderboard"),
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    /admin/data rows, /admin/stats totals and /admin/leaderboard in one response,
+    computed from one query (see dashboard.py). Filters apply to every section.
+    """
+    wanted = [section.strip() for section in sections.split(",") if section.strip()]
+    unknown = [section for section in wanted if section not in DASHBOARD_SECTIONS]
+    if unknown or not wanted:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown sections {unknown}. Use any of: {', '.join(DASHBOARD_SECTIONS)}"
+        )
+    
+    query = db.query(MasterPlan).filter(MasterPlan.company == company)
+    if month:
+        query = query.filter(MasterPlan.month == month)
+    if region:
+        query = query.filter(MasterPlan.region == region)
+    if group:
+        query = query.filter(MasterPlan.group_name == group)
+    return await asyncio.to_thread(dashboard_response, request, db, query, wanted)
+
+
 @app.put("/admin/update-payment/{plan_id}")
 async def update_payment(
     plan_id: int,
@@ -868,43 +990,38 @@ async def update_payment(
     current_user: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
-    """Update payment amount and status for a plan (admin override)"""
+    """
+    Set the paid amount and status for a plan (admin override). The correction is
+    appended as a new payment that supersedes the plan's current payments; the old
+    rows stay in the history.
+    """
     plan = db.query(MasterPlan).filter(MasterPlan.id == plan_id).first()
     if not plan:
         raise HTTPException(status_code=404, detail="Plan not found")
     
-    # Create or update payment record
-    payment = db.query(Payment).filter(Payment.plan_id == plan_id).first()
-    
     relative_path = None
+    image_hash = None
     if file:
         relative_path = await save_proof_file(file, plan)
-        
-    if not payment:
-        payment = Payment(
-            plan_id=plan_id,
-            amount_paid=amount_paid,
-            payment_method="Manual/Admin",
-            verified_at=datetime.utcnow(),
-            proof_image_path=relative_path, # Set image if uploaded
-            ai_log=json.dumps({"manual_override": True, "admin_comment": admin_comment})
-        )
-        db.add(payment)
-    else:
-        payment.amount_paid = amount_paid
-        payment.verified_at = datetime.utcnow()
-        if relative_path:
-            payment.proof_image_path = relative_path # Update image if uploaded
-        if admin_comment:
-            try:
-                log = json.loads(payment.ai_log or "{}")
-            except:
-                log = {}
-            log["admin_correction"] = admin_comment
-            payment.ai_log = json.dumps(log)
+        image_hash = await asyncio.to_thread(dhash, await file.read())
     
-    # Update plan status
-    plan.status = status
+    previous = plan.latest_payment
+    log = {"manual_override": True, "admin_comment": admin_comment}
+    if previous:
+        log["previous_amount"] = plan.paid_total
+    payment = Payment(
+        amount_paid=amount_paid,
+        payment_method="Manual/Admin",
+        verified_at=datetime.utcnow(),
+        # Without a new upload the last proof image stays the one shown
+        proof_image_path=relative_path or (previous.proof_image_path if previous else None),
+        ai_log=json.dumps(log),
+        image_hash=hash_to_hex(image_hash) if image_hash is not None else None
+    )
+    supersede_payments(db, plan, payment)
+    
+    # Update plan status (known labels become their code, anything else is kept as MANUAL text)
+    plan.status_code, plan.status_note = parse_status_label(status)
     
     # If file is uploaded, force status to Verified if not manually set to something else? 
     # User said: "Automatically mark status as Verified".
@@ -915,13 +1032,243 @@ async def update_payment(
     
     db.commit()
     
-    return {"success": True, "message": "Payment updated", "new_status": status}
+    if image_hash is not None:
+        proof_index.add(image_hash, payment.id)
+    get_broker().publish(plan_event(plan))
+    
+    return {"success": True, "message": "Payment updated", "new_status": plan_status_label(plan)}
 
 
+@app.get("/admin/payments/{plan_id}")
+async def get_payment_history(
+    plan_id: int,
+    include_log: bool = Query(False, description="Also return the raw AI log of each payment"),
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Full payment history of a plan, oldest first, including superseded payments"""
+    plan = db.query(MasterPlan).filter(MasterPlan.id == plan_id).first()
+    if not plan:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    
+    return {
+        "plan_id": plan.id,
+        "paid_total": plan.paid_total,
+        "payment_count": plan.payment_count,
+        "latest_payment_id": plan.latest_payment_id,
+        "payments": [
+            {
+                "id": p.id,
+                "amount_paid": p.amount_paid,
+                "payment_method": p.payment_method,
+                "verified_at": p.verified_at.isoformat() if p.verified_at else None,
+                "proof_image": p.proof_image_path,
+                "transaction_id": p.transaction_id,
+                "superseded_by_id": p.superseded_by_id,
+                "extraction": extraction_summary(p.extraction),
+                **({"ai_log": json.loads(p.ai_log) if p.ai_log else None} if include_log else {}),
+            }
+            for p in payment_history(db, plan.id)
+        ]
+    }
+
+
+@app.get("/admin/ai-extractions")
+async def get_ai_extractions(
+    company: str = Query(..., description="Company name"),
+    month: Optional[int] = Query(None, description="Plan month filter (1-12)"),
+    max_confidence: Optional[float] = Query(None, description="Only extractions below this confidence"),
+    match: Optional[str] = Query(None, description="Identity match: phone, last4_only, name_only, none"),
+    model: Optional[str] = Query(None, description="Model name"),
+    include_superseded: bool = Query(False),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """AI / OCR verified payments filtered on the indexed extraction columns, lowest confidence first"""
+    if match and match not in MATCH_FILTERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown match filter '{match}'. Use one of: {', '.join(MATCH_FILTERS)}"
+        )
+    return query_extractions(
+        db, company, month=month, max_confidence=max_confidence, match=match, model_name=model,
+        include_superseded=include_superseded, limit=limit
+    )
+
+
+
+
+# ==================== LIVE EVENTS ====================
+
+@app.post("/events/token")
+async def issue_stream_token(current_user: User = Depends(get_current_user)):
+    """
+    Short-lived token for ?access_token= on /events. It is only good for opening
+    the stream, so the copy that lands in access / proxy logs is worthless.
+    """
+    return {"stream_token": create_stream_token(current_user), "expires_in": STREAM_TOKEN_EXPIRE_SECONDS}
+
+
+@app.get("/events")
+async def stream_events(
+    request: Request,
+    company: Optional[str] = Query(None, description="Admins: only this company"),
+    month: Optional[int] = Query(None, description="Only events for this month"),
+    current_user: User = Depends(get_stream_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Server-sent events for dashboards: 'plan' (plan_id, status, amount_paid,
+    proof_image, ...) whenever a plan the user can see changes, 'reload' after an
+    import or rollover, 'resync' when missed events cannot be replayed. Pass a
+    token from POST /events/token as ?access_token= from EventSource (it is
+    checked when the stream opens); reconnects send Last-Event-ID.
+    """
+    scope = user_scope(current_user, company)
+    # The stream may stay open for hours - don't hold a pooled connection meanwhile
+    db.close()
+    subscription, replay, resync = get_broker().subscribe(
+        scope, month, request.headers.get("last-event-id")
+    )
+    return StreamingResponse(
+        event_stream(get_broker(), subscription, replay, resync, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ==================== REVIEW QUEUE ====================
+
+def review_item_response(item, lease_token: Optional[str] = None) -> dict:
+    plan = item.plan
+    return {
+        "id": item.id,
+        "reason": item.reason,
+        "state": item.state,
+        "plan_id": item.plan_id,
+        "doctor_name": plan.doctor_name,
+        "company": plan.company,
+        "region": plan.region,
+        "target_amount": plan.target_amount,
+        "paid_total": plan.paid_total,
+        "amount_at_stake": item.amount_at_stake,
+        "extracted_amount": item.extracted_amount,
+        "confidence": item.confidence,
+        "payment_method": item.payment_method,
+        "proof_image": item.proof_image_path,
+        "error": item.error,
+        "created_at": item.created_at.isoformat(),
+        "claimed_by": item.claimed_by,
+        "lease_token": lease_token,
+        "lease_expires_at": item.lease_expires_at.isoformat() if item.lease_expires_at else None,
+        "attempts": item.attempts,
+    }
+
+
+@app.post("/admin/review/claim")
+async def claim_review_items(
+    limit: int = Form(1),
+    lease_seconds: int = Form(REVIEW_LEASE_SECONDS),
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Lease the highest-priority waiting receipts (amount at stake, then age). Each
+    item is exclusive to the caller until the lease expires; keep it with
+    /heartbeat, finish it with /resolve or hand it back with /release.
+    """
+    if not 30 <= lease_seconds <= 3600:
+        raise HTTPException(status_code=400, detail="lease_seconds must be between 30 and 3600")
+    claimed = claim_items(db, current_user.email, limit=limit, lease_seconds=lease_seconds)
+    return {"items": [review_item_response(item, token) for item, token in claimed]}
+
+
+@app.post("/admin/review/{item_id}/heartbeat")
+async def heartbeat_review_item(
+    item_id: int,
+    lease_token: str = Form(...),
+    lease_seconds: int = Form(REVIEW_LEASE_SECONDS),
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Extend the caller's lease on an item"""
+    try:
+        expires = extend_lease(db, item_id, lease_token, lease_seconds=max(30, min(lease_seconds, 3600)))
+    except ReviewLeaseError as e:
+        raise HTTPException(status_code=409, detail=f"❌ {e}")
+    return {"success": True, "lease_expires_at": expires.isoformat()}
+
+
+@app.post("/admin/review/{item_id}/release")
+async def release_review_item(
+    item_id: int,
+    lease_token: str = Form(...),
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Put an item back in the queue undecided"""
+    try:
+        release_item(db, item_id, lease_token)
+    except ReviewLeaseError as e:
+        raise HTTPException(status_code=409, detail=f"❌ {e}")
+    return {"success": True}
+
+
+@app.post("/admin/review/{item_id}/resolve")
+async def resolve_review_item(
+    item_id: int,
+    lease_token: str = Form(...),
+    decision: str = Form(...),
+    amount: Optional[int] = Form(None),
+    note: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    decision=approve records the payment (amount defaults to the extracted one) and
+    updates the plan status; decision=reject records nothing. Requires a live lease.
+    """
+    if decision not in ("approve", "reject"):
+        raise HTTPException(status_code=400, detail="decision must be 'approve' or 'reject'")
+    try:
+        item, payment = resolve_item(
+            db, item_id, lease_token, current_user.email, decision == "approve", amount=amount, note=note
+        )
+    except ReviewLeaseError as e:
+        raise HTTPException(status_code=409, detail=f"❌ {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"❌ {e}")
+    
+    if payment is not None and payment.image_hash:
+        proof_index.add(int(payment.image_hash, 16), payment.id)
+    get_broker().publish(plan_event(item.plan))
+    
+    return {
+        "success": True,
+        "state": item.state,
+        "payment_id": item.payment_id,
+        "new_status": plan_status_label(item.plan)
+    }
+
+
+@app.get("/admin/review/stats")
+async def get_review_stats(
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Backlog size and age, and resolution throughput (also exported on /metrics)"""
+    return queue_stats(db)
 
 
 # ==================== HEALTH CHECK ====================
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -932,11 +1279,32 @@ async def root():
     }
 
 
+def ping_database() -> str:
+    """'connected', or the error of a SELECT 1 round trip"""
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return "connected"
+    except Exception as e:
+        return f"error: {e}"
+
+
 @app.get("/health")
 async def health_check():
-    """Detailed health check"""
-    return {
-        "status": "healthy",
-        "database": "connected",
-        "gemini_configured": bool(GOOGLE_API_KEY)
-    }
+    """Detailed health check (pings the database)"""
+    start = time.perf_counter()
+    # A slow or locked database file must not stall the event loop
+    database = await asyncio.to_thread(ping_database)
+    db_ping_ms = round((time.perf_counter() - start) * 1000, 2)
+    
+    healthy = database == "connected"
+    return JSONResponse(
+        status_code=200 if healthy else 503,
+        content={
+            "status": "healthy" if healthy else "unhealthy",
+            "database": database,
+            "db_ping_ms": db_ping_ms,
+            "gemini_configured": bool(GOOGLE_API_KEY),
+            "ai_circuit": get_ai_client().breaker.state
+        }
+    )
@@ -0,0 +1,270 @@
+"""
+Metrics
+Minimal in-process Prometheus metrics (counters and histograms) plus per-stage
+timers for the request pipelines. Rendered in Prometheus text format at /metrics.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Seconds; covers sub-millisecond DB work up to slow model calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self.series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + ("+Inf" if bound == float("inf") else repr(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {total!r}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        # Callables returning extra exposition lines, evaluated at scrape time
+        self.collectors: List[Callable[[], List[str]]] = []
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "synergy_stage_seconds", "Time spent in each stage of a request pipeline", ("pipeline", "stage")
+)
+REQUESTS_TOTAL = registry.counter(
+    "synergy_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+)
+REQUEST_SECONDS = registry.histogram(
+    "synergy_request_seconds", "HTTP request latency by route template", ("method", "route")
+)
+REQUEST_SQL_STATEMENTS = registry.histogram(
+    "synergy_request_sql_statements", "SQL statements executed per request", ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500, 1000)
+)
+REQUEST_SQL_SECONDS = registry.histogram(
+    "synergy_request_sql_seconds", "Total SQL time per request", ("method", "route")
+)
+SLOW_QUERIES = registry.counter("synergy_slow_queries_total", "SQL statements over the slow-query threshold")
+
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "0.2"))
+# Bound values are phones, names and amounts: never logged, only (opt-in) how many there were
+SLOW_QUERY_LOG_PARAM_COUNT = os.getenv("SLOW_QUERY_LOG_PARAM_COUNT", "false").lower() == "true"
+slow_query_log = logging.getLogger("synergy.slow_query")
+
+
+# ==================== STAGE TIMING ====================
+
+class StageTimer:
+    """
+    Times named stages of one request. Every stage feeds STAGE_SECONDS and is kept
+    for the Server-Timing response header.
+    """
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.stages: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages.append((name, elapsed))
+            STAGE_SECONDS.observe(elapsed, self.pipeline, name)
+
+    def record(self, name: str, seconds: float) -> None:
+        """Record a stage measured elsewhere (e.g. inside the model router)"""
+        self.stages.append((name, seconds))
+        STAGE_SECONDS.observe(seconds, self.pipeline, name)
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (durations in milliseconds)"""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages)
+
+
+class _NullTimer:
+    """Drop-in for StageTimer when the caller does not collect timings"""
+
+    @contextmanager
+    def stage(self, name: str):
+        yield
+
+
+NULL_TIMER = _NullTimer()
+
+
+# ==================== SQL INSTRUMENTATION ====================
+
+class SQLStats:
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# Set per request by the middleware; a mutable holder so threadpool copies of the
+# context (sync dependencies like get_db) still add to the same request's totals
+_request_sql: ContextVar[Optional[SQLStats]] = ContextVar("request_sql", default=None)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count statements / SQL time per request and log statements over SLOW_QUERY_SECONDS"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _request_sql.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.seconds += elapsed
+        if elapsed >= SLOW_QUERY_SECONDS:
+            SLOW_QUERIES.inc()
+            if SLOW_QUERY_LOG_PARAM_COUNT:
+                rows = parameters if executemany else [parameters]
+                slow_query_log.warning(
+                    "Slow query (%.1f ms): %s | %d row(s) x %d param(s)",
+                    elapsed * 1000, " ".join(statement.split()), len(rows), len(rows[0]) if rows else 0
+                )
+            else:
+                slow_query_log.warning("Slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split()))
+
+
+# ==================== REQUEST MIDDLEWARE ====================
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware recording, per route template, request count by status,
+    latency, and the number and total time of SQL statements. Also sends a
+    Server-Timing header with the endpoint's StageTimer stages (request.state.timer)
+    and the request's SQL total - on error responses too.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        stats = SQLStats()
+        token = _request_sql.set(stats)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                timer = scope.get("state", {}).get("timer")
+                timings = timer.server_timing() if timer is not None and timer.stages else ""
+                sql = f'sql;dur={stats.seconds * 1000:.1f};desc="{stats.statements} queries"'
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", (timings + ", " + sql if timings else sql).encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_sql.reset(token)
+            # Route template ("/admin/update-payment/{plan_id}"), not the raw path
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            REQUESTS_TOTAL.inc(method, route_path, str(status_code))
+            REQUEST_SECONDS.observe(time.perf_counter() - start, method, route_path)
+            REQUEST_SQL_STATEMENTS.observe(stats.statements, method, route_path)
+            REQUEST_SQL_SECONDS.observe(stats.seconds, method, route_path)
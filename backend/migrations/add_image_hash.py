@@ -0,0 +1,56 @@
+"""
+Migration script to add image_hash column to payments table.
+This is needed for near-duplicate receipt detection (perceptual hashing).
+Existing payments are backfilled from their stored proof images.
+"""
+import sqlite3
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from backend.dedupe import dhash, hash_to_hex
+
+# Database path - sql_app.db is in the project root
+db_path = os.path.join(os.path.dirname(__file__), '..', '..', 'sql_app.db')
+uploads_dir = os.path.join(os.path.dirname(__file__), '..', 'uploads')
+
+def migrate():
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    # Check existing columns
+    cursor.execute('PRAGMA table_info(payments)')
+    columns = [col[1] for col in cursor.fetchall()]
+    
+    if 'image_hash' not in columns:
+        print("Adding image_hash column...")
+        cursor.execute('ALTER TABLE payments ADD COLUMN image_hash VARCHAR')
+        conn.commit()
+        print("✅ image_hash column added successfully!")
+    else:
+        print("✅ image_hash column already exists.")
+    
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_payments_image_hash ON payments(image_hash)')
+    conn.commit()
+    
+    # Backfill hashes from proof files
+    cursor.execute('SELECT id, proof_image_path FROM payments WHERE image_hash IS NULL AND proof_image_path IS NOT NULL')
+    rows = cursor.fetchall()
+    hashed = 0
+    for payment_id, proof_path in rows:
+        file_path = os.path.join(uploads_dir, proof_path)
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, 'rb') as f:
+            value = dhash(f.read())
+        if value is not None:
+            cursor.execute('UPDATE payments SET image_hash = ? WHERE id = ?', (hash_to_hex(value), payment_id))
+            hashed += 1
+    conn.commit()
+    print(f"✅ Backfilled image_hash for {hashed} of {len(rows)} payments.")
+    
+    conn.close()
+    print("Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
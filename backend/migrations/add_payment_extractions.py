@@ -0,0 +1,101 @@
+"""
+Migration script to split payments.ai_log into structured extraction columns.
+Creates payment_extractions (typed, indexed copy of the key AI fields), moves the
+raw log into the zlib-compressed payments.ai_log_gz column, then drops ai_log.
+"""
+import json
+import sqlite3
+import os
+import sys
+import zlib
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from backend.extractions import extraction_fields
+
+# Database path - sql_app.db is in the project root
+db_path = os.path.join(os.path.dirname(__file__), '..', '..', 'sql_app.db')
+
+EXTRACTION_COLUMNS = [
+    'source', 'model_name', 'route', 'latency_ms', 'confidence', 'extracted_phone', 'extracted_amount',
+    'extracted_month', 'phone_matched', 'last4_matched', 'name_matched', 'is_authentic',
+]
+
+def migrate():
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS payment_extractions (
+            payment_id INTEGER NOT NULL PRIMARY KEY REFERENCES payments(id),
+            source VARCHAR NOT NULL,
+            model_name VARCHAR,
+            route VARCHAR,
+            latency_ms INTEGER,
+            confidence FLOAT,
+            extracted_phone VARCHAR,
+            extracted_amount INTEGER,
+            extracted_month INTEGER,
+            phone_matched BOOLEAN,
+            last4_matched BOOLEAN,
+            name_matched BOOLEAN,
+            is_authentic BOOLEAN,
+            created_at DATETIME
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_payment_extractions_model_name ON payment_extractions(model_name)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_payment_extractions_confidence ON payment_extractions(confidence)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_payment_extractions_created_at ON payment_extractions(created_at)')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS ix_payment_extractions_matches '
+        'ON payment_extractions(phone_matched, last4_matched, name_matched)'
+    )
+    print("✅ payment_extractions table ready.")
+
+    # Check existing columns
+    cursor.execute('PRAGMA table_info(payments)')
+    columns = [col[1] for col in cursor.fetchall()]
+
+    if 'ai_log_gz' not in columns:
+        print("Adding ai_log_gz column...")
+        cursor.execute('ALTER TABLE payments ADD COLUMN ai_log_gz BLOB')
+        print("✅ ai_log_gz column added successfully!")
+    else:
+        print("✅ ai_log_gz column already exists.")
+    conn.commit()
+
+    if 'ai_log' in columns:
+        cursor.execute('SELECT id, ai_log, verified_at FROM payments WHERE ai_log IS NOT NULL')
+        rows = cursor.fetchall()
+        extracted = 0
+        for payment_id, ai_log, verified_at in rows:
+            cursor.execute('UPDATE payments SET ai_log_gz = ? WHERE id = ?',
+                           (zlib.compress(ai_log.encode('utf-8'), 6), payment_id))
+            try:
+                log = json.loads(ai_log)
+            except ValueError:
+                continue
+            # Admin overrides carry no model output
+            if not isinstance(log, dict) or log.get('manual_override'):
+                continue
+            fields = extraction_fields(log)
+            cursor.execute(
+                f'INSERT OR IGNORE INTO payment_extractions (payment_id, {", ".join(EXTRACTION_COLUMNS)}, created_at) '
+                f'VALUES (?, {", ".join("?" for _ in EXTRACTION_COLUMNS)}, ?)',
+                [payment_id] + [fields[name] for name in EXTRACTION_COLUMNS] + [verified_at]
+            )
+            extracted += cursor.rowcount
+        conn.commit()
+        print(f"✅ Compressed {len(rows)} AI logs, extracted fields for {extracted} payments.")
+
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            cursor.execute('ALTER TABLE payments DROP COLUMN ai_log')
+            conn.commit()
+            print("✅ Old ai_log column dropped.")
+        else:
+            print(f"⚠️ SQLite {sqlite3.sqlite_version} cannot drop columns; old ai_log column left unused.")
+
+    conn.close()
+    print("Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,52 @@
+"""
+Migration script to add the payment ledger columns.
+master_plan gets paid_total, payment_count and latest_payment_id (current state,
+maintained by backend/payments.py); payments gets superseded_by_id for admin
+corrections. Existing rows are backfilled from the payments table.
+"""
+import sqlite3
+import os
+
+# Database path - sql_app.db is in the project root
+db_path = os.path.join(os.path.dirname(__file__), '..', '..', 'sql_app.db')
+
+def add_column(cursor, table, name, definition):
+    cursor.execute(f'PRAGMA table_info({table})')
+    columns = [col[1] for col in cursor.fetchall()]
+    if name not in columns:
+        print(f"Adding {table}.{name} column...")
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+        print(f"✅ {table}.{name} column added successfully!")
+    else:
+        print(f"✅ {table}.{name} column already exists.")
+
+def migrate():
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    add_column(cursor, 'payments', 'superseded_by_id', 'INTEGER REFERENCES payments(id)')
+    add_column(cursor, 'master_plan', 'paid_total', 'INTEGER NOT NULL DEFAULT 0')
+    add_column(cursor, 'master_plan', 'payment_count', 'INTEGER NOT NULL DEFAULT 0')
+    add_column(cursor, 'master_plan', 'latest_payment_id', 'INTEGER REFERENCES payments(id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_payments_superseded_by_id ON payments(superseded_by_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_payments_plan_id ON payments(plan_id)')
+    conn.commit()
+
+    # Backfill from current (non-superseded) payments
+    cursor.execute('''
+        UPDATE master_plan SET
+            paid_total = (SELECT COALESCE(SUM(amount_paid), 0) FROM payments
+                          WHERE payments.plan_id = master_plan.id AND superseded_by_id IS NULL),
+            payment_count = (SELECT COUNT(*) FROM payments
+                             WHERE payments.plan_id = master_plan.id AND superseded_by_id IS NULL),
+            latest_payment_id = (SELECT MAX(id) FROM payments
+                                 WHERE payments.plan_id = master_plan.id AND superseded_by_id IS NULL)
+    ''')
+    conn.commit()
+    print(f"✅ Backfilled payment totals for {cursor.rowcount} plans.")
+
+    conn.close()
+    print("Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,66 @@
+"""
+Migration script for receipt auto-matching.
+Adds master_plan.phone9 / phone_last4 (last 9 and last 4 digits of phone),
+fills them for existing rows and indexes them per company and month.
+"""
+import sqlite3
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from backend.search_keys import phone9, phone_last4
+
+# Database path - sql_app.db is in the project root
+db_path = os.path.join(os.path.dirname(__file__), '..', '..', 'sql_app.db')
+
+BATCH_SIZE = 10000
+
+def migrate():
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    # Check existing columns
+    cursor.execute('PRAGMA table_info(master_plan)')
+    columns = [col[1] for col in cursor.fetchall()]
+
+    for column in ('phone9', 'phone_last4'):
+        if column not in columns:
+            print(f"Adding {column} column...")
+            cursor.execute(f'ALTER TABLE master_plan ADD COLUMN {column} VARCHAR')
+            print(f"✅ {column} column added successfully!")
+        else:
+            print(f"✅ {column} column already exists.")
+
+    # Backfill keys (rows imported before this migration)
+    print("Computing phone keys...")
+    filled = last_id = 0
+    while True:
+        cursor.execute(
+            'SELECT id, phone FROM master_plan WHERE id > ? ORDER BY id LIMIT ?',
+            (last_id, BATCH_SIZE)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany(
+            'UPDATE master_plan SET phone9 = ?, phone_last4 = ? WHERE id = ?',
+            [(phone9(phone), phone_last4(phone), plan_id) for plan_id, phone in rows]
+        )
+        filled += len(rows)
+        last_id = rows[-1][0]
+    print(f"✅ Phone keys computed for {filled} rows.")
+
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS ix_master_plan_company_phone9_month ON master_plan(company, phone9, month)'
+    )
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS ix_master_plan_company_phone_last4_month ON master_plan(company, phone_last4, month)'
+    )
+    print("✅ Phone key indexes ready.")
+
+    conn.commit()
+    conn.close()
+    print("Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,59 @@
+"""
+Migration script to add the review_queue table.
+Receipts the AI could not decide (model unavailable / low confidence) wait here
+for an admin, who claims them with a lease.
+"""
+import sqlite3
+import os
+
+# Database path - sql_app.db is in the project root
+db_path = os.path.join(os.path.dirname(__file__), '..', '..', 'sql_app.db')
+
+def migrate():
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS review_queue (
+            id INTEGER NOT NULL PRIMARY KEY,
+            plan_id INTEGER NOT NULL REFERENCES master_plan(id),
+            reason VARCHAR NOT NULL,
+            state VARCHAR NOT NULL DEFAULT 'open',
+            amount_at_stake INTEGER NOT NULL DEFAULT 0,
+            sort_key FLOAT NOT NULL,
+            proof_image_path VARCHAR,
+            payment_method VARCHAR NOT NULL,
+            extracted_amount INTEGER,
+            confidence FLOAT,
+            transaction_id VARCHAR,
+            image_hash VARCHAR,
+            error VARCHAR,
+            created_at DATETIME NOT NULL,
+            claimed_by VARCHAR,
+            lease_token VARCHAR,
+            lease_expires_at DATETIME,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            resolved_at DATETIME,
+            resolved_by VARCHAR,
+            resolution_note VARCHAR,
+            payment_id INTEGER REFERENCES payments(id),
+            ai_log_gz BLOB
+        )
+    ''')
+    for name, columns in (
+        ('ix_review_queue_id', 'id'),
+        ('ix_review_queue_plan_id', 'plan_id'),
+        ('ix_review_queue_image_hash', 'image_hash'),
+        ('ix_review_queue_lease_expires_at', 'lease_expires_at'),
+        ('ix_review_queue_resolved_at', 'resolved_at'),
+        ('ix_review_queue_state_sort', 'state, sort_key'),
+    ):
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON review_queue({columns})')
+    conn.commit()
+    print("✅ review_queue table ready.")
+
+    conn.close()
+    print("Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
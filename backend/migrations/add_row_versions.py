@@ -0,0 +1,63 @@
+"""
+Migration script for delta sync.
+Adds master_plan.row_version, the sync_state counter and the plan_tombstones
+table. Existing rows keep version 0, so the first sync of every client
+(since=0) returns them.
+"""
+import sqlite3
+import os
+
+# Database path - sql_app.db is in the project root
+db_path = os.path.join(os.path.dirname(__file__), '..', '..', 'sql_app.db')
+
+def migrate():
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    # Check existing columns
+    cursor.execute('PRAGMA table_info(master_plan)')
+    columns = [col[1] for col in cursor.fetchall()]
+
+    if 'row_version' not in columns:
+        print("Adding row_version column...")
+        cursor.execute('ALTER TABLE master_plan ADD COLUMN row_version BIGINT NOT NULL DEFAULT 0')
+        print("✅ row_version column added successfully!")
+    else:
+        print("✅ row_version column already exists.")
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS ix_master_plan_company_row_version ON master_plan(company, row_version)'
+    )
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            id INTEGER NOT NULL PRIMARY KEY,
+            version BIGINT NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO sync_state (id, version) VALUES (1, 0)')
+    print("✅ sync_state counter ready.")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS plan_tombstones (
+            id INTEGER NOT NULL PRIMARY KEY,
+            plan_id INTEGER NOT NULL,
+            company VARCHAR NOT NULL,
+            region VARCHAR,
+            group_name VARCHAR,
+            district VARCHAR,
+            month INTEGER,
+            row_version BIGINT NOT NULL,
+            deleted_at DATETIME
+        )
+    ''')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS ix_plan_tombstones_company_row_version ON plan_tombstones(company, row_version)'
+    )
+    print("✅ plan_tombstones table ready.")
+
+    conn.commit()
+    conn.close()
+    print("Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
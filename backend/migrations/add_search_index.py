@@ -0,0 +1,65 @@
+"""
+Migration script for the doctor search index.
+Adds master_plan.name_key / workplace_key, fills them for existing rows and
+builds the plan_search FTS5 trigram index with the triggers that keep it in
+sync (same DDL as models.py). Needs SQLite 3.34+ for the trigram tokenizer.
+"""
+import sqlite3
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from backend.models import PLAN_SEARCH_DDL
+from backend.search_keys import search_key
+
+# Database path - sql_app.db is in the project root
+db_path = os.path.join(os.path.dirname(__file__), '..', '..', 'sql_app.db')
+
+BATCH_SIZE = 10000
+
+def migrate():
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    # Check existing columns
+    cursor.execute('PRAGMA table_info(master_plan)')
+    columns = [col[1] for col in cursor.fetchall()]
+
+    for column in ('name_key', 'workplace_key'):
+        if column not in columns:
+            print(f"Adding {column} column...")
+            cursor.execute(f'ALTER TABLE master_plan ADD COLUMN {column} VARCHAR')
+            print(f"✅ {column} column added successfully!")
+        else:
+            print(f"✅ {column} column already exists.")
+
+    # Backfill keys (rows imported before this migration)
+    print("Computing search keys...")
+    filled = last_id = 0
+    while True:
+        cursor.execute(
+            'SELECT id, doctor_name, workplace FROM master_plan WHERE id > ? ORDER BY id LIMIT ?',
+            (last_id, BATCH_SIZE)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany(
+            'UPDATE master_plan SET name_key = ?, workplace_key = ? WHERE id = ?',
+            [(search_key(name), search_key(workplace), plan_id) for plan_id, name, workplace in rows]
+        )
+        filled += len(rows)
+        last_id = rows[-1][0]
+    print(f"✅ Search keys computed for {filled} rows.")
+
+    for statement in PLAN_SEARCH_DDL:
+        cursor.execute(statement)
+    cursor.execute("INSERT INTO plan_search(plan_search) VALUES('rebuild')")
+    print("✅ plan_search index built.")
+
+    conn.commit()
+    conn.close()
+    print("Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
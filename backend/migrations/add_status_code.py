@@ -0,0 +1,65 @@
+"""
+Migration script to replace master_plan.status strings with status codes.
+Adds status_code (PlanStatus) and status_note, backfills them from the old
+labels ("✅ Verified", "⚠️ Underpaid (Debt: ...)", admin free text), then drops
+the status column. Debt/overpay figures are recomputed from target_amount and
+paid_total, so run add_payment_totals.py first.
+"""
+import sqlite3
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from backend.plan_status import parse_status_label
+
+# Database path - sql_app.db is in the project root
+db_path = os.path.join(os.path.dirname(__file__), '..', '..', 'sql_app.db')
+
+def migrate():
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    # Check existing columns
+    cursor.execute('PRAGMA table_info(master_plan)')
+    columns = [col[1] for col in cursor.fetchall()]
+
+    if 'status_code' not in columns:
+        print("Adding status_code / status_note columns...")
+        cursor.execute('ALTER TABLE master_plan ADD COLUMN status_code INTEGER NOT NULL DEFAULT 0')
+        cursor.execute('ALTER TABLE master_plan ADD COLUMN status_note VARCHAR')
+        conn.commit()
+        print("✅ status_code column added successfully!")
+    else:
+        print("✅ status_code column already exists.")
+
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_master_plan_status_code ON master_plan(status_code)')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS ix_master_plan_company_month_status ON master_plan(company, month, status_code)'
+    )
+    conn.commit()
+
+    if 'status' in columns:
+        # Backfill once per distinct label
+        cursor.execute('SELECT DISTINCT status FROM master_plan')
+        labels = [row[0] for row in cursor.fetchall()]
+        for label in labels:
+            code, note = parse_status_label(label)
+            cursor.execute(
+                'UPDATE master_plan SET status_code = ?, status_note = ? WHERE status IS ?',
+                (int(code), note, label)
+            )
+        conn.commit()
+        print(f"✅ Backfilled status_code from {len(labels)} distinct status labels.")
+
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            cursor.execute('ALTER TABLE master_plan DROP COLUMN status')
+            conn.commit()
+            print("✅ Old status column dropped.")
+        else:
+            print(f"⚠️ SQLite {sqlite3.sqlite_version} cannot drop columns; old status column left unused.")
+
+    conn.close()
+    print("Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
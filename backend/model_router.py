@@ -0,0 +1,217 @@
+"""
+Model Router
+Hedged and fallback routing around the receipt extraction call to cut tail latency
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .ai_client import AIClient, AIClientError, get_ai_client, parse_ai_json
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies (seconds) with percentile lookup"""
+
+    def __init__(self, window: int = 500):
+        self.samples = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))
+        return ordered[index]
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+
+class ModelRouter:
+    """
+    Runs the extraction on the primary model. If no valid JSON has arrived after the
+    hedge delay (a latency percentile of recent primary calls), the same request is
+    issued to the secondary model and whichever valid answer lands first wins.
+    Without a secondary model there is no hedging: repeating the call on the same
+    model under the same rate limit would only double the load on a slow upstream.
+    If every model route fails, the caller's local extractor (ocr.ocr_fallback,
+    when enabled) gets the last word.
+    """
+
+    def __init__(
+        self,
+        client: AIClient,
+        primary_model: Optional[str] = None,
+        secondary_model: Optional[str] = None,
+        hedge_enabled: bool = True,
+        hedge_percentile: float = 0.95,
+        initial_hedge_delay: float = 8.0,
+        min_hedge_delay: float = 2.0,
+        min_samples: int = 20,
+    ):
+        self.client = client
+        self.primary_model = primary_model or client.model_name
+        self.secondary_model = secondary_model
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+
+        self.latency: Dict[str, LatencyTracker] = {}
+        self.wins: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.hedges_fired = 0
+
+    @classmethod
+    def from_env(cls, client: AIClient) -> "ModelRouter":
+        return cls(
+            client,
+            secondary_model=os.getenv("AI_SECONDARY_MODEL") or None,
+            hedge_enabled=os.getenv("AI_HEDGE_ENABLED", "1") not in ("0", "false", "no"),
+            hedge_percentile=float(os.getenv("AI_HEDGE_PERCENTILE", "0.95")),
+            initial_hedge_delay=float(os.getenv("AI_HEDGE_INITIAL_DELAY", "8")),
+            min_hedge_delay=float(os.getenv("AI_HEDGE_MIN_DELAY", "2")),
+        )
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait on the primary before hedging"""
+        tracker = self.latency.get("primary")
+        if tracker is None or len(tracker) < self.min_samples:
+            return self.initial_hedge_delay
+        return max(self.min_hedge_delay, tracker.percentile(self.hedge_percentile))
+
+    async def _run(self, route: str, model_name: str, parts: List[Any],
+                   system_instruction: Optional[str]) -> Tuple[Dict[str, Any], float, float]:
+        """(result, model latency, JSON parse seconds)"""
+        start = time.perf_counter()
+        text = await self.client.generate(parts, model_name=model_name, system_instruction=system_instruction)
+        parse_start = time.perf_counter()
+        result = parse_ai_json(text)
+        if not isinstance(result, dict):
+            raise ValueError(f"Expected a JSON object from {route}, got {type(result).__name__}")
+        return result, parse_start - start, time.perf_counter() - parse_start
+
+    def _route_model(self, route: str) -> str:
+        return self.secondary_model if route == "secondary" else self.primary_model
+
+    def _record(self, route: str, latency: float, success: bool) -> None:
+        if success:
+            self.wins[route] = self.wins.get(route, 0) + 1
+            self.latency.setdefault(route, LatencyTracker()).add(latency)
+        else:
+            self.failures[route] = self.failures.get(route, 0) + 1
+
+    def _record_cancelled(self, route: str, elapsed: float) -> None:
+        """
+        A losing route was cancelled after `elapsed` seconds: its latency is at least
+        that. Keeping the censored sample stops slow primaries from vanishing from
+        the window, which would pull the hedge delay down and fire ever more hedges.
+        """
+        self.latency.setdefault(route, LatencyTracker()).add(elapsed)
+
+    async def extract(self, parts: List[Any], system_instruction: Optional[str] = None,
+                      local_extractor: Optional[Callable[[], Awaitable[Optional[Dict[str, Any]]]]] = None
+                      ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Returns (ai_result, route_info) where route_info names the winning route and the
+        latency of every route that was tried. `local_extractor` reads this receipt
+        without a model (it knows the plan; the router does not) and is only tried
+        when every model route failed. Raises the primary's error if all routes fail.
+        """
+        started = time.perf_counter()
+        tasks = {asyncio.create_task(self._run("primary", self.primary_model, parts, system_instruction)): "primary"}
+        launched = {route: started for route in tasks.values()}
+        pending = set(tasks)
+        hedged = not (self.hedge_enabled and self.secondary_model)
+        latencies: Dict[str, float] = {}
+        errors: Dict[str, Exception] = {}
+
+        def launch_hedge():
+            task = asyncio.create_task(self._run("secondary", self.secondary_model, parts, system_instruction))
+            tasks[task] = "secondary"
+            launched["secondary"] = time.perf_counter()
+            pending.add(task)
+
+        try:
+            while pending:
+                timeout = None
+                if not hedged:
+                    timeout = max(0.0, self.hedge_delay() - (time.perf_counter() - started))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                pending.difference_update(done)
+
+                if not done:
+                    # Primary is slower than the hedge threshold - race the secondary model
+                    hedged = True
+                    self.hedges_fired += 1
+                    launch_hedge()
+                    continue
+
+                for task in done:
+                    route = tasks[task]
+                    try:
+                        result, latency, parse_seconds = task.result()
+                    except (AIClientError, ValueError) as e:
+                        errors[route] = e
+                        latencies[route] = round(time.perf_counter() - started, 3)
+                        self._record(route, 0.0, success=False)
+                        continue
+                    latencies[route] = round(latency, 3)
+                    self._record(route, latency, success=True)
+                    return result, {"route": route, "model": self._route_model(route), "hedged": len(tasks) > 1,
+                                    "latencies": latencies, "parse_seconds": parse_seconds}
+
+                # Everything that finished failed: fall back to the secondary model right away
+                if not hedged and self.secondary_model:
+                    hedged = True
+                    launch_hedge()
+        finally:
+            for task in pending:
+                task.cancel()
+                self._record_cancelled(tasks[task], time.perf_counter() - launched[tasks[task]])
+
+        if local_extractor:
+            local_started = time.perf_counter()
+            result = await local_extractor()
+            if result:
+                latency = time.perf_counter() - local_started
+                latencies["local"] = round(latency, 3)
+                self._record("local", latency, success=True)
+                return result, {"route": "local", "model": "local", "hedged": len(tasks) > 1, "latencies": latencies}
+            self._record("local", 0.0, success=False)
+
+        raise errors.get("primary") or next(iter(errors.values()))
+
+    def summary(self) -> Dict[str, Any]:
+        """Win counts and latency percentiles per route, for tuning the hedge thresholds"""
+        routes = set(self.wins) | set(self.failures) | set(self.latency)
+        return {
+            "hedge_delay": round(self.hedge_delay(), 3),
+            "hedges_fired": self.hedges_fired,
+            "routes": {
+                route: {
+                    "wins": self.wins.get(route, 0),
+                    "failures": self.failures.get(route, 0),
+                    "p50": self.latency[route].percentile(0.50) if route in self.latency else None,
+                    "p95": self.latency[route].percentile(0.95) if route in self.latency else None,
+                    "p99": self.latency[route].percentile(0.99) if route in self.latency else None,
+                }
+                for route in sorted(routes)
+            },
+        }
+
+
+_router: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    """Process-wide shared router (wraps the shared AI client)"""
+    global _router
+    if _router is None:
+        _router = ModelRouter.from_env(get_ai_client())
+    return _router
@@ -1,8 +1,11 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum as SQLEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Index, Boolean, Float, LargeBinary, Enum as SQLEnum
+from sqlalchemy import DDL, event
+from sqlalchemy.orm import relationship, deferred, declared_attr
 from datetime import datetime
 import enum
+import zlib
 from .database import Base
+from .search_keys import key_default
 
 # Enum for Company
 class CompanyEnum(str, enum.Enum):
@@ -11,6 +14,31 @@ class CompanyEnum(str, enum.Enum):
     GALASSIYA = "Galassiya"
     PERFETTO = "Perfetto"
 
+# Plan payment status (stored as a small integer; labels are rendered by plan_status.py)
+class PlanStatus(enum.IntEnum):
+    PENDING = 0
+    VERIFIED = 1
+    UNDERPAID = 2
+    OVERPAID = 3
+    REJECTED = 4
+    MANUAL = 5  # Free-form admin status, text kept in status_note
+
+# zlib-compressed AI log column shared by payments and review items
+class CompressedAiLog:
+    # Deferred: list queries never load it
+    @declared_attr
+    def ai_log_gz(cls):
+        return deferred(Column(LargeBinary, nullable=True))
+    
+    @property
+    def ai_log(self):
+        """Raw AI log as a JSON string (loads the deferred column)"""
+        return zlib.decompress(self.ai_log_gz).decode("utf-8") if self.ai_log_gz else None
+    
+    @ai_log.setter
+    def ai_log(self, value):
+        self.ai_log_gz = zlib.compress(value.encode("utf-8"), 6) if value else None
+
 # Users Table
 class User(Base):
     __tablename__ = "users"
@@ -41,23 +69,175 @@ class MasterPlan(Base):
     target_amount = Column(Integer, nullable=False)
     planned_type = Column(String, nullable=False)  # 'Card' or 'Cash'
     month = Column(Integer, nullable=False)  # e.g., 10 for October
-    status = Column(String, default="Pending")  # 'Pending', 'Verified', etc.
+    status_code = Column(Integer, nullable=False, default=PlanStatus.PENDING, server_default="0", index=True)  # PlanStatus
+    status_note = Column(String, nullable=True)  # Admin's own label for PlanStatus.MANUAL
+    
+    # Current payment state, maintained by payments.py in the same transaction as the
+    # payment rows (superseded payments are not counted)
+    paid_total = Column(Integer, nullable=False, default=0, server_default="0")
+    payment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    latest_payment_id = Column(Integer, ForeignKey("payments.id", use_alter=True, name="fk_master_plan_latest_payment"), nullable=True)
+    
+    # Transliterated, case-folded search keys (search_keys.py), indexed by plan_search
+    name_key = Column(String, nullable=True, default=key_default("name_key"))
+    workplace_key = Column(String, nullable=True, default=key_default("workplace_key"))
+    # Last 9 / last 4 digits of phone, for matching a receipt to its plan (plan_matching.py)
+    phone9 = Column(String, nullable=True, default=key_default("phone9"))
+    phone_last4 = Column(String, nullable=True, default=key_default("phone_last4"))
+    
+    # Sync version of the last change to this row or its payments (sync.py)
+    row_version = Column(BigInteger, nullable=False, default=0, server_default="0")
     
     # Relationship
-    payments = relationship("Payment", back_populates="plan")
+    payments = relationship("Payment", back_populates="plan", foreign_keys="Payment.plan_id")
+    latest_payment = relationship("Payment", foreign_keys=[latest_payment_id], post_update=True)
+    
+    __table_args__ = (
+        # Dashboard status counts: COUNT ... WHERE company/month GROUP BY status_code
+        Index("ix_master_plan_company_month_status", "company", "month", "status_code"),
+        # Delta sync: rows changed since a version
+        Index("ix_master_plan_company_row_version", "company", "row_version"),
+        # Receipt auto-match: plans of a company/month with this phone
+        Index("ix_master_plan_company_phone9_month", "company", "phone9", "month"),
+        Index("ix_master_plan_company_phone_last4_month", "company", "phone_last4", "month"),
+    )
+
+# Trigram full-text index over the search keys and phone (SQLite FTS5, external
+# content = master_plan, kept in sync by triggers; search_index.py queries it)
+PLAN_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS plan_search USING fts5(
+        name_key, workplace_key, phone,
+        content='master_plan', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS plan_search_ai AFTER INSERT ON master_plan BEGIN
+        INSERT INTO plan_search(rowid, name_key, workplace_key, phone)
+        VALUES (new.id, new.name_key, new.workplace_key, new.phone);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS plan_search_ad AFTER DELETE ON master_plan BEGIN
+        INSERT INTO plan_search(plan_search, rowid, name_key, workplace_key, phone)
+        VALUES ('delete', old.id, old.name_key, old.workplace_key, old.phone);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS plan_search_au AFTER UPDATE OF name_key, workplace_key, phone ON master_plan BEGIN
+        INSERT INTO plan_search(plan_search, rowid, name_key, workplace_key, phone)
+        VALUES ('delete', old.id, old.name_key, old.workplace_key, old.phone);
+        INSERT INTO plan_search(rowid, name_key, workplace_key, phone)
+        VALUES (new.id, new.name_key, new.workplace_key, new.phone);
+    END""",
+]
+for statement in PLAN_SEARCH_DDL:
+    event.listen(MasterPlan.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(
+    MasterPlan.__table__, "before_drop",
+    DDL("DROP TABLE IF EXISTS plan_search").execute_if(dialect="sqlite")
+)
 
 # Payments Table
-class Payment(Base):
+class Payment(CompressedAiLog, Base):
     __tablename__ = "payments"
     
     id = Column(Integer, primary_key=True, index=True)
-    plan_id = Column(Integer, ForeignKey("master_plan.id"), nullable=False)
+    plan_id = Column(Integer, ForeignKey("master_plan.id"), nullable=False, index=True)
     amount_paid = Column(Integer, nullable=False)
     proof_image_path = Column(String, nullable=True)  # Path to stored image
     payment_method = Column(String, nullable=False)  # 'Card/Click' or 'Cash/Paper'
     verified_at = Column(DateTime, default=datetime.utcnow)
-    ai_log = Column(String, nullable=True)  # JSON dump of AI verification result
+    # ai_log / ai_log_gz (CompressedAiLog): the raw AI verification result; the fields
+    # worth querying live in payment_extractions
     transaction_id = Column(String, nullable=True, unique=True, index=True)  # Unique transaction ID for duplicate detection
+    image_hash = Column(String, nullable=True, index=True)  # 64-bit dHash (hex) of the proof image for near-duplicate detection
+    superseded_by_id = Column(Integer, ForeignKey("payments.id"), nullable=True, index=True)  # Admin correction that replaced this payment; NULL = current
     
     # Relationship
-    plan = relationship("MasterPlan", back_populates="payments")
+    plan = relationship("MasterPlan", back_populates="payments", foreign_keys=[plan_id])
+    extraction = relationship("PaymentExtraction", back_populates="payment", uselist=False)
+
+# AI Extraction Table (typed copy of the key ai_log fields, one row per AI/OCR-verified payment)
+class PaymentExtraction(Base):
+    __tablename__ = "payment_extractions"
+    
+    payment_id = Column(Integer, ForeignKey("payments.id"), primary_key=True)
+    source = Column(String, nullable=False)  # 'ai' or 'local_ocr'
+    model_name = Column(String, nullable=True, index=True)
+    route = Column(String, nullable=True)  # Model router route: primary / hedge / secondary / local / local_ocr
+    latency_ms = Column(Integer, nullable=True)
+    confidence = Column(Float, nullable=True, index=True)
+    extracted_phone = Column(String, nullable=True)
+    extracted_amount = Column(Integer, nullable=True)
+    extracted_month = Column(Integer, nullable=True)
+    phone_matched = Column(Boolean, nullable=True)
+    last4_matched = Column(Boolean, nullable=True)
+    name_matched = Column(Boolean, nullable=True)
+    is_authentic = Column(Boolean, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    # Relationship
+    payment = relationship("Payment", back_populates="extraction")
+    
+    __table_args__ = (
+        # "Which match rule verified the identity" (e.g. only last4 matched)
+        Index("ix_payment_extractions_matches", "phone_matched", "last4_matched", "name_matched"),
+    )
+
+# Review Queue Table (receipts held for a human: AI unavailable or low confidence)
+class ReviewItem(CompressedAiLog, Base):
+    __tablename__ = "review_queue"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    plan_id = Column(Integer, ForeignKey("master_plan.id"), nullable=False, index=True)
+    reason = Column(String, nullable=False)  # 'ai_unavailable', 'low_confidence', 'no_amount' or 'possible_duplicate'
+    state = Column(String, nullable=False, default="open")  # 'open', 'claimed', 'approved', 'rejected'
+    amount_at_stake = Column(Integer, nullable=False, default=0)
+    sort_key = Column(Float, nullable=False)  # Claim order: enqueue time minus an amount head start (review_queue.py)
+    proof_image_path = Column(String, nullable=True)
+    payment_method = Column(String, nullable=False)
+    extracted_amount = Column(Integer, nullable=True)
+    confidence = Column(Float, nullable=True)
+    transaction_id = Column(String, nullable=True)
+    image_hash = Column(String, nullable=True, index=True)
+    error = Column(String, nullable=True)  # AI failure message for 'ai_unavailable'
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Lease: a claim is exclusive until lease_expires_at, then anyone may reclaim it
+    claimed_by = Column(String, nullable=True)
+    lease_token = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    
+    resolved_at = Column(DateTime, nullable=True, index=True)
+    resolved_by = Column(String, nullable=True)
+    resolution_note = Column(String, nullable=True)
+    payment_id = Column(Integer, ForeignKey("payments.id"), nullable=True)  # Payment recorded on approval
+    
+    # Relationship
+    plan = relationship("MasterPlan")
+    
+    __table_args__ = (
+        Index("ix_review_queue_state_sort", "state", "sort_key"),
+    )
+
+
+# Sync version counter (single row, see sync.py)
+class SyncState(Base):
+    __tablename__ = "sync_state"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+# Deleted plan rows, so delta sync can tell clients to drop them
+class PlanTombstone(Base):
+    __tablename__ = "plan_tombstones"
+    
+    id = Column(Integer, primary_key=True)
+    plan_id = Column(Integer, nullable=False)
+    # Scope of the deleted row (who may learn about the delete)
+    company = Column(String, nullable=False)
+    region = Column(String, nullable=True)
+    group_name = Column(String, nullable=True)
+    district = Column(String, nullable=True)
+    month = Column(Integer, nullable=True)
+    row_version = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_plan_tombstones_company_row_version", "company", "row_version"),
+    )
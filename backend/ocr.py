@@ -0,0 +1,235 @@
+"""
+Local OCR Pre-pass
+Reads machine-rendered Card/Click payment screenshots with Tesseract and accepts
+them without a model call when every field is read confidently and matches the plan.
+Anything ambiguous (and all Cash/Paper receipts) escalates to the AI pipeline.
+
+Optional: needs `pytesseract` + `Pillow` and the tesseract binary (with the `rus`
+language pack). Enable with OCR_ENABLED=1 (before the model call) or OCR_FALLBACK=1
+(only when the model routes failed); without the dependencies both are no-ops.
+"""
+import asyncio
+import os
+import re
+import time
+from io import BytesIO
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .models import MasterPlan
+from .prompts import payment_mode
+
+try:
+    import pytesseract
+    from PIL import Image
+    OCR_AVAILABLE = True
+except ImportError:
+    OCR_AVAILABLE = False
+
+OCR_ENABLED = os.getenv("OCR_ENABLED", "0").lower() in ("1", "true", "yes")
+# Last-resort route of the model router: read the screenshot locally when every model call failed
+OCR_FALLBACK = os.getenv("OCR_FALLBACK", "0").lower() in ("1", "true", "yes")
+OCR_LANG = os.getenv("OCR_LANG", "rus+eng")
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "0.80"))
+
+
+# ==================== FIELD PATTERNS ====================
+
+_NUMBER = r"(\d[\d \u00a0.,]*\d|\d)"
+_CURRENCY = r"(?:uzs|сум|so['ʻ’`]?m|sum|сўм)"
+
+# Labelled amounts first ("Сумма: 1 200 000"), then any number followed by a currency
+AMOUNT_LABELLED = re.compile(
+    r"(?:сумма(?:\s+платежа)?|summa|amount|итого|jami|to['ʻ’`]?lov\s+summasi)\s*[:\-]?\s*" + _NUMBER,
+    re.IGNORECASE,
+)
+AMOUNT_WITH_CURRENCY = re.compile(_NUMBER + r"\s*" + _CURRENCY + r"\b", re.IGNORECASE)
+
+TRANSACTION_ID = re.compile(
+    r"(?:id\s*транзакции|transaction\s*id|tranzaksiya\s*id|чек\s*№|№\s*чека|check\s*#|receipt\s*№?)"
+    r"\s*[:#№]?\s*([A-Za-z0-9\-]{6,})",
+    re.IGNORECASE,
+)
+PHONE = re.compile(r"(?:\+?998)?[\s\-(]*(\d{2})[\s\-)]*(\d{3})[\s\-]*(\d{2})[\s\-]*(\d{2})(?!\d)")
+CARD_TAIL = re.compile(r"[*xX•]{2,}\s*(\d{4})\b")
+DATE = re.compile(r"\b(\d{1,2})[./\-](\d{1,2})[./\-](\d{4})\b")
+
+
+def parse_amount(raw: str) -> Optional[int]:
+    """'1 200 000,00' / '1,200,000.00' / '1200000' -> 1200000"""
+    raw = raw.replace(" ", "").replace("\u00a0", "")
+    if re.search(r"[.,]\d{2}$", raw):
+        raw = raw[:-3]  # Drop tiyin
+    digits = re.sub(r"[^0-9]", "", raw)
+    return int(digits) if digits else None
+
+
+def extract_fields(text: str) -> Dict[str, Any]:
+    """Pull amount, transaction ID, phone, card tail and months out of OCR text"""
+    amounts = [parse_amount(m) for m in AMOUNT_LABELLED.findall(text)]
+    if not any(amounts):
+        amounts = [parse_amount(m) for m in AMOUNT_WITH_CURRENCY.findall(text)]
+    amounts = sorted({a for a in amounts if a})
+
+    transaction = TRANSACTION_ID.search(text)
+    phones = ["".join(groups) for groups in PHONE.findall(text)]
+    return {
+        "amounts": amounts,
+        "transaction_id": transaction.group(1) if transaction else None,
+        "phones": phones,
+        "card_tails": CARD_TAIL.findall(text),
+        "months": sorted({int(m) for _, m, _ in DATE.findall(text) if 1 <= int(m) <= 12}),
+    }
+
+
+def ocr_image(content: bytes) -> Tuple[str, float]:
+    """Run Tesseract. Returns (text, mean word confidence 0..1)"""
+    image = Image.open(BytesIO(content))
+    data = pytesseract.image_to_data(image, lang=OCR_LANG, output_type=pytesseract.Output.DICT)
+    words: List[str] = []
+    confidences: List[float] = []
+    line_key = None
+    for word, conf, block, par, line in zip(data["text"], data["conf"], data["block_num"],
+                                            data["par_num"], data["line_num"]):
+        if not word.strip():
+            continue
+        # Rebuild line breaks so "label: value" pairs stay on one line
+        key = (block, par, line)
+        if line_key is not None and key != line_key:
+            words.append("\n")
+        line_key = key
+        words.append(word)
+        if float(conf) >= 0:
+            confidences.append(float(conf) / 100)
+    text = " ".join(words).replace(" \n ", "\n")
+    return text, (sum(confidences) / len(confidences) if confidences else 0.0)
+
+
+def match_plan(fields: Dict[str, Any], confidence: float, plan: MasterPlan) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    Decide whether the OCR reading is good enough to skip the model.
+    Returns (ai_result, reason); ai_result is None when the receipt must escalate.
+    """
+    if confidence < OCR_MIN_CONFIDENCE:
+        return None, "low_confidence"
+    if len(fields["amounts"]) != 1:
+        return None, "amount_ambiguous" if fields["amounts"] else "amount_missing"
+    amount = fields["amounts"][0]
+    if amount != plan.target_amount:
+        return None, "amount_mismatch"
+    if plan.month not in fields["months"]:
+        return None, "month_missing"
+
+    plan_phone = (plan.phone or "")[-9:]
+    phone_matched = bool(plan_phone) and any(p[-9:] == plan_phone for p in fields["phones"])
+    plan_card_tail = re.sub(r"[^0-9]", "", plan.card_number or "")[-4:]
+    card_matched = bool(plan_card_tail) and plan_card_tail in fields["card_tails"]
+    if not (phone_matched or card_matched):
+        return None, "identity_unmatched"
+
+    return {
+        "extracted_name": "",
+        "extracted_phone": plan_phone if phone_matched else "",
+        "extracted_phone_last4": plan_phone[-4:] if phone_matched else "",
+        "extracted_amount": amount,
+        "extracted_month": plan.month,
+        "extracted_transaction_id": fields["transaction_id"],
+        "has_complete_date": True,
+        "has_signature": True,
+        "has_stamp": True,
+        "is_authentic": True,
+        "identity_match": True,
+        "phone_matched": phone_matched,
+        "last4_matched": False,
+        "name_matched": False,
+        "card_matched": card_matched,
+        "confidence": round(confidence, 3),
+        "reason": "Local OCR: amount, month and " + ("phone" if phone_matched else "card number") + " matched",
+        "source": "local_ocr",
+    }, "accepted"
+
+
+# ==================== STATS ====================
+
+class OCRStats:
+    """Escalation rate and time spent, to weigh the pre-pass against model latency"""
+
+    def __init__(self):
+        self.attempts = 0
+        self.accepted = 0
+        self.escalations: Dict[str, int] = {}
+        self.ocr_seconds = 0.0
+
+    def record(self, reason: str, seconds: float) -> None:
+        self.attempts += 1
+        self.ocr_seconds += seconds
+        if reason == "accepted":
+            self.accepted += 1
+        else:
+            self.escalations[reason] = self.escalations.get(reason, 0) + 1
+
+    def summary(self, model_p50: Optional[float] = None) -> Dict[str, Any]:
+        escalated = self.attempts - self.accepted
+        avg_ocr = self.ocr_seconds / self.attempts if self.attempts else 0.0
+        result = {
+            "enabled": OCR_ENABLED and OCR_AVAILABLE,
+            "fallback": OCR_FALLBACK and OCR_AVAILABLE,
+            "attempts": self.attempts,
+            "accepted": self.accepted,
+            "escalated": escalated,
+            "escalation_rate": round(escalated / self.attempts, 3) if self.attempts else None,
+            "escalation_reasons": self.escalations,
+            "avg_ocr_seconds": round(avg_ocr, 3),
+        }
+        if model_p50 is not None:
+            # Accepted receipts skip a model call; escalated ones pay the OCR time on top
+            result["latency_saved_seconds"] = round(
+                self.accepted * model_p50 - self.ocr_seconds, 3
+            )
+        return result
+
+
+ocr_stats = OCRStats()
+
+
+async def _read_locally(content: bytes, plan: MasterPlan) -> Tuple[Optional[Dict[str, Any]], float]:
+    """(ai_result or None, seconds spent), recorded in ocr_stats"""
+    started = time.perf_counter()
+    try:
+        text, confidence = await asyncio.to_thread(ocr_image, content)
+        result, reason = match_plan(extract_fields(text), confidence, plan)
+    except Exception:
+        # Unreadable image / tesseract problem - the model handles it
+        result, reason = None, "ocr_error"
+    elapsed = time.perf_counter() - started
+    ocr_stats.record(reason, elapsed)
+    return result, elapsed
+
+
+async def run_ocr_prepass(content: bytes, plan: MasterPlan, payment_method: str) -> Optional[Dict[str, Any]]:
+    """Try to verify a Card/Click screenshot locally. Returns an ai_result dict or None (escalate)"""
+    if not (OCR_ENABLED and OCR_AVAILABLE) or payment_mode(payment_method) != "Card/Click":
+        return None
+
+    result, elapsed = await _read_locally(content, plan)
+    if result is not None:
+        # Same shape as the model router's route info
+        result["ai_route"] = {"route": "local_ocr", "model": "tesseract", "hedged": False,
+                              "latencies": {"local_ocr": round(elapsed, 3)}}
+    return result
+
+
+def ocr_fallback(content: bytes, plan: MasterPlan,
+                 payment_method: str) -> Optional[Callable[[], Awaitable[Optional[Dict[str, Any]]]]]:
+    """
+    The model router's local route for this receipt (ModelRouter.extract's
+    local_extractor), or None when it cannot help: fallback off, OCR missing, a
+    paper receipt, or the pre-pass already read this image and escalated it.
+    """
+    if not (OCR_FALLBACK and OCR_AVAILABLE) or OCR_ENABLED or payment_mode(payment_method) != "Card/Click":
+        return None
+
+    async def extract() -> Optional[Dict[str, Any]]:
+        result, _ = await _read_locally(content, plan)
+        return result
+
+    return extract
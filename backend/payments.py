@@ -0,0 +1,74 @@
+"""
+Payment Ledger
+Payments are append-only. Each verified receipt adds a row; an admin correction
+adds a row that supersedes every current payment of the plan. MasterPlan carries
+paid_total / payment_count / latest_payment_id for the current (non-superseded)
+payments, updated in the caller's transaction so readers never scan payments.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.orm import Session
+
+from .models import MasterPlan, Payment
+from .sync import transaction_version
+
+
+def append_payment(db: Session, plan: MasterPlan, payment: Payment) -> None:
+    """
+    Add a payment on top of the plan's current ones. The counters are bumped with
+    SQL expressions, so concurrent appends to the same plan cannot lose an update.
+    The caller commits.
+    """
+    payment.plan_id = plan.id
+    db.add(payment)
+    db.flush()
+    plan.paid_total = MasterPlan.paid_total + payment.amount_paid
+    plan.payment_count = MasterPlan.payment_count + 1
+    plan.latest_payment_id = payment.id
+    db.flush()
+
+
+def supersede_payments(db: Session, plan: MasterPlan, correction: Payment) -> Optional[Payment]:
+    """
+    Record an admin correction that replaces the plan's current payments: they stay
+    in the history with superseded_by_id pointing at the correction, and the
+    correction alone makes up the new paid total. Returns the previous latest
+    payment (None if there was none). The caller commits.
+    """
+    previous = plan.latest_payment
+    correction.plan_id = plan.id
+    db.add(correction)
+    db.flush()
+    db.execute(
+        update(Payment)
+        .where(Payment.plan_id == plan.id, Payment.superseded_by_id.is_(None), Payment.id != correction.id)
+        .values(superseded_by_id=correction.id)
+    )
+    plan.paid_total = correction.amount_paid
+    plan.payment_count = 1
+    plan.latest_payment_id = correction.id
+    db.flush()
+    return previous
+
+
+def payment_history(db: Session, plan_id: int):
+    """All payments of a plan, oldest first, superseded ones included"""
+    return db.query(Payment).filter(Payment.plan_id == plan_id).order_by(Payment.id).all()
+
+
+def recompute_payment_totals(db: Session, plan_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Rebuild the denormalized columns from the payments table (backfill / repair).
+    Returns the number of plans updated. The caller commits.
+    """
+    current = and_(Payment.plan_id == MasterPlan.id, Payment.superseded_by_id.is_(None))
+    statement = update(MasterPlan).values(
+        paid_total=select(func.coalesce(func.sum(Payment.amount_paid), 0)).where(current).scalar_subquery(),
+        payment_count=select(func.count(Payment.id)).where(current).scalar_subquery(),
+        latest_payment_id=select(func.max(Payment.id)).where(current).scalar_subquery(),
+        row_version=transaction_version(db),
+    )
+    if plan_ids is not None:
+        statement = statement.where(MasterPlan.id.in_(list(plan_ids)))
+    return db.execute(statement).rowcount
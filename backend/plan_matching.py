@@ -0,0 +1,104 @@
+"""
+Receipt-to-Plan Matching
+Finds the plan a receipt belongs to from the phone read off it, within the
+manager's scope and month: the full number (last 9 digits) first, then its last
+4 digits - each an index lookup on (company, phone key, month). When several
+plans share the number, the name on the receipt breaks the tie. Once matched, the
+plan-dependent parts of the forensic checks are applied to the plan-less reading.
+"""
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from .access_scope import PlanScope
+from .metrics import registry
+from .models import MasterPlan
+from .prompts import plan_currency
+from .search_index import word_similarity
+from .search_keys import phone9, phone_last4, search_key
+
+# Ambiguous matches listed back to the manager
+MAX_CANDIDATES = 5
+# Receipt name vs plan name (trigram word similarity) to count as the same doctor
+NAME_MIN_SIMILARITY = 0.4
+# How a UZS amount may be written on paper: as is, in thousands ("100" = 100,000), in dollars (1 USD ~ 12,000 UZS)
+UZS_WRITTEN_FACTORS = (1, 1000, 12000)
+
+RECEIPT_MATCHES = registry.counter(
+    "synergy_receipt_matches_total", "Receipts matched to a plan without one being chosen",
+    ("outcome",)
+)
+
+
+class PlanMatch(NamedTuple):
+    plans: List[MasterPlan]     # Candidates (exactly one = attach automatically)
+    matched_by: Optional[str]   # 'phone', 'last4', with '+name' when the name narrowed it down
+
+
+def _narrow_by_name(plans: List[MasterPlan], name: Optional[str]) -> List[MasterPlan]:
+    """Plans whose doctor name resembles the receipt's (all of them when none does)"""
+    key = search_key(name)
+    if not key:
+        return plans
+    named = [p for p in plans if word_similarity(key, p.name_key or search_key(p.doctor_name)) >= NAME_MIN_SIMILARITY]
+    return named or plans
+
+
+def match_receipt(db: Session, scope: PlanScope, month: int, phone: Optional[str],
+                  last4: Optional[str] = None, name: Optional[str] = None) -> PlanMatch:
+    """Candidate plans for a receipt's extracted phone / last 4 digits / name"""
+    match = _match(db, scope, month, phone, last4, name)
+    if len(match.plans) == 1:
+        RECEIPT_MATCHES.inc(match.matched_by)
+    else:
+        RECEIPT_MATCHES.inc('ambiguous' if match.plans else 'none')
+    return match
+
+
+def _match(db: Session, scope: PlanScope, month: int, phone: Optional[str],
+           last4: Optional[str], name: Optional[str]) -> PlanMatch:
+    base = scope.apply(db.query(MasterPlan)).filter(MasterPlan.month == month)
+    lookups = (
+        ('phone', MasterPlan.phone9, phone9(phone)),
+        ('last4', MasterPlan.phone_last4, phone_last4(last4) or phone_last4(phone)),
+    )
+    for matched_by, column, value in lookups:
+        if not value:
+            continue
+        plans = base.filter(column == value).order_by(MasterPlan.id).all()
+        if not plans:
+            continue
+        if len(plans) > 1:
+            named = _narrow_by_name(plans, name)
+            if len(named) < len(plans):
+                return PlanMatch(named, matched_by + '+name')
+        return PlanMatch(plans, matched_by)
+    return PlanMatch([], None)
+
+
+# ==================== PLAN CHECKS ====================
+
+def resolve_written_amount(value: Any, plan: MasterPlan) -> Optional[int]:
+    """
+    The forensic prompt's smart conversion, applied locally: a UZS amount written as
+    shorthand becomes whichever reading lies closest to the plan's target.
+    """
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        return None
+    if plan_currency(plan.planned_type) == 'USD' or not plan.target_amount:
+        return value
+    return min((value * factor for factor in UZS_WRITTEN_FACTORS), key=lambda amount: abs(amount - plan.target_amount))
+
+
+def apply_plan_match(reading: Dict[str, Any], plan: MasterPlan, matched_by: str) -> Dict[str, Any]:
+    """Turn an identify-prompt reading into the forensic result for the plan it matched"""
+    result = dict(reading)
+    result["extracted_amount"] = resolve_written_amount(reading.get("written_amount"), plan)
+    result["identity_match"] = True
+    result["phone_matched"] = matched_by.startswith('phone')
+    result["last4_matched"] = matched_by.startswith('last4')
+    result["name_matched"] = matched_by.endswith('+name')
+    result["reason"] = f"Matched to plan #{plan.id} by {matched_by}. {reading.get('reason') or ''}".strip()
+    return result
@@ -0,0 +1,232 @@
+"""
+Month Rollover
+Prepares a new month by cloning a company's previous plan in one INSERT ... SELECT
+(status reset to Pending), then optionally applies a delta sheet of changes:
+updated targets/details, new doctors, and doctors dropped from the plan.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from .metrics import NULL_TIMER
+from .models import MasterPlan, Payment, PlanStatus
+from .plan_validation import previous_month
+from .search_keys import DERIVED_COLUMNS, derived_values
+from .services import find_header_in_rows, list_plan_sources, parse_rows_columnar, read_source_rows
+from .sync import delete_plans, transaction_version
+
+
+plan_table = MasterPlan.__table__
+
+# Columns carried over from the source month as-is
+CLONED_COLUMNS = [
+    'company', 'region', 'district', 'group_name', 'manager_name', 'doctor_name',
+    'specialty', 'workplace', 'phone', 'card_number', 'target_amount', 'planned_type',
+]
+
+
+class RolloverError(Exception):
+    """
+    Rollover refused. `status` is the HTTP status it maps to: 409 for a target
+    month that is not empty, 404 for nothing to clone, 400 for a bad request
+    (unreadable delta, same source and target month).
+    """
+
+    def __init__(self, message: str, status: int = 409):
+        super().__init__(message)
+        self.status = status
+
+
+def _identity_keys(phone: str, doctor_name: str, region: str) -> Tuple[Optional[str], Tuple[str, str]]:
+    """(last 9 phone digits or None, (lower-cased name, region)) - how delta rows find their plan row"""
+    return (phone[-9:] if phone and len(phone) >= 9 else None), (doctor_name.strip().lower(), region)
+
+
+def parse_delta(content: bytes, filename: str, company_name: str, month: int):
+    """
+    Delta sheet -> [(record, fields present in the sheet, row reference)], errors.
+    Only columns that exist in the sheet overwrite the cloned values.
+    """
+    changes = []
+    errors = []
+    for source in list_plan_sources(content, filename):
+        rows = read_source_rows(source)
+        header_row, col_map = find_header_in_rows(rows[:10])
+        present = {field for field, col_idx in col_map.items() if col_idx}
+        row_numbers: List[int] = []
+        records, row_errors = parse_rows_columnar(rows, company_name, month, row_numbers=row_numbers)
+        errors.extend(f"{source.label}: {e}" for e in row_errors)
+        changes.extend(
+            (record, present, f"{source.label} row {n}") for record, n in zip(records, row_numbers)
+        )
+    return changes, errors
+
+
+def rollover_month(
+    db: Session,
+    company_name: str,
+    to_month: int,
+    from_month: Optional[int] = None,
+    delta_content: Optional[bytes] = None,
+    delta_filename: Optional[str] = None,
+    replace: bool = False,
+    timer=NULL_TIMER,
+) -> Dict[str, Any]:
+    """
+    Clone from_month (default: the month before) into to_month and apply the delta.
+    Delta rows are matched by phone, then by name + region; a matched row with a
+    target amount of 0 removes that doctor from the new month. All in one transaction.
+    """
+    from_month = from_month or previous_month(to_month)
+    if from_month == to_month:
+        raise RolloverError("Source and target month are the same", status=400)
+
+    # ===== CHECK TARGET MONTH =====
+    existing = db.query(func.count(MasterPlan.id)).filter(
+        MasterPlan.company == company_name, MasterPlan.month == to_month
+    ).scalar()
+    if existing:
+        if not replace:
+            raise RolloverError(
+                f"{company_name} already has {existing} plan rows for month {to_month}. "
+                f"Use replace to overwrite them."
+            )
+        paid = db.query(func.count(Payment.id)).join(MasterPlan, Payment.plan_id == MasterPlan.id).filter(
+            MasterPlan.company == company_name, MasterPlan.month == to_month
+        ).scalar()
+        if paid:
+            raise RolloverError(f"Month {to_month} already has {paid} payments recorded; it cannot be replaced.")
+
+    # Parse the delta before touching the database, so a bad file changes nothing
+    changes, errors = [], []
+    if delta_content:
+        with timer.stage("delta_parse"):
+            try:
+                changes, errors = parse_delta(delta_content, delta_filename, company_name, to_month)
+            except Exception as e:
+                raise RolloverError(f"Could not read delta file: {e}", status=400)
+
+    try:
+        if existing:
+            with timer.stage("replace_delete"):
+                delete_plans(db, plan_table.c.company == company_name, plan_table.c.month == to_month)
+
+        # ===== CLONE (INSERT ... SELECT) =====
+        with timer.stage("clone"):
+            copied = CLONED_COLUMNS + list(DERIVED_COLUMNS)
+            source_columns = [plan_table.c[name] for name in copied]
+            cloned = db.execute(
+                insert(plan_table).from_select(
+                    copied + ['month', 'status_code', 'row_version'],
+                    select(*source_columns, literal(to_month), literal(int(PlanStatus.PENDING)),
+                           literal(transaction_version(db)))
+                    .where(plan_table.c.company == company_name, plan_table.c.month == from_month)
+                    .order_by(plan_table.c.id)
+                )
+            ).rowcount
+        if not cloned and not changes:
+            db.rollback()
+            raise RolloverError(f"{company_name} has no plan rows for month {from_month} to clone", status=404)
+
+        updated = added = removed = 0
+        unmatched_removals: List[str] = []
+        if changes:
+            with timer.stage("delta_apply"):
+                updated, added, removed, unmatched_removals, ambiguous = _apply_delta(
+                    db, company_name, to_month, changes
+                )
+            errors.extend(f"{ref}: matches several plan rows - not applied" for ref in ambiguous)
+            errors.extend(f"{ref}: removal did not match any plan row" for ref in unmatched_removals)
+
+        with timer.stage("db_commit"):
+            db.commit()
+    except RolloverError:
+        raise
+    except Exception:
+        db.rollback()
+        raise
+
+    total = db.query(func.count(MasterPlan.id)).filter(
+        MasterPlan.company == company_name, MasterPlan.month == to_month
+    ).scalar()
+    return {
+        'success': True,
+        'from_month': from_month,
+        'to_month': to_month,
+        'replaced': existing,
+        'cloned': cloned,
+        'updated': updated,
+        'added': added,
+        'removed': removed,
+        'total': total,
+        'errors': errors,
+    }
+
+
+def _apply_delta(db: Session, company_name: str, month: int, changes):
+    rows = db.execute(
+        select(plan_table.c.id, plan_table.c.phone, plan_table.c.doctor_name, plan_table.c.region)
+        .where(plan_table.c.company == company_name, plan_table.c.month == month)
+    ).all()
+    by_phone: Dict[str, List[int]] = {}
+    by_name: Dict[Tuple[str, str], List[int]] = {}
+    by_name_only: Dict[str, List[int]] = {}
+    for plan_id, phone, doctor_name, region in rows:
+        phone_key, name_key = _identity_keys(phone or '', doctor_name or '', region or '')
+        if phone_key:
+            by_phone.setdefault(phone_key, []).append(plan_id)
+        by_name.setdefault(name_key, []).append(plan_id)
+        by_name_only.setdefault(name_key[0], []).append(plan_id)
+
+    updates: Dict[str, List[Dict[str, Any]]] = {}  # Grouped by changed column set for executemany
+    inserts: List[Dict[str, Any]] = []
+    removals: List[int] = []
+    unmatched_removals: List[str] = []
+    ambiguous: List[str] = []
+
+    for record, present, ref in changes:
+        phone_key, name_key = _identity_keys(record['phone'], record['doctor_name'], record['region'])
+        phone_ids = by_phone.get(phone_key, []) if phone_key else []
+        if len(phone_ids) == 1:
+            matches = phone_ids
+        elif 'region' in present:
+            matches = by_name.get(name_key, [])
+        else:
+            matches = by_name_only.get(name_key[0], [])
+        if len(matches) > 1:
+            ambiguous.append(ref)
+            continue
+
+        if record['target_amount'] == 0 and 'target_amount' in present:
+            if matches:
+                removals.append(matches[0])
+            else:
+                unmatched_removals.append(ref)
+            continue
+
+        if not matches:
+            inserts.append(record)
+            continue
+
+        changed = {field: record[field] for field in sorted(present & set(CLONED_COLUMNS))}
+        # Changed names, workplaces and phones get new keys (inserts get them from the column defaults)
+        changed.update(derived_values(changed))
+        values = {f'v_{field}': value for field, value in changed.items()}
+        values['b_id'] = matches[0]
+        updates.setdefault(','.join(changed), []).append(values)
+
+    version = transaction_version(db)
+    for key, params in updates.items():
+        fields = key.split(',')
+        db.execute(
+            update(plan_table).where(plan_table.c.id == bindparam('b_id'))
+            .values({**{field: bindparam(f'v_{field}') for field in fields}, 'row_version': version}),
+            params
+        )
+    if inserts:
+        db.execute(insert(plan_table).values(row_version=version), inserts)
+    if removals:
+        delete_plans(db, plan_table.c.id.in_(removals))
+
+    return sum(len(p) for p in updates.values()), len(inserts), len(removals), unmatched_removals, ambiguous
@@ -0,0 +1,61 @@
+"""
+Plan Status
+Status is stored as a PlanStatus code; debt/overpay come from target_amount and
+paid_total. These helpers pick the code for a payment and render the label the
+dashboards show ("⚠️ Underpaid (Debt: 1,200,000 UZS)").
+"""
+from typing import Optional, Tuple
+
+from .models import MasterPlan, PlanStatus
+
+
+def status_for_balance(target_amount: int, paid_total: int) -> PlanStatus:
+    """Verified / Underpaid / Overpaid from the plan's running paid total"""
+    difference = target_amount - paid_total
+    if difference == 0:
+        return PlanStatus.VERIFIED
+    return PlanStatus.UNDERPAID if difference > 0 else PlanStatus.OVERPAID
+
+
+def render_status(code: int, target_amount: int, paid_total: int, note: Optional[str] = None) -> str:
+    """Human-readable label for a status code"""
+    difference = target_amount - (paid_total or 0)
+    if code == PlanStatus.VERIFIED:
+        return "✅ Verified"
+    if code == PlanStatus.UNDERPAID:
+        return f"⚠️ Underpaid (Debt: {difference:,} UZS)"
+    if code == PlanStatus.OVERPAID:
+        return f"⚠️ Overpaid (+{abs(difference):,} UZS)"
+    if code == PlanStatus.REJECTED:
+        return note or "❌ Rejected"
+    if code == PlanStatus.MANUAL:
+        return note or "Manual"
+    return "Pending"
+
+
+def plan_status_label(plan: MasterPlan) -> str:
+    return render_status(plan.status_code, plan.target_amount, plan.paid_total, plan.status_note)
+
+
+def parse_status_label(label: str) -> Tuple[PlanStatus, Optional[str]]:
+    """
+    Admin-entered status -> (code, note). Known statuses (a code name such as
+    'verified', or a rendered label) map to their code; the debt figure in a label
+    is ignored because it is recomputed from the amounts. Anything else is MANUAL
+    and keeps its text. Also used by the migration to backfill old strings.
+    """
+    text = (label or '').strip()
+    lowered = text.lower()
+    if not lowered or lowered == 'pending':
+        return PlanStatus.PENDING, None
+    if lowered in ('verified', 'underpaid', 'overpaid', 'rejected', 'manual'):
+        return PlanStatus[lowered.upper()], None
+    if 'underpaid' in lowered:
+        return PlanStatus.UNDERPAID, None
+    if 'overpaid' in lowered:
+        return PlanStatus.OVERPAID, None
+    if 'verified' in lowered or '✅' in text:
+        return PlanStatus.VERIFIED, None
+    if 'rejected' in lowered or '❌' in text:
+        return PlanStatus.REJECTED, text
+    return PlanStatus.MANUAL, text
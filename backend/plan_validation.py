@@ -0,0 +1,193 @@
+"""
+Plan Import Validation
+Dry-run diagnostics for a parsed plan upload: per-row anomaly checks and per
+region/group totals compared with the previous month's plan, before anything
+is written.
+"""
+import re
+from collections import Counter as TallyCounter
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .models import MasterPlan
+from .metrics import NULL_TIMER
+from .services import REGION_MAP, list_plan_sources, parse_plan_sources, combined_errors, source_report
+
+
+# Everything normalize_region can map to; anything else fell through unchanged
+KNOWN_REGIONS = frozenset(REGION_MAP.values())
+
+# Plan group values per company. Manager access codes (AB, A2C, A2CB2, VITA1, ...)
+# are not groups a plan row carries, so a typo of one is still flagged.
+# Galassiya / Perfetto have no groups, so only last month's values are checked there.
+COMPANY_GROUPS = {
+    'Synergy': frozenset({'A', 'B', 'C', 'A2', 'B2'}),
+    'Amare': frozenset({'VITA', 'FORTE'}),
+}
+
+# Local (9 digits) or with the 998 country code (12 digits)
+_VALID_PHONE = re.compile(r'^(?:998)?\d{9}$')
+
+# Region/group totals moving more than this versus last month are flagged
+LARGE_CHANGE_RATIO = 0.5
+
+MAX_ROW_DIAGNOSTICS = 1000
+
+
+def previous_month(month: int) -> int:
+    return 12 if month == 1 else month - 1
+
+
+def _totals(records: List[Dict[str, Any]]) -> Dict[Tuple[str, str], List[int]]:
+    """(region, group) -> [rows, target sum]"""
+    totals: Dict[Tuple[str, str], List[int]] = {}
+    for record in records:
+        entry = totals.setdefault((record['region'], record['group_name']), [0, 0])
+        entry[0] += 1
+        entry[1] += record['target_amount']
+    return totals
+
+
+def validate_plan_records(
+    records: List[Dict[str, Any]],
+    row_refs: List[str],
+    company_name: str,
+    month: int,
+    db: Session,
+) -> Dict[str, Any]:
+    """
+    Diagnostics for parsed master_plan records (nothing is written).
+    row_refs[i] names the sheet row of records[i] ("plan.xlsx/Sheet1 row 12").
+    """
+    prev = previous_month(month)
+    last_month = {
+        (region, group): (count, int(total or 0))
+        for region, group, count, total in db.query(
+            MasterPlan.region, MasterPlan.group_name, func.count(MasterPlan.id), func.sum(MasterPlan.target_amount)
+        ).filter(
+            MasterPlan.company == company_name, MasterPlan.month == prev
+        ).group_by(MasterPlan.region, MasterPlan.group_name)
+    }
+    existing_rows = db.query(func.count(MasterPlan.id)).filter(
+        MasterPlan.company == company_name, MasterPlan.month == month
+    ).scalar()
+
+    known_groups = COMPANY_GROUPS.get(company_name, frozenset()) | {group for _, group in last_month}
+    identities = TallyCounter((r['doctor_name'], r['phone']) for r in records)
+
+    # ===== PER-ROW CHECKS =====
+    diagnostics: List[Dict[str, Any]] = []
+    issue_counts: Dict[str, int] = {}
+    rows_with_issues = 0
+    for record, ref in zip(records, row_refs):
+        issues = []
+        if record['region'] not in KNOWN_REGIONS:
+            issues.append('region_missing' if record['region'] == 'UNKNOWN' else 'region_unmapped')
+        if record['target_amount'] == 0:
+            issues.append('zero_amount')
+        elif record['target_amount'] < 0:
+            issues.append('negative_amount')
+        if known_groups and record['group_name'] not in known_groups:
+            issues.append('unknown_group')
+        if record['doctor_name'] == 'Unknown':
+            issues.append('missing_name')
+        if record['phone'] and not _VALID_PHONE.match(record['phone']):
+            issues.append('phone_invalid')
+        if identities[(record['doctor_name'], record['phone'])] > 1:
+            issues.append('duplicate_in_file')
+
+        if issues:
+            rows_with_issues += 1
+            for issue in issues:
+                issue_counts[issue] = issue_counts.get(issue, 0) + 1
+            if len(diagnostics) < MAX_ROW_DIAGNOSTICS:
+                diagnostics.append({
+                    'row': ref,
+                    'doctor_name': record['doctor_name'],
+                    'region': record['region'],
+                    'group_name': record['group_name'],
+                    'target_amount': record['target_amount'],
+                    'issues': issues,
+                })
+
+    # ===== REGION / GROUP TOTALS VS LAST MONTH =====
+    current = _totals(records)
+    comparison = []
+    for key in sorted(set(current) | set(last_month)):
+        rows, total = current.get(key, [0, 0])
+        prev_rows, prev_total = last_month.get(key, (0, 0))
+        flags = []
+        if not prev_rows:
+            if last_month:
+                flags.append('new_in_plan')
+        elif not rows:
+            flags.append('missing_from_upload')
+        elif prev_total and abs(total - prev_total) / prev_total > LARGE_CHANGE_RATIO:
+            flags.append('large_change')
+        comparison.append({
+            'region': key[0],
+            'group_name': key[1],
+            'rows': rows,
+            'target_total': total,
+            'last_month_rows': prev_rows,
+            'last_month_target_total': prev_total,
+            'target_change_pct': round((total - prev_total) / prev_total * 100, 1) if prev_total else None,
+            'flags': flags,
+        })
+
+    warnings = []
+    if existing_rows:
+        warnings.append(
+            f"{company_name} already has {existing_rows} plan rows for month {month}; "
+            f"importing adds {len(records)} more"
+        )
+
+    return {
+        'rows': len(records),
+        'rows_with_issues': rows_with_issues,
+        'issue_counts': issue_counts,
+        'diagnostics': diagnostics,
+        'diagnostics_truncated': rows_with_issues > len(diagnostics),
+        'target_total': sum(r['target_amount'] for r in records),
+        'last_month': prev,
+        'last_month_target_total': sum(total for _, total in last_month.values()),
+        'by_region_group': comparison,
+        'warnings': warnings,
+    }
+
+
+def dry_run_plan_file(file_content: bytes, company_name: str, db: Session, month: int = 12,
+                      filename: str = None, timer=NULL_TIMER) -> Dict[str, Any]:
+    """
+    Parse and validate an upload exactly as the columnar import would, without writing.
+    Same shape as import_plan_file's result plus a 'validation' report.
+    """
+    try:
+        with timer.stage("file_list"):
+            sources = list_plan_sources(file_content, filename)
+    except Exception as e:
+        return {'success': False, 'inserted_count': 0, 'errors': [f"Could not read file: {e}"]}
+    if not sources:
+        return {'success': False, 'inserted_count': 0, 'errors': ["No plan files (.xlsx, .csv, .parquet) found"]}
+
+    parsed = parse_plan_sources(sources, company_name, month, timer=timer)
+    failures = [p['failed'] for p in parsed if p.get('failed')]
+    if failures:
+        return {'success': False, 'inserted_count': 0, 'errors': failures, 'sources': source_report(parsed)}
+
+    records = [record for p in parsed for record in p['records']]
+    row_refs = [f"{p['source']} row {n}" for p in parsed for n in p['row_numbers']]
+    with timer.stage("validate"):
+        validation = validate_plan_records(records, row_refs, company_name, month, db)
+
+    return {
+        'success': True,
+        'dry_run': True,
+        'inserted_count': 0,
+        'would_insert_count': len(records),
+        'errors': combined_errors(parsed),
+        'sources': source_report(parsed),
+        'validation': validation,
+    }
@@ -0,0 +1,300 @@
+"""
+Forensic Prompt Templates
+Static receipt-verification instructions compiled once at import time.
+Only the small per-plan CONTEXT block is rendered per request; the static part is
+sent as the model's system instruction so it forms a stable, cacheable prefix.
+"""
+from typing import NamedTuple
+
+from .models import MasterPlan
+
+
+MONTH_NAMES = {
+    1: 'January', 2: 'February', 3: 'March', 4: 'April',
+    5: 'May', 6: 'June', 7: 'July', 8: 'August',
+    9: 'September', 10: 'October', 11: 'November', 12: 'December'
+}
+
+# Currency code -> label shown to the model
+CURRENCY_LABELS = {
+    'UZS': "UZS (So'm)",
+    'USD': "USD (Dollars)",
+}
+
+
+# ==================== STATIC TEMPLATE PARTS ====================
+
+# Shared with the identification prompt below
+_PHONE_RULES = """
+1. **PHONE NUMBER EXTRACTION (HIGHEST PRIORITY)**:
+   - CAREFULLY look for phone numbers near "Телефон:", "Tel:", "Phone:" or similar labels
+   - Uzbek phone formats: (XX) XXX XXXX, +998XXXXXXXXX, 8X XXX XXXX, 9X XXX XXXX
+   - EXTRACT ALL DIGITS you can read, even if partially unclear
+   - Common prefixes: 80, 90, 91, 93, 94, 95, 97, 98, 99, 88, 33, 71
+   - If you see something like "(80) 903 9992" or "80 903 9992", extract as "809039992"
+   - IGNORE spaces, dashes, parentheses - just get the digits
+   - Put the raw digits in extracted_phone field
+   - **ALSO extract the LAST 4 READABLE DIGITS separately** into `extracted_phone_last4` field
+   - Even if the full number is messy, try to read at least the last 4 digits clearly
+"""
+
+# Shared with the identification prompt below (numbered by each prompt)
+_DATE_RULES = """DATE VALIDATION (EXTREMELY LENIENT for Handwriting):
+   - CRITICAL: Doctors have messy handwriting. Do NOT be strict.
+   - If the date lines have ANY ink, scribbles, or marks -> set `has_complete_date = true`.
+   - ONLY return `has_complete_date = false` if the lines are COMPLETELY BLANK (empty underscores with no writing).
+   - MONTH MATCHING:
+     * If the month is written clearly, extract it.
+     * If the month is MESSY, AMBIGUOUS, or hard to read (e.g., looks like "11", "II", "//", "N", or just a scribble), ASSUME it matches the Expected Month from CONTEXT!
+     * Set `extracted_month` to the Expected Month number if there is any doubt.
+"""
+
+_AUTHENTICITY_RULES = """AUTHENTICITY CHECK (for Cash/Paper receipts only):
+   - If payment mode is "Cash/Paper":
+     * Look for handwritten SIGNATURE near 'Imzo', 'Подпись'
+     * Look for official INK STAMP (blue/purple circle with text/logo)
+     * If signature found -> has_signature = true, else false
+     * If stamp found -> has_stamp = true, else false
+     * If EITHER signature OR stamp found -> is_authentic = true
+     * If BOTH are missing -> is_authentic = false
+   - If payment mode is "Card/Click":
+     * Signature and stamp are NOT required
+     * Set has_signature = true, has_stamp = true, is_authentic = true (bypass check)
+"""
+
+_TRANSACTION_RULES = """TRANSACTION ID EXTRACTION (for duplicate detection):
+   - Look for "ID транзакции", "Transaction ID", "Чек №", "Check #", or similar fields
+   - Extract the full numeric/alphanumeric transaction identifier
+   - Common locations: near bottom of receipt, labeled as ID, Transaction, or Check number
+   - If found, include in extracted_transaction_id field
+"""
+
+_RULES_HEAD = """
+ROLE: Senior Forensic Auditor. Verify this Uzbek payment receipt (РЕЦЕПТ).
+The expected values for this receipt are given in the CONTEXT block of the request.
+
+CRITICAL RULES:
+""" + _PHONE_RULES + """
+2. **IDENTITY VERIFICATION (SOFT MATCHING FOR MESSY HANDWRITING)**:
+   - Doctor handwriting is often messy. Use this SOFT matching approach:
+
+   **MATCH PRIORITY (in order):**
+   a) FULL PHONE MATCH: Compare extracted phone with the Expected Phone from CONTEXT
+      - Normalize both: remove +998, spaces, dashes, parentheses
+      - Match if last 9 digits are the same → identity_match = true
+
+   b) LAST 4 DIGITS FALLBACK: If full phone is unclear/doesn't match:
+      - Compare the last 4 digits of extracted_phone_last4 with the last 4 digits of the Expected Phone
+      - If they match → identity_match = true, set `last4_matched = true`
+      - This is for receipts where most of the number is messy but the last 4 are readable
+
+   c) NAME MATCH: If phone methods don't work:
+      - Fuzzy match the name (Latin/Cyrillic interchangeable)
+      - Partial matches OK: "Саид" matches "Саидова"
+      - If name matches → identity_match = true
+
+   **FINAL RULE**: If ANY of the above (full phone, last 4 digits, OR name) matches → identity_match = true
+
+3. **NAME EXTRACTION (SECONDARY)**:
+   - Look for name near "Ф.И.О врача:", "ФИО:", "Врач:", "Shifokor:"
+   - Handwritten names may be hard to read - extract what you can
+   - Latin/Cyrillic interchangeable (e.g., "Саидова" = "Saidova")
+   - Partial matches are OK: "Саид" matches "Саидова"
+
+4. """ + _DATE_RULES + """
+5. """ + _AUTHENTICITY_RULES
+
+_AMOUNT_RULES = {
+    'USD': """
+6. **AMOUNT EXTRACTION (DOLLAR MODE - CRITICAL)**:
+   - This is a DOLLAR ($) Transaction.
+   - The Expected Amount in CONTEXT is in dollars.
+
+   **WHERE TO LOOK FOR AMOUNT (check ALL of these fields):**
+   - "Рекомендация:" (Recommendation) - PRIMARY location
+   - "Количество:" (Quantity) - SECONDARY location, often shows numbers like "3000 МЛ"
+   - "Подпись:" (Signature area) - sometimes amount is written near signature
+   - "Сумма:" (Sum) - if present
+
+   - The written amount is usually the EXACT number (e.g., "50", "150", "200").
+   - DO NOT multiply by 1000.
+   - DO NOT treat as thousands.
+   - Extract the exact numeric value found.
+""",
+    'UZS': """
+6. **AMOUNT EXTRACTION (UZS MODE - CRITICAL)**:
+   - This is a UZS (Sum) Transaction.
+   - The Expected Amount in CONTEXT is in UZS.
+
+   **WHERE TO LOOK FOR AMOUNT (check ALL of these fields - IMPORTANT!):**
+   - "Рекомендация:" (Recommendation) - PRIMARY location
+   - "Количество:" (Quantity) - SECONDARY location, often shows numbers like "3000 МЛ" or "3000"
+   - "Подпись:" (Signature area) - sometimes amount is written near signature
+   - "Сумма:" (Sum) - if present
+
+   **IMPORTANT**: If "Количество" shows something like "3000 МЛ" or "3000", this IS the amount!
+   Ignore "МЛ" (milliliters label) - extract just the number.
+
+   **SMART CONVERSION LOGIC (Paper Checks)**:
+    Doctors write numbers in different ways. You must deduce the intent based on the Expected Amount in CONTEXT.
+
+   If you find a small number like "100", "50", "200", "3000":
+
+   A) **Standard Shorthand (x 1,000)**:
+      * "100" means 100,000 UZS.
+      * "500" means 500,000 UZS.
+      * "3000" means 3,000,000 UZS (3 million).
+      * USE THIS IF: (Found Value * 1000) is close to Expected Amount.
+
+   B) **Dollar-to-Sum Conversion (x 12,000)**:
+      * Sometimes "100$" or just "100" means 100 DOLLARS worth of Sum.
+      * Rate: 1 USD ≈ 12,000 UZS.
+      * "100" or "100$" -> 1,200,000 UZS.
+      * "50" or "50$" -> 600,000 UZS.
+      * USE THIS IF: (Found Value * 12000) is close to Expected Amount.
+
+   **DECISION RULES:**
+   - "100" with Expected ~100,000 -> Result is 100,000.
+   - "100" with Expected ~1,200,000 -> Result is 1,200,000.
+   - "3000" with Expected ~3,000,000 -> Result is 3,000,000.
+   - "50" with Expected ~50,000 -> Result is 50,000.
+   - "50" with Expected ~600,000 -> Result is 600,000.
+
+   ALWAYS return the calculated UZS value (e.g. 3000000), not the small number.
+""",
+}
+
+_RULES_TAIL = """
+7. """ + _TRANSACTION_RULES + """
+OUTPUT STRICTLY AS JSON (no markdown, no explanation):
+{
+    "extracted_name": "name found on receipt (even if unclear)",
+    "extracted_phone": "all phone digits you can read (e.g. 809039992)",
+    "extracted_phone_last4": "last 4 readable digits of phone (e.g. 9992)",
+    "extracted_amount": 500000,
+    "extracted_month": 11,
+    "extracted_transaction_id": "290022691",
+    "has_complete_date": true,
+    "has_signature": true,
+    "has_stamp": true,
+    "is_authentic": true,
+    "identity_match": true,
+    "phone_matched": true,
+    "last4_matched": false,
+    "name_matched": false,
+    "confidence": 0.95,
+    "reason": "Brief explanation of how identity was verified (full phone, last 4 digits, or name)"
+}
+"""
+
+# Compiled once: one static system instruction per currency
+SYSTEM_INSTRUCTIONS = {
+    currency: _RULES_HEAD + amount_rules + _RULES_TAIL
+    for currency, amount_rules in _AMOUNT_RULES.items()
+}
+
+_CONTEXT_TEMPLATE = """CONTEXT:
+- Expected Doctor Name: "{doctor_name}"
+- Expected Phone: "{phone}"
+- Expected Amount: {target_amount:,} {currency}
+- Payment Mode: {mode}
+- Expected Currency: {currency_label}
+- Expected Month: {month_name} ({month})
+"""
+
+
+# ==================== RENDERING ====================
+
+class ForensicPrompt(NamedTuple):
+    system_instruction: str  # Static, identical for every plan of this currency
+    context: str             # Per-plan fields only
+
+    def full_text(self) -> str:
+        """Single-string prompt for transports without system-instruction support"""
+        return self.system_instruction + "\n" + self.context
+
+
+def payment_mode(payment_method: str) -> str:
+    """Map the form's payment_method to the label used in prompts and payments"""
+    return "Cash/Paper" if payment_method.lower() == "cash" else "Card/Click"
+
+
+def plan_currency(planned_type: str) -> str:
+    """Plans whose type mentions dollars are paid in USD, everything else in UZS"""
+    planned_type = (planned_type or '').lower()
+    return 'USD' if 'dollar' in planned_type or 'usd' in planned_type else 'UZS'
+
+
+def month_name(month: int) -> str:
+    return MONTH_NAMES.get(month, 'Unknown')
+
+
+def build_forensic_prompt(plan: MasterPlan, payment_method: str) -> ForensicPrompt:
+    """Pick the compiled instructions for the plan's currency and render its CONTEXT block"""
+    currency = plan_currency(plan.planned_type)
+    context = _CONTEXT_TEMPLATE.format(
+        doctor_name=plan.doctor_name,
+        phone=plan.phone or '',
+        target_amount=plan.target_amount,
+        currency=currency,
+        mode=payment_mode(payment_method),
+        currency_label=CURRENCY_LABELS[currency],
+        month_name=month_name(plan.month),
+        month=plan.month,
+    )
+    return ForensicPrompt(SYSTEM_INSTRUCTIONS[currency], context)
+
+
+# ==================== RECEIPT IDENTIFICATION ====================
+
+# Auto-match (/manager/verify/auto): one plan-less read of everything the gatekeeper needs.
+# The amount comes back as written; shorthand ("100" = 100,000 or $100) is resolved
+# against the matched plan's target afterwards (plan_matching.resolve_written_amount).
+IDENTIFY_INSTRUCTION = """
+ROLE: Receipt Reader. Read this Uzbek payment receipt (РЕЦЕПТ) or Card/Click screenshot.
+No plan has been selected yet: read the values as written, they are checked against the plan afterwards.
+
+CRITICAL RULES:
+""" + _PHONE_RULES + """
+2. **NAME EXTRACTION**:
+   - Look for name near "Ф.И.О врача:", "ФИО:", "Врач:", "Shifokor:", or the recipient on a Card/Click screenshot
+   - Write the name as it appears (Latin or Cyrillic)
+
+3. **AMOUNT (AS WRITTEN)**:
+   - Look at "Рекомендация:", "Количество:" (e.g. "3000 МЛ" - ignore "МЛ"), near "Подпись:", "Сумма:", or the paid amount on a Card/Click screenshot
+   - Return the number EXACTLY as written, digits only: "100" -> 100, "3000 МЛ" -> 3000, "1 200 000,00 so'm" -> 1200000
+   - Do NOT multiply shorthand or convert dollars - that is done against the plan afterwards
+   - If no amount is readable, set written_amount to null
+
+4. """ + _DATE_RULES + """
+5. """ + _AUTHENTICITY_RULES + """
+6. """ + _TRANSACTION_RULES + """
+OUTPUT STRICTLY AS JSON (no markdown, no explanation):
+{
+    "extracted_name": "name found on receipt (even if unclear)",
+    "extracted_phone": "all phone digits you can read (e.g. 809039992)",
+    "extracted_phone_last4": "last 4 readable digits of phone (e.g. 9992)",
+    "written_amount": 100,
+    "extracted_month": 11,
+    "extracted_transaction_id": "290022691",
+    "has_complete_date": true,
+    "has_signature": true,
+    "has_stamp": true,
+    "is_authentic": true,
+    "confidence": 0.95,
+    "reason": "Brief note on anything that was hard to read"
+}
+"""
+
+_IDENTIFY_CONTEXT_TEMPLATE = """CONTEXT:
+- Payment Mode: {mode}
+- Expected Month: {month_name} ({month})
+"""
+
+
+def build_identify_prompt(payment_method: str, month: int) -> ForensicPrompt:
+    """Plan-less prompt that reads the doctor's phone and name plus the receipt's forensic fields"""
+    context = _IDENTIFY_CONTEXT_TEMPLATE.format(
+        mode=payment_mode(payment_method), month_name=month_name(month), month=month
+    )
+    return ForensicPrompt(IDENTIFY_INSTRUCTION, context)
@@ -0,0 +1,148 @@
+"""
+Lean Read Path
+Doctor list endpoints select only the columns they return as Core rows, map them
+into slotted DoctorRow objects and encode straight to JSON bytes (orjson when
+installed), skipping ORM hydration, per-row Pydantic models and FastAPI's
+re-validation. Large bodies are gzip/brotli compressed when the client accepts it.
+
+Optional: `orjson` (falls back to the stdlib json) and `brotli`.
+"""
+import gzip
+import json
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Query, Session
+
+from .models import MasterPlan, Payment, PlanStatus
+from .plan_status import render_status
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "32768"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+_STATUS_NAMES = {status.value: status.name.lower() for status in PlanStatus}
+
+
+@dataclass(slots=True)
+class DoctorRow:
+    """Same fields (and JSON shape) as main.DoctorResponse"""
+    id: int
+    company: str
+    region: str
+    district: str
+    group_name: str
+    manager_name: str
+    doctor_name: str
+    specialty: str
+    workplace: str
+    phone: str
+    card_number: str
+    target_amount: int
+    planned_type: str
+    month: int
+    status: str
+    status_code: str
+    proof_image: Optional[str]
+    amount_paid: int
+    payment_count: int
+
+
+# Everything DoctorRow needs and nothing else (no ai_log, no payment history)
+DOCTOR_COLUMNS = (
+    MasterPlan.id, MasterPlan.company, MasterPlan.region, MasterPlan.district,
+    MasterPlan.group_name, MasterPlan.manager_name, MasterPlan.doctor_name,
+    MasterPlan.specialty, MasterPlan.workplace, MasterPlan.phone, MasterPlan.card_number,
+    MasterPlan.target_amount, MasterPlan.planned_type, MasterPlan.month,
+    MasterPlan.status_code, MasterPlan.status_note, MasterPlan.paid_total, MasterPlan.payment_count,
+    Payment.proof_image_path,
+)
+
+
+def fetch_doctor_rows(db: Session, query: Query) -> List[DoctorRow]:
+    """Run a filtered MasterPlan query as a column-only select joined to the latest payment"""
+    statement = (
+        query.with_entities(*DOCTOR_COLUMNS)
+        .outerjoin(Payment, Payment.id == MasterPlan.latest_payment_id)
+        .statement
+    )
+    status_names = _STATUS_NAMES
+    return [
+        DoctorRow(
+            plan_id, company, region, district or '', group_name, manager_name or '',
+            doctor_name, specialty or '', workplace or '', phone or '', card_number or '',
+            target_amount, planned_type, month,
+            render_status(status_code, target_amount, paid_total, status_note),
+            status_names.get(status_code, 'pending'),
+            proof_image, paid_total, payment_count,
+        )
+        for (
+            plan_id, company, region, district, group_name, manager_name, doctor_name,
+            specialty, workplace, phone, card_number, target_amount, planned_type, month,
+            status_code, status_note, paid_total, payment_count, proof_image,
+        ) in db.execute(statement)
+    ]
+
+
+def _default(value):
+    if isinstance(value, DoctorRow):
+        return {name: getattr(value, name) for name in DoctorRow.__slots__}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload) -> bytes:
+    """JSON bytes; orjson serializes the slotted dataclasses natively"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def compress(body: bytes, accept_encoding: str):
+    """(body, Content-Encoding or None) - brotli, then gzip, when accepted and worth it"""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    accepted = {token.split(';')[0].strip().lower() for token in accept_encoding.split(',')}
+    if BROTLI_AVAILABLE and 'br' in accepted:
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    if 'gzip' in accepted:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), 'gzip'
+    return body, None
+
+
+def json_bytes_response(request: Request, payload) -> Response:
+    """Encoded (and possibly compressed) JSON response, bypassing response_model serialization"""
+    body, encoding = compress(dumps(payload), request.headers.get('accept-encoding', ''))
+    headers = {'Vary': 'Accept-Encoding'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(content=body, media_type='application/json', headers=headers)
+
+
+def doctor_list_response(request: Request, db: Session, query: Query) -> Response:
+    """fetch_doctor_rows + json_bytes_response (blocking; run it off the event loop)"""
+    return json_bytes_response(request, fetch_doctor_rows(db, query))
+
+
+def doctor_changes_response(request: Request, db: Session, changes: dict) -> Response:
+    """Delta sync body for sync.plan_changes: changed rows as DoctorRow plus deleted ids (blocking)"""
+    return json_bytes_response(request, {
+        'version': changes['version'],
+        'reset': changes['reset'],
+        'upserted': fetch_doctor_rows(db, changes['query']),
+        'deleted': changes['deleted'],
+    })
@@ -0,0 +1,341 @@
+"""
+Review Queue
+Receipts the pipeline should not decide alone - the model was unavailable, it
+answered with low confidence or without a usable amount, or the image is close
+to one already paid - wait here for an admin instead of being rejected or
+accepted silently.
+
+Admins claim items with a lease. Claiming is a compare-and-set UPDATE per
+candidate (the SQLite-safe equivalent of SELECT ... FOR UPDATE SKIP LOCKED, which
+is added on databases that support it), so any number of admins can work the
+queue without two of them getting the same receipt. An expired lease makes the
+item claimable again.
+"""
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .extractions import extraction_from_result
+from .metrics import registry
+from .models import MasterPlan, Payment, PlanStatus, ReviewItem
+from .payments import append_payment
+from .plan_status import status_for_balance
+
+# Results below this confidence go to review instead of being recorded
+REVIEW_MIN_CONFIDENCE = float(os.getenv("REVIEW_MIN_CONFIDENCE", "0.7"))
+REVIEW_LEASE_SECONDS = int(os.getenv("REVIEW_LEASE_SECONDS", "300"))
+# Priority: every REVIEW_UZS_PER_HOUR at stake counts as one hour of waiting
+REVIEW_UZS_PER_HOUR = int(os.getenv("REVIEW_UZS_PER_HOUR", "100000"))
+# Candidates fetched per requested item, so lost races can be skipped without a second query
+CLAIM_OVERFETCH = 4
+MAX_CLAIM = 20
+
+REVIEW_REASONS = ('ai_unavailable', 'low_confidence', 'no_amount', 'possible_duplicate')
+EPOCH = datetime(1970, 1, 1)
+
+REVIEW_ENQUEUED = registry.counter(
+    "synergy_review_enqueued_total", "Receipts sent to the review queue", ("reason",)
+)
+REVIEW_RESOLVED = registry.counter(
+    "synergy_review_resolved_total", "Review items resolved", ("reason", "decision")
+)
+REVIEW_CLAIM_CONFLICTS = registry.counter(
+    "synergy_review_claim_conflicts_total", "Claim attempts lost to another admin"
+)
+REVIEW_AGE_SECONDS = registry.histogram(
+    "synergy_review_age_seconds", "Time from enqueue to resolution", ("reason",),
+    buckets=(60, 300, 900, 1800, 3600, 7200, 14400, 28800, 86400, 172800, 604800)
+)
+
+
+class ReviewLeaseError(Exception):
+    """The caller does not hold a live lease on this item (expired, released, or never claimed)"""
+
+
+def _sort_key(created_at: datetime, amount_at_stake: int) -> float:
+    """
+    Ascending claim order combining age and money: older first, and each
+    REVIEW_UZS_PER_HOUR at stake moves an item up as if it had waited an hour
+    longer. Static, so it can be indexed.
+    """
+    return (created_at - EPOCH).total_seconds() - max(amount_at_stake, 0) / REVIEW_UZS_PER_HOUR * 3600
+
+
+def enqueue_review(
+    db: Session,
+    plan: MasterPlan,
+    reason: str,
+    payment_method: str,
+    proof_image_path: Optional[str],
+    ai_result: Optional[Dict[str, Any]] = None,
+    image_hash: Optional[str] = None,
+    error: Optional[str] = None,
+) -> ReviewItem:
+    """
+    Queue a receipt for review (commits). A resubmission of the same image for
+    the same plan while it is still waiting returns the existing item.
+    """
+    if image_hash:
+        existing = db.query(ReviewItem).filter(
+            ReviewItem.plan_id == plan.id,
+            ReviewItem.image_hash == image_hash,
+            ReviewItem.state.in_(('open', 'claimed'))
+        ).first()
+        if existing:
+            return existing
+
+    ai_result = ai_result or {}
+    extracted_amount = ai_result.get("extracted_amount")
+    extracted_amount = extracted_amount if isinstance(extracted_amount, int) and extracted_amount > 0 else None
+    confidence = ai_result.get("confidence")
+    transaction_id = ai_result.get("extracted_transaction_id")
+    # What goes wrong if the decision is wrong: the amount to be credited, else the open debt
+    amount_at_stake = extracted_amount if extracted_amount is not None else max(plan.target_amount - plan.paid_total, 0)
+    created_at = datetime.utcnow()
+    item = ReviewItem(
+        plan_id=plan.id,
+        reason=reason,
+        state='open',
+        amount_at_stake=amount_at_stake,
+        sort_key=_sort_key(created_at, amount_at_stake),
+        proof_image_path=proof_image_path,
+        payment_method=payment_method,
+        extracted_amount=extracted_amount,
+        confidence=float(confidence) if isinstance(confidence, (int, float)) else None,
+        transaction_id=str(transaction_id) if transaction_id else None,
+        image_hash=image_hash,
+        error=error,
+        created_at=created_at,
+        ai_log=json.dumps(ai_result) if ai_result else None,
+    )
+    db.add(item)
+    db.commit()
+    REVIEW_ENQUEUED.inc(reason)
+    return item
+
+
+def _claimable(now: datetime):
+    return or_(
+        ReviewItem.state == 'open',
+        and_(ReviewItem.state == 'claimed', ReviewItem.lease_expires_at < now)
+    )
+
+
+def claim_items(db: Session, admin: str, limit: int = 1,
+                lease_seconds: int = REVIEW_LEASE_SECONDS) -> List[Tuple[ReviewItem, str]]:
+    """
+    Lease up to `limit` items in priority order. Returns [(item, lease_token)].
+    Each candidate is taken with UPDATE ... WHERE <still claimable>; a zero row
+    count means another admin won it and the candidate is skipped.
+    """
+    limit = max(1, min(limit, MAX_CLAIM))
+    now = datetime.utcnow()
+    candidates = db.query(ReviewItem.id).filter(_claimable(now)).order_by(ReviewItem.sort_key)
+    if db.bind.dialect.name in ('postgresql', 'mysql', 'mariadb'):
+        candidates = candidates.with_for_update(skip_locked=True)
+    candidate_ids = [item_id for (item_id,) in candidates.limit(limit * CLAIM_OVERFETCH).all()]
+
+    tokens: Dict[int, str] = {}
+    for item_id in candidate_ids:
+        token = uuid.uuid4().hex
+        won = db.execute(
+            update(ReviewItem)
+            .where(ReviewItem.id == item_id, _claimable(now))
+            .values(state='claimed', claimed_by=admin, lease_token=token,
+                    lease_expires_at=now + timedelta(seconds=lease_seconds),
+                    attempts=ReviewItem.attempts + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if won:
+            tokens[item_id] = token
+            if len(tokens) == limit:
+                break
+        else:
+            REVIEW_CLAIM_CONFLICTS.inc()
+    db.commit()
+
+    if not tokens:
+        return []
+    items = db.query(ReviewItem).filter(ReviewItem.id.in_(list(tokens))).order_by(ReviewItem.sort_key).all()
+    return [(item, tokens[item.id]) for item in items]
+
+
+def _held(item_id: int, token: str, now: datetime):
+    """The caller's lease is live: still claimed with this token and not expired"""
+    return and_(
+        ReviewItem.id == item_id, ReviewItem.state == 'claimed',
+        ReviewItem.lease_token == token, ReviewItem.lease_expires_at >= now
+    )
+
+
+def extend_lease(db: Session, item_id: int, token: str,
+                 lease_seconds: int = REVIEW_LEASE_SECONDS) -> datetime:
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=lease_seconds)
+    if not db.execute(
+        update(ReviewItem).where(_held(item_id, token, now)).values(lease_expires_at=expires)
+        .execution_options(synchronize_session=False)
+    ).rowcount:
+        db.rollback()
+        raise ReviewLeaseError("Lease expired or held by someone else")
+    db.commit()
+    return expires
+
+
+def release_item(db: Session, item_id: int, token: str) -> None:
+    """Give an item back to the queue without deciding it"""
+    now = datetime.utcnow()
+    if not db.execute(
+        update(ReviewItem).where(_held(item_id, token, now))
+        .values(state='open', claimed_by=None, lease_token=None, lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount:
+        db.rollback()
+        raise ReviewLeaseError("Lease expired or held by someone else")
+    db.commit()
+
+
+def resolve_item(db: Session, item_id: int, token: str, admin: str, approve: bool,
+                 amount: Optional[int] = None, note: Optional[str] = None) -> Tuple[ReviewItem, Optional[Payment]]:
+    """
+    Approve (record the payment, amount defaults to the extracted one) or reject.
+    The state change is conditional on the caller's lease, in the same transaction
+    as the payment.
+    """
+    now = datetime.utcnow()
+    item = db.query(ReviewItem).filter(ReviewItem.id == item_id).first()
+    if item is None:
+        raise ReviewLeaseError("Review item not found")
+    if approve:
+        amount = amount if amount is not None else item.extracted_amount
+        if amount is None:
+            raise ValueError("The model did not extract an amount; enter it to approve")
+        if item.transaction_id and db.query(Payment.id).filter(Payment.transaction_id == item.transaction_id).first():
+            raise ValueError(f"Transaction ID {item.transaction_id} is already recorded on another payment")
+
+    if not db.execute(
+        update(ReviewItem).where(_held(item_id, token, now))
+        .values(state='approved' if approve else 'rejected', resolved_at=now, resolved_by=admin,
+                resolution_note=note, lease_token=None, lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount:
+        db.rollback()
+        raise ReviewLeaseError("Lease expired or held by someone else")
+
+    plan = item.plan
+    payment = None
+    try:
+        if approve:
+            ai_result = json.loads(item.ai_log) if item.ai_log else {}
+            ai_result["review"] = {"review_id": item.id, "approved_by": admin, "note": note,
+                                   "extracted_amount": item.extracted_amount}
+            payment = Payment(
+                amount_paid=amount,
+                proof_image_path=item.proof_image_path,
+                payment_method=item.payment_method,
+                verified_at=now,
+                ai_log=json.dumps(ai_result),
+                extraction=extraction_from_result(ai_result) if item.reason != 'ai_unavailable' else None,
+                transaction_id=item.transaction_id,
+                image_hash=item.image_hash,
+            )
+            append_payment(db, plan, payment)
+            plan.status_code = status_for_balance(plan.target_amount, plan.paid_total)
+            plan.status_note = None
+            db.execute(
+                update(ReviewItem).where(ReviewItem.id == item_id).values(payment_id=payment.id)
+                .execution_options(synchronize_session=False)
+            )
+        elif not plan.payment_count:
+            plan.status_code = PlanStatus.REJECTED
+            plan.status_note = f"❌ Rejected in review: {note}" if note else None
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    db.refresh(item)
+    REVIEW_RESOLVED.inc(item.reason, item.state)
+    REVIEW_AGE_SECONDS.observe((now - item.created_at).total_seconds(), item.reason)
+    return item, payment
+
+
+# ==================== STATS ====================
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def queue_stats(db: Session) -> Dict[str, Any]:
+    """Backlog size and age, and throughput over the last hour / day"""
+    now = datetime.utcnow()
+    by_state_reason = db.query(ReviewItem.state, ReviewItem.reason, func.count(ReviewItem.id)).filter(
+        ReviewItem.state.in_(('open', 'claimed'))
+    ).group_by(ReviewItem.state, ReviewItem.reason).all()
+    backlog: Dict[str, Dict[str, int]] = {}
+    for state, reason, count in by_state_reason:
+        backlog.setdefault(state, {})[reason] = count
+
+    waiting = sorted(
+        (now - created_at).total_seconds()
+        for (created_at,) in db.query(ReviewItem.created_at).filter(ReviewItem.state.in_(('open', 'claimed')))
+    )
+    expired_leases = db.query(func.count(ReviewItem.id)).filter(
+        ReviewItem.state == 'claimed', ReviewItem.lease_expires_at < now
+    ).scalar()
+
+    day_ago = now - timedelta(days=1)
+    resolved = db.query(ReviewItem.created_at, ReviewItem.resolved_at, ReviewItem.state).filter(
+        ReviewItem.resolved_at >= day_ago
+    ).all()
+    durations = sorted((resolved_at - created_at).total_seconds() for created_at, resolved_at, _ in resolved)
+    hour_ago = now - timedelta(hours=1)
+
+    return {
+        'backlog': len(waiting),
+        'by_state': backlog,
+        'expired_leases': expired_leases,
+        'oldest_age_seconds': round(waiting[-1]) if waiting else None,
+        'age_p50_seconds': round(_percentile(waiting, 0.5)) if waiting else None,
+        'age_p95_seconds': round(_percentile(waiting, 0.95)) if waiting else None,
+        'resolved_last_hour': sum(1 for _, resolved_at, _ in resolved if resolved_at >= hour_ago),
+        'resolved_last_day': len(resolved),
+        'approved_last_day': sum(1 for _, _, state in resolved if state == 'approved'),
+        'time_to_resolve_p50_seconds': round(_percentile(durations, 0.5)) if durations else None,
+        'time_to_resolve_p95_seconds': round(_percentile(durations, 0.95)) if durations else None,
+    }
+
+
+def _collect_backlog() -> List[str]:
+    """Scrape-time gauges for /metrics: backlog per state/reason and the oldest item's age"""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        rows = db.query(ReviewItem.state, ReviewItem.reason, func.count(ReviewItem.id),
+                        func.min(ReviewItem.created_at)).filter(
+            ReviewItem.state.in_(('open', 'claimed'))
+        ).group_by(ReviewItem.state, ReviewItem.reason).all()
+    except Exception:
+        return []
+    finally:
+        db.close()
+    lines = ["# HELP synergy_review_backlog Review items waiting, by state and reason",
+             "# TYPE synergy_review_backlog gauge"]
+    for state, reason, count, _ in rows:
+        lines.append(f'synergy_review_backlog{{state="{state}",reason="{reason}"}} {count}')
+    oldest = min((created_at for *_, created_at in rows if created_at), default=None)
+    lines += ["# HELP synergy_review_oldest_age_seconds Age of the oldest waiting review item",
+              "# TYPE synergy_review_oldest_age_seconds gauge",
+              f"synergy_review_oldest_age_seconds {round((now - oldest).total_seconds(), 1) if oldest else 0}"]
+    return lines
+
+
+registry.collectors.append(_collect_backlog)
@@ -0,0 +1,205 @@
+"""
+Doctor Search
+Ranked search over the plan_search trigram index (SQLite FTS5, see models.py):
+by name or workplace in either script (keys from search_keys.py), or by phone
+suffix. Substring hits come first; when there are too few, a fuzzy pass finds
+names sharing 4-letter fragments with the query (one typo or a different
+spelling) and keeps those similar enough. Candidates are re-ranked in Python by
+trigram similarity, as pg_trgm would (word similarity for fuzzy hits).
+
+Without FTS5 (another database, or a database not yet migrated) the same
+functions fall back to LIKE on the key columns.
+"""
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Query, Session
+
+from .models import MasterPlan
+from .read_path import fetch_doctor_rows, json_bytes_response
+from .search_keys import phone9, search_key
+
+# Rows read from the index per pass (re-ranked in Python, then cut to `limit`)
+SEARCH_CANDIDATES = 500
+# Fuzzy hits below this trigram similarity are dropped
+MIN_SIMILARITY = 0.3
+# Trigram matching needs at least 3 characters
+MIN_TERM_LENGTH = 3
+# Workplace matches rank below name matches
+WORKPLACE_WEIGHT = 0.8
+
+_fts_checked: Dict[str, bool] = {}
+
+
+def fts_available(db: Session) -> bool:
+    """plan_search exists on this (SQLite) database - checked once per database URL"""
+    engine = db.get_bind()
+    url = str(engine.url)
+    if url not in _fts_checked:
+        _fts_checked[url] = engine.dialect.name == 'sqlite' and db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'plan_search'")
+        ).first() is not None
+    return _fts_checked[url]
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _trigrams(key: str) -> Set[str]:
+    """pg_trgm-style trigrams: each word padded with two spaces in front and one behind"""
+    grams: Set[str] = set()
+    for word in key.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a: Optional[str], b: Optional[str]) -> float:
+    if not a or not b:
+        return 0.0
+    ta, tb = _trigrams(a), _trigrams(b)
+    return len(ta & tb) / len(ta | tb)
+
+
+def word_similarity(key: str, target: Optional[str]) -> float:
+    """Mean over the query words of their best similarity to a word of `target` (a typo in one name part)"""
+    if not key or not target:
+        return 0.0
+    targets = target.split()
+    words = key.split()
+    return sum(max(similarity(word, t) for t in targets) for word in words) / len(words)
+
+
+def _words(key: str) -> List[str]:
+    return [word for word in key.split() if len(word) >= MIN_TERM_LENGTH]
+
+
+def _fragments(words: List[str]) -> List[str]:
+    """4-letter fragments of every word (the word itself when shorter)"""
+    fragments = []
+    for word in words:
+        fragments.extend({word[i:i + 4] for i in range(len(word) - 3)} or {word})
+    return fragments
+
+
+def _candidates(db: Session, match: str, company: Optional[str], month: Optional[int],
+                exclude: Set[int], extra: str = "", params: Optional[dict] = None) -> List[Tuple]:
+    """(id, name_key, workplace_key) of up to SEARCH_CANDIDATES index hits"""
+    sql = (
+        "SELECT m.id, m.name_key, m.workplace_key FROM plan_search "
+        "JOIN master_plan m ON m.id = plan_search.rowid WHERE plan_search MATCH :match"
+    )
+    bind = {"match": match, "limit": SEARCH_CANDIDATES + len(exclude), **(params or {})}
+    if company:
+        sql += " AND m.company = :company"
+        bind["company"] = company
+    if month:
+        sql += " AND m.month = :month"
+        bind["month"] = month
+    sql += extra + " LIMIT :limit"
+    return [row for row in db.execute(text(sql), bind) if row[0] not in exclude]
+
+
+def _score(key: str, name_key: Optional[str], workplace_key: Optional[str]) -> float:
+    return max(similarity(key, name_key), WORKPLACE_WEIGHT * similarity(key, workplace_key))
+
+
+def search_plans(db: Session, query: str, company: Optional[str] = None, month: Optional[int] = None,
+                 limit: int = 20) -> List[Tuple[int, float]]:
+    """
+    [(plan_id, score)] best first. Phone suffix search when the query has digits
+    and no letters (score 1, full numbers cut to their last 9 digits); otherwise substring hits score 1 + similarity and
+    fuzzy hits their similarity.
+    """
+    key = search_key(query) or ''
+    digits = re.sub(r'\D', '', query or '')
+    if not re.search('[a-z]', key):
+        if len(digits) < MIN_TERM_LENGTH:
+            return []
+        return [(plan_id, 1.0) for plan_id in _phone_suffix(db, digits, company, month, limit)]
+
+    words = _words(key)
+    if not words:
+        return _like_search(db, key, company, month, limit)
+    if not fts_available(db):
+        return _like_search(db, key, company, month, limit)
+
+    scored: Dict[int, float] = {}
+    exact = "{name_key workplace_key} : (" + " AND ".join(_quote(w) for w in words) + ")"
+    for plan_id, name_key, workplace_key in _candidates(db, exact, company, month, set()):
+        scored[plan_id] = 1.0 + _score(key, name_key, workplace_key)
+
+    if len(scored) < limit:
+        fuzzy = "name_key : (" + " OR ".join(_quote(f) for f in _fragments(words)) + ")"
+        for plan_id, name_key, workplace_key in _candidates(db, fuzzy, company, month, set(scored)):
+            score = word_similarity(key, name_key)
+            if score >= MIN_SIMILARITY:
+                scored[plan_id] = score
+
+    ranked = sorted(scored.items(), key=lambda item: (-item[1], item[0]))
+    return [(plan_id, round(score, 3)) for plan_id, score in ranked[:limit]]
+
+
+def _phone_suffix(db: Session, digits: str, company: Optional[str], month: Optional[int],
+                  limit: int) -> List[int]:
+    # A whole number ("+998 90 111 22 33") is matched by its last 9 digits, as plans store it
+    digits = phone9(digits) or digits
+    if fts_available(db):
+        rows = _candidates(db, "phone : " + _quote(digits), company, month, set(),
+                           extra=" AND m.phone LIKE :suffix", params={"suffix": f"%{digits}"})
+        return [row[0] for row in rows[:limit]]
+    query = db.query(MasterPlan.id).filter(MasterPlan.phone.like(f"%{digits}"))
+    if company:
+        query = query.filter(MasterPlan.company == company)
+    if month:
+        query = query.filter(MasterPlan.month == month)
+    return [plan_id for (plan_id,) in query.limit(limit)]
+
+
+def _like_search(db: Session, key: str, company: Optional[str], month: Optional[int],
+                 limit: int) -> List[Tuple[int, float]]:
+    """Substring scan of the key columns (no FTS5, or terms too short for trigrams)"""
+    query = db.query(MasterPlan.id, MasterPlan.name_key, MasterPlan.workplace_key).filter(
+        or_(MasterPlan.name_key.like(f"%{key}%"), MasterPlan.workplace_key.like(f"%{key}%"))
+    )
+    if company:
+        query = query.filter(MasterPlan.company == company)
+    if month:
+        query = query.filter(MasterPlan.month == month)
+    scored = [(plan_id, 1.0 + _score(key, name_key, workplace_key))
+              for plan_id, name_key, workplace_key in query.limit(SEARCH_CANDIDATES)]
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return [(plan_id, round(score, 3)) for plan_id, score in scored[:limit]]
+
+
+def name_filter(db: Session, name: str):
+    """
+    Clause for "doctor name contains `name`" in either script, for list filters:
+    the FTS index when every word is long enough for trigrams, else LIKE on name_key.
+    """
+    key = search_key(name) or ''
+    words = key.split()
+    if words and all(len(w) >= MIN_TERM_LENGTH for w in words) and fts_available(db):
+        match = "name_key : (" + " AND ".join(_quote(w) for w in words) + ")"
+        return MasterPlan.id.in_(
+            text("SELECT rowid FROM plan_search WHERE plan_search MATCH :name_match").bindparams(name_match=match)
+        )
+    return MasterPlan.name_key.like(f"%{key}%")
+
+
+def search_response(request: Request, db: Session, query: Query, text_query: str,
+                    company: Optional[str], month: Optional[int], limit: int) -> Response:
+    """
+    Ranked DoctorRows for `text_query` within `query` (blocking; run it off the
+    event loop): {'results': rows best first, 'scores': matching scores}.
+    """
+    ranked = search_plans(db, text_query, company, month, limit)
+    rows = {row.id: row for row in fetch_doctor_rows(db, query.filter(MasterPlan.id.in_([i for i, _ in ranked])))}
+    hits = [(rows[plan_id], score) for plan_id, score in ranked if plan_id in rows]
+    return json_bytes_response(request, {
+        'results': [row for row, _ in hits],
+        'scores': [score for _, score in hits],
+    })
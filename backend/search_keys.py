@@ -0,0 +1,92 @@
+"""
+Search Keys
+One spelling per name regardless of script: Cyrillic (Russian and Uzbek letters)
+is transliterated to Uzbek Latin, both scripts are case-folded and the usual
+Russian-style Latin spellings are folded onto the Uzbek ones, so "Саидова",
+"SAIDOVA" and "Saidova" - or "Алиев" and "Aliyev" - get the same key.
+Phones are keyed by their last 9 digits (the number without +998 / 8) and
+their last 4, the two ways a receipt is matched to a plan.
+"""
+import re
+import unicodedata
+from typing import Optional
+
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'j',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'x', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'sh', 'ъ': '', 'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya',
+    # Uzbek Cyrillic
+    'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
+}
+_TRANSLATE = str.maketrans(CYRILLIC_TO_LATIN)
+
+# Applied after transliteration, in order: Russian-style Latin -> the same key as Uzbek Latin
+FOLDS = (
+    ('kh', 'h'),   # Khamidov / Хамидов (x) / Hamidov: x, kh and h are mixed freely in names
+    ('x', 'h'),
+    ('zh', 'j'),   # Zhuraev / Жураев (j)
+    ('iy', 'i'),   # Aliyev / Алиев
+    ('ye', 'e'),   # Yevgeniy / Евгений
+    ('q', 'k'),    # Qodirov / Kodirov
+    ('w', 'v'),
+)
+
+# o‘ g‘ apostrophes (ʻ ʼ ‘ ’ ' `) disappear; anything else that is not a letter or digit splits words
+_APOSTROPHES = re.compile(r"[ʻʼ‘’'`]")
+_SEPARATORS = re.compile(r"[^0-9a-z]+")
+
+
+def search_key(text: Optional[str]) -> Optional[str]:
+    """Transliterated, case-folded, space-separated words (None for empty input)"""
+    if not text:
+        return None
+    key = unicodedata.normalize('NFKC', str(text)).casefold().translate(_TRANSLATE)
+    key = _APOSTROPHES.sub('', key)
+    # Latin letters with diacritics (ö, ş) -> base letter
+    key = unicodedata.normalize('NFKD', key).encode('ascii', 'ignore').decode('ascii')
+    for source, target in FOLDS:
+        key = key.replace(source, target)
+    key = _SEPARATORS.sub(' ', key).strip()
+    return key or None
+
+
+def phone_tail(phone: Optional[str], length: int) -> Optional[str]:
+    """Last `length` digits of a phone (None when it has fewer)"""
+    digits = re.sub(r'[^0-9]', '', str(phone or ''))
+    return digits[-length:] if len(digits) >= length else None
+
+
+def phone9(phone: Optional[str]) -> Optional[str]:
+    return phone_tail(phone, 9)
+
+
+def phone_last4(phone: Optional[str]) -> Optional[str]:
+    return phone_tail(phone, 4)
+
+
+# Key column on MasterPlan -> (source column, key function)
+DERIVED_COLUMNS = {
+    'name_key': ('doctor_name', search_key),
+    'workplace_key': ('workplace', search_key),
+    'phone9': ('phone', phone9),
+    'phone_last4': ('phone', phone_last4),
+}
+
+
+def derived_values(record: dict) -> dict:
+    """Key columns for the source columns present in `record` (Core updates bypass column defaults)"""
+    return {
+        column: key(record[source])
+        for column, (source, key) in DERIVED_COLUMNS.items() if source in record
+    }
+
+
+def key_default(column: str):
+    """Column default computing key column `column` from its source column of the inserted row"""
+    source, key = DERIVED_COLUMNS[column]
+
+    def default(context):
+        return key(context.get_current_parameters().get(source))
+    return default
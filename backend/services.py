@@ -1,15 +1,23 @@
 """
 Excel Parser Service
-Handles parsing of Excel files with Russian headers and inserting into database
+Handles parsing of Excel (and CSV / Parquet) plan files with Russian headers and inserting into database
 """
+import csv
+import multiprocessing
+import os
 import re
-from io import BytesIO
-from typing import List, Dict, Any
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO, StringIO
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
 
 from openpyxl import load_workbook
 from sqlalchemy.orm import Session
 
-from .models import MasterPlan
+from .models import MasterPlan, PlanStatus
+from .metrics import NULL_TIMER
+from .sync import transaction_version
 
 
 # Region normalization mapping (Cyrillic/Latin -> Standardized Latin Uppercase)
@@ -195,8 +203,13 @@ COLUMN_MAP_FALLBACK = {
 
 def find_header_row(ws) -> tuple:
     """Find the header row and create column mapping"""
+    return find_header_in_rows(list(ws.iter_rows(min_row=1, max_row=10, values_only=True)))
+
+
+def find_header_in_rows(first_rows: List[tuple]) -> tuple:
+    """Header detection over the first (up to 10) rows of a sheet, as value tuples"""
     
-    for row_idx, row in enumerate(ws.iter_rows(min_row=1, max_row=10, values_only=True), 1):
+    for row_idx, row in enumerate(first_rows[:10], 1):
         col_mapping = {}
         non_empty_count = 0
         
@@ -217,11 +230,17 @@ def find_header_row(ws) -> tuple:
             return row_idx, col_mapping
     
     # Check first row to detect data format
-    first_row = list(ws.iter_rows(min_row=1, max_row=1, values_only=True))[0] if ws.max_row > 0 else []
+    if first_row_is_data(first_rows[0] if first_rows else []):
+        return 0, COLUMN_MAP_FALLBACK
+    
+    # Default fallback: start from row 1 with 10-column layout
+    return 0, COLUMN_MAP_FALLBACK
+
+
+def first_row_is_data(first_row: tuple) -> bool:
+    """Headerless sheet check: 4-12 filled columns and a numeric column D (target_amount)"""
     non_empty_cols = sum(1 for cell in first_row if cell is not None)
     
-    # If first row looks like data (has a number in column D which would be target_amount)
-    # and has 4-12 columns, use 10-column fallback
     if non_empty_cols >= 4 and non_empty_cols <= 12:
         # Check if column D looks like an amount (numeric)
         if len(first_row) >= 4:
@@ -230,12 +249,16 @@ def find_header_row(ws) -> tuple:
                 try:
                     # If it's numeric, this is likely data without headers
                     float(str(col_d).replace(',', '').replace(' ', ''))
-                    return 0, COLUMN_MAP_FALLBACK
+                    return True
                 except (ValueError, TypeError):
                     pass
-    
-    # Default fallback: start from row 1 with 10-column layout
-    return 0, COLUMN_MAP_FALLBACK
+    return False
+
+
+def has_plan_layout(first_rows: List[tuple]) -> bool:
+    """True when a sheet has a recognisable header row or starts with plan data"""
+    header_row, _ = find_header_in_rows(first_rows)
+    return header_row > 0 or first_row_is_data(first_rows[0] if first_rows else [])
 
 
 
@@ -243,7 +266,8 @@ def process_excel_file(
     file_content: bytes,
     company_name: str,
     db: Session,
-    month: int = 12  # Default to December
+    month: int = 12,  # Default to December
+    timer=NULL_TIMER  # Optional metrics.StageTimer
 ) -> Dict[str, Any]:
     """
     Parse Excel file and insert rows into master_plan table
@@ -253,61 +277,65 @@ def process_excel_file(
     """
     try:
         # Load workbook from bytes
-        wb = load_workbook(filename=BytesIO(file_content), data_only=True)
-        ws = wb.active
+        with timer.stage("workbook_load"):
+            wb = load_workbook(filename=BytesIO(file_content), data_only=True)
+            ws = wb.active
         
         # Find headers
-        header_row, col_map = find_header_row(ws)
+        with timer.stage("header_detect"):
+            header_row, col_map = find_header_row(ws)
         
         inserted_count = 0
         errors = []
         
-        # Iterate through data rows (skip header)
-        for row_idx, row in enumerate(ws.iter_rows(min_row=header_row + 1, values_only=True), header_row + 1):
-            try:
-                # Extract values using column mapping
-                def get_val(field: str) -> Any:
-                    col_idx = col_map.get(field)
-                    if col_idx and col_idx <= len(row):
-                        return row[col_idx - 1]
-                    return None
+        with timer.stage("row_parse"):
+            # Iterate through data rows (skip header)
+            for row_idx, row in enumerate(ws.iter_rows(min_row=header_row + 1, values_only=True), header_row + 1):
+                try:
+                    # Extract values using column mapping
+                    def get_val(field: str) -> Any:
+                        col_idx = col_map.get(field)
+                        if col_idx and col_idx <= len(row):
+                            return row[col_idx - 1]
+                        return None
                 
-                doctor_name = get_val('doctor_name')
-                target_amount = clean_amount(get_val('target_amount'))
+                    doctor_name = get_val('doctor_name')
+                    target_amount = clean_amount(get_val('target_amount'))
                 
-                # Skip empty rows
-                if not doctor_name and target_amount == 0:
-                    continue
+                    # Skip empty rows
+                    if not doctor_name and target_amount == 0:
+                        continue
                 
-                # Skip header-like rows
-                if doctor_name and str(doctor_name).lower().strip() in ['фио', 'name', 'doctor']:
-                    continue
+                    # Skip header-like rows
+                    if doctor_name and str(doctor_name).lower().strip() in ['фио', 'name', 'doctor']:
+                        continue
                 
-                # Create record
-                plan_item = MasterPlan(
-                    company=company_name,
-                    doctor_name=str(doctor_name).strip() if doctor_name else 'Unknown',
-                    region=normalize_region(str(get_val('region') or '')),
-                    district=str(get_val('district') or '').strip(),
-                    target_amount=target_amount,
-                    planned_type=str(get_val('planned_type') or 'Cash').strip(),
-                    card_number=str(get_val('card_number') or '').strip(),
-                    workplace=str(get_val('workplace') or '').strip(),
-                    specialty=str(get_val('specialty') or '').strip(),
-                    phone=clean_phone(get_val('phone')),
-                    group_name=str(get_val('group_name') or 'UNASSIGNED').strip().upper(),
-                    manager_name=str(get_val('manager_name') or '').strip(),
-                    month=month,
-                    status='Pending'
-                )
+                    # Create record
+                    plan_item = MasterPlan(
+                        company=company_name,
+                        doctor_name=str(doctor_name).strip() if doctor_name else 'Unknown',
+                        region=normalize_region(str(get_val('region') or '')),
+                        district=str(get_val('district') or '').strip(),
+                        target_amount=target_amount,
+                        planned_type=str(get_val('planned_type') or 'Cash').strip(),
+                        card_number=str(get_val('card_number') or '').strip(),
+                        workplace=str(get_val('workplace') or '').strip(),
+                        specialty=str(get_val('specialty') or '').strip(),
+                        phone=clean_phone(get_val('phone')),
+                        group_name=str(get_val('group_name') or 'UNASSIGNED').strip().upper(),
+                        manager_name=str(get_val('manager_name') or '').strip(),
+                        month=month,
+                        status_code=PlanStatus.PENDING
+                    )
                 
-                db.add(plan_item)
-                inserted_count += 1
+                    db.add(plan_item)
+                    inserted_count += 1
                 
-            except Exception as e:
-                errors.append(f"Row {row_idx}: {str(e)}")
+                except Exception as e:
+                    errors.append(f"Row {row_idx}: {str(e)}")
         
-        db.commit()
+        with timer.stage("db_commit"):
+            db.commit()
         
         return {
             'success': True,
@@ -322,3 +350,453 @@ def process_excel_file(
             'inserted_count': 0,
             'errors': [str(e)]
         }
+
+
+
+# ==================== COLUMNAR IMPORT ENGINE ====================
+
+IMPORT_ENGINES = ('row', 'columnar')
+DEFAULT_IMPORT_ENGINE = os.getenv('IMPORT_ENGINE', 'row')
+
+
+class _CellError:
+    """Marks a cell whose cleaning raised, so its row is reported like the row engine does"""
+    __slots__ = ('error',)
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+def _encode(column: List[Any], func) -> List[Any]:
+    """
+    Apply func once per distinct cell value (dictionary encoding). Keys carry the
+    type so 1 and 1.0 - equal as dict keys - still stringify differently.
+    """
+    keys = [(value.__class__, value) for value in column]
+    mapping = {}
+    for key in set(keys):
+        try:
+            mapping[key] = func(key[1])
+        except Exception as e:
+            mapping[key] = _CellError(e)
+    return [mapping[key] for key in keys]
+
+
+# Per-field cleaning, identical to the expressions used by process_excel_file
+_FIELD_CLEANERS = {
+    'region': lambda v: normalize_region(str(v or '')),
+    'district': lambda v: str(v or '').strip(),
+    'planned_type': lambda v: str(v or 'Cash').strip(),
+    'card_number': lambda v: str(v or '').strip(),
+    'workplace': lambda v: str(v or '').strip(),
+    'specialty': lambda v: str(v or '').strip(),
+    'phone': clean_phone,
+    'group_name': lambda v: str(v or 'UNASSIGNED').strip().upper(),
+    'manager_name': lambda v: str(v or '').strip(),
+}
+
+
+def process_excel_file_columnar(
+    file_content: bytes,
+    company_name: str,
+    db: Session,
+    month: int = 12,
+    timer=NULL_TIMER
+) -> Dict[str, Any]:
+    """
+    Same contract and resulting rows as process_excel_file, but the sheet is read
+    once (read-only mode), transposed into columns, each column is cleaned once per
+    distinct value and the rows go in with a single bulk INSERT.
+    """
+    try:
+        with timer.stage("workbook_load"):
+            rows = read_xlsx_rows(file_content)
+    except Exception as e:
+        return {'success': False, 'inserted_count': 0, 'errors': [str(e)]}
+    return import_rows_columnar(rows, company_name, db, month, timer=timer)
+
+
+def parse_rows_columnar(
+    rows: List[tuple],
+    company_name: str,
+    month: int = 12,
+    timer=NULL_TIMER,
+    row_numbers: Optional[List[int]] = None
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Header detection and column cleaning for sheet rows from any reader -> (records, errors).
+    If row_numbers is given, the sheet row number of each record is appended to it.
+    """
+    with timer.stage("header_detect"):
+        header_row, col_map = find_header_in_rows(rows[:10])
+
+    errors = []
+    with timer.stage("row_parse"):
+        data = rows[header_row:]
+        width = max((len(row) for row in data), default=0)
+        # Transpose; short rows are padded with None like get_val's bounds check
+        columns = list(zip(*(row + (None,) * (width - len(row)) for row in data))) if data else []
+
+        def column(field: str) -> List[Any]:
+            col_idx = col_map.get(field)
+            if col_idx and col_idx <= width:
+                return list(columns[col_idx - 1])
+            return [None] * len(data)
+
+        names = column('doctor_name')
+        amounts = _encode(column('target_amount'), clean_amount)
+        cleaned = {field: _encode(column(field), func) for field, func in _FIELD_CLEANERS.items()}
+        doctor_names = _encode(names, lambda v: str(v).strip() if v else 'Unknown')
+        header_like = _encode(names, lambda v: bool(v) and str(v).lower().strip() in ['фио', 'name', 'doctor'])
+
+        records = []
+        fields = list(_FIELD_CLEANERS)
+        for i, name in enumerate(names):
+            amount = amounts[i]
+            if isinstance(amount, _CellError):
+                errors.append(f"Row {header_row + 1 + i}: {str(amount.error)}")
+                continue
+            # Skip empty rows and header-like rows
+            if not name and amount == 0:
+                continue
+            if isinstance(header_like[i], _CellError):
+                errors.append(f"Row {header_row + 1 + i}: {str(header_like[i].error)}")
+                continue
+            if header_like[i]:
+                continue
+
+            record = {'company': company_name, 'doctor_name': doctor_names[i], 'target_amount': amount}
+            failed = next((cleaned[f][i] for f in fields if isinstance(cleaned[f][i], _CellError)), None)
+            if isinstance(doctor_names[i], _CellError):
+                failed = doctor_names[i]
+            if failed is not None:
+                errors.append(f"Row {header_row + 1 + i}: {str(failed.error)}")
+                continue
+            for field in fields:
+                record[field] = cleaned[field][i]
+            record['month'] = month
+            record['status_code'] = PlanStatus.PENDING
+            records.append(record)
+            if row_numbers is not None:
+                row_numbers.append(header_row + 1 + i)
+
+    return records, errors
+
+
+def import_rows_columnar(
+    rows: List[tuple],
+    company_name: str,
+    db: Session,
+    month: int = 12,
+    timer=NULL_TIMER
+) -> Dict[str, Any]:
+    """Header detection, column cleaning and bulk insert for sheet rows from any reader"""
+    try:
+        records, errors = parse_rows_columnar(rows, company_name, month, timer=timer)
+
+        with timer.stage("db_commit"):
+            if records:
+                db.execute(MasterPlan.__table__.insert().values(row_version=transaction_version(db)), records)
+            db.commit()
+
+        return {
+            'success': True,
+            'inserted_count': len(records),
+            'errors': errors
+        }
+
+    except Exception as e:
+        db.rollback()
+        return {
+            'success': False,
+            'inserted_count': 0,
+            'errors': [str(e)]
+        }
+
+
+# ==================== FILE FORMATS ====================
+
+PLAN_FORMATS = ('xlsx', 'csv', 'parquet')
+
+# "1 200 000,50" / "1200000.00" - a decimal amount as a Russian-locale export writes it.
+# Turned into a number like Excel would store it; clean_amount would otherwise read the
+# comma as a thousands separator. Integers stay strings so phone leading zeros survive.
+_CSV_DECIMAL = re.compile(r'^-?\d[\d \u00a0]*[.,]\d{1,2}$')
+
+
+def detect_plan_format(file_content: bytes, filename: str = None) -> str:
+    """'xlsx', 'zip', 'csv' or 'parquet' - from the file signature first, then the extension"""
+    if file_content[:4] == b'PK\x03\x04':
+        # An XLSX is itself a zip; a plain archive of plan files has no content-types part
+        try:
+            with zipfile.ZipFile(BytesIO(file_content)) as archive:
+                return 'xlsx' if '[Content_Types].xml' in archive.namelist() else 'zip'
+        except zipfile.BadZipFile:
+            return 'xlsx'
+    if file_content[:4] == b'PAR1' and file_content[-4:] == b'PAR1':
+        return 'parquet'
+    extension = (filename or '').rsplit('.', 1)[-1].lower()
+    if extension in ('xlsx', 'xlsm'):
+        return 'xlsx'
+    if extension == 'parquet':
+        return 'parquet'
+    return 'csv'
+
+
+def read_xlsx_rows(file_content: bytes, sheet_name: str = None) -> List[tuple]:
+    """A sheet (default: the active one) as value tuples (read-only mode)"""
+    wb = load_workbook(filename=BytesIO(file_content), read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.active
+        return list(ws.iter_rows(values_only=True))
+    finally:
+        wb.close()
+
+
+def xlsx_sheet_names(file_content: bytes) -> Tuple[List[str], str]:
+    """(all sheet names, active sheet name)"""
+    wb = load_workbook(filename=BytesIO(file_content), read_only=True)
+    try:
+        return wb.sheetnames, wb.active.title
+    finally:
+        wb.close()
+
+
+def _csv_cell(value: str) -> Any:
+    if value == '':
+        return None  # Same as an empty Excel cell
+    if _CSV_DECIMAL.match(value):
+        return float(value.replace(' ', '').replace('\u00a0', '').replace(',', '.'))
+    return value
+
+
+def read_csv_rows(file_content: bytes) -> List[tuple]:
+    """
+    CSV as value tuples. UTF-8 (with or without BOM) or, failing that, Windows-1251 as
+    Excel writes it on Russian systems; the delimiter (, ; or tab) is detected.
+    """
+    try:
+        text = file_content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = file_content.decode('cp1251')
+
+    # csv.Sniffer gives up on many real exports; the most frequent candidate in the
+    # first lines is reliable enough (ties go to the comma)
+    head = '\n'.join(text[:8192].splitlines()[:10])
+    delimiter = max(',;\t', key=head.count)
+
+    reader = csv.reader(StringIO(text, newline=''), delimiter=delimiter)
+    return [tuple(_csv_cell(value) for value in row) for row in reader]
+
+
+def read_parquet_rows(file_content: bytes) -> List[tuple]:
+    """Parquet as value tuples, column names first (they take the header row's place)"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet upload requires the 'pyarrow' package")
+
+    parquet_file = pq.ParquetFile(BytesIO(file_content))
+    rows = [tuple(parquet_file.schema_arrow.names)]
+    for batch in parquet_file.iter_batches(batch_size=65536):
+        rows.extend(zip(*batch.to_pydict().values()))
+    return rows
+
+
+_ROW_READERS = {
+    'xlsx': read_xlsx_rows,
+    'csv': read_csv_rows,
+    'parquet': read_parquet_rows,
+}
+
+
+# ==================== MULTI-SHEET / MULTI-FILE IMPORT ====================
+
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', '0')) or (os.cpu_count() or 1)
+# Zip uploads are checked against these from the archive directory before anything is extracted
+ZIP_MAX_FILES = int(os.getenv('IMPORT_ZIP_MAX_FILES', '100'))
+ZIP_MAX_BYTES = int(os.getenv('IMPORT_ZIP_MAX_MB', '200')) * 1024 * 1024
+
+_import_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_import_pool() -> ProcessPoolExecutor:
+    """Process-wide pool for sheet parsing ('spawn': safe to start from a threaded server)"""
+    global _import_pool
+    if _import_pool is None:
+        _import_pool = ProcessPoolExecutor(max_workers=IMPORT_WORKERS,
+                                           mp_context=multiprocessing.get_context('spawn'))
+    return _import_pool
+
+
+def _reset_import_pool() -> None:
+    global _import_pool
+    if _import_pool is not None:
+        _import_pool.shutdown(wait=False, cancel_futures=True)
+        _import_pool = None
+
+
+class PlanSource(NamedTuple):
+    """One sheet (or CSV/Parquet file) to parse"""
+    label: str               # "plans.zip/samarqand.xlsx/Sheet2" - prefixes its errors
+    file_format: str
+    content: bytes
+    sheet_name: Optional[str]
+    required: bool           # Active sheet / single file: import even without a clear layout
+
+
+def list_plan_sources(file_content: bytes, filename: str = None, in_zip: bool = False) -> List[PlanSource]:
+    """Every sheet of a workbook, or every plan file (and sheet) inside a zip"""
+    filename = filename or 'upload'
+    file_format = detect_plan_format(file_content, filename)
+
+    if file_format == 'zip':
+        if in_zip:
+            raise ValueError(f"{filename}: archives inside the zip are not supported")
+        sources = []
+        with zipfile.ZipFile(BytesIO(file_content)) as archive:
+            members = [info for info in archive.infolist() if _is_plan_member(info)]
+            # Zip bombs: refuse on the declared sizes, before decompressing anything
+            if len(members) > ZIP_MAX_FILES:
+                raise ValueError(f"{len(members)} plan files in the zip (at most {ZIP_MAX_FILES})")
+            unpacked = sum(info.file_size for info in members)
+            if unpacked > ZIP_MAX_BYTES:
+                raise ValueError(f"Zip unpacks to {unpacked // (1024 * 1024)} MB "
+                                 f"(at most {ZIP_MAX_BYTES // (1024 * 1024)} MB)")
+            for info in members:
+                # ZipExtFile stops at the declared file_size, so the total above holds
+                sources.extend(list_plan_sources(archive.read(info), f"{filename}/{info.filename}", in_zip=True))
+        return sources
+
+    if file_format == 'xlsx':
+        sheet_names, active = xlsx_sheet_names(file_content)
+        return [PlanSource(f"{filename}/{sheet}", 'xlsx', file_content, sheet, sheet == active)
+                for sheet in sheet_names]
+
+    return [PlanSource(filename, file_format, file_content, None, True)]
+
+
+def _is_plan_member(info: zipfile.ZipInfo) -> bool:
+    name = info.filename
+    if info.is_dir() or name.startswith('__MACOSX/') or name.rsplit('/', 1)[-1].startswith(('.', '~$')):
+        return False
+    return name.rsplit('.', 1)[-1].lower() in ('xlsx', 'xlsm', 'csv', 'parquet')
+
+
+def read_source_rows(source: PlanSource) -> List[tuple]:
+    if source.file_format == 'xlsx':
+        return read_xlsx_rows(source.content, source.sheet_name)
+    return _ROW_READERS[source.file_format](source.content)
+
+
+def parse_plan_source(source: PlanSource, company_name: str, month: int) -> Dict[str, Any]:
+    """Read and clean one source. Runs in the import pool, so never raises."""
+    try:
+        rows = read_source_rows(source)
+        if not source.required and not has_plan_layout(rows[:10]):
+            return {'source': source.label, 'skipped': True, 'records': [], 'errors': [],
+                    'row_numbers': []}
+        row_numbers: List[int] = []
+        records, errors = parse_rows_columnar(rows, company_name, month, row_numbers=row_numbers)
+        return {'source': source.label, 'skipped': False, 'records': records, 'errors': errors,
+                'row_numbers': row_numbers}
+    except Exception as e:
+        return {'source': source.label, 'failed': f"Could not read {source.label}: {e}", 'records': [], 'errors': []}
+
+
+def parse_plan_sources(sources: List[PlanSource], company_name: str, month: int = 12,
+                       timer=NULL_TIMER) -> List[Dict[str, Any]]:
+    """parse_plan_source for every source, in the process pool when there are several"""
+    with timer.stage("file_parse"):
+        parsed = None
+        if len(sources) > 1 and IMPORT_WORKERS > 1:
+            try:
+                pool = _get_import_pool()
+                futures = [pool.submit(parse_plan_source, source, company_name, month) for source in sources]
+                parsed = [future.result() for future in futures]
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool next time, parse inline now
+                _reset_import_pool()
+        if parsed is None:
+            parsed = [parse_plan_source(source, company_name, month) for source in sources]
+    return parsed
+
+
+def combined_errors(parsed: List[Dict[str, Any]]) -> List[str]:
+    """Row errors of all sources (prefixed with the source when there are several) and skipped sheets"""
+    errors = []
+    for p in parsed:
+        prefix = f"{p['source']}: " if len(parsed) > 1 else ''
+        errors.extend(prefix + error for error in p['errors'])
+        if p.get('skipped'):
+            errors.append(f"{p['source']}: skipped - no plan columns found")
+    return errors
+
+
+def import_plan_sources(sources: List[PlanSource], company_name: str, db: Session, month: int = 12,
+                        timer=NULL_TIMER) -> Dict[str, Any]:
+    """
+    Parse all sources in parallel (process pool) and insert every row in one
+    transaction. A source that cannot be read fails the whole import.
+    """
+    parsed = parse_plan_sources(sources, company_name, month, timer=timer)
+
+    failures = [p['failed'] for p in parsed if p.get('failed')]
+    if failures:
+        return {'success': False, 'inserted_count': 0, 'errors': failures, 'sources': source_report(parsed)}
+
+    errors = combined_errors(parsed)
+    records = [record for p in parsed for record in p['records']]
+    try:
+        with timer.stage("db_commit"):
+            if records:
+                db.execute(MasterPlan.__table__.insert().values(row_version=transaction_version(db)), records)
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        return {'success': False, 'inserted_count': 0, 'errors': [str(e)], 'sources': source_report(parsed)}
+
+    return {
+        'success': True,
+        'inserted_count': len(records),
+        'errors': errors,
+        'sources': source_report(parsed),
+    }
+
+
+def source_report(parsed: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            'source': p['source'],
+            'rows': len(p['records']),
+            'errors': len(p['errors']),
+            'status': 'failed' if p.get('failed') else 'skipped' if p.get('skipped') else 'ok',
+        }
+        for p in parsed
+    ]
+
+
+def import_plan_file(file_content: bytes, company_name: str, db: Session, month: int = 12,
+                     engine: str = 'row', timer=NULL_TIMER, filename: str = None) -> Dict[str, Any]:
+    """
+    Import an uploaded plan file. A single-sheet XLSX goes through the selected engine
+    ('row' or 'columnar'); multi-sheet workbooks, zips of plan files, CSV and Parquet
+    use the columnar pipeline, with sheets parsed in parallel.
+    """
+    file_format = detect_plan_format(file_content, filename)
+    if file_format == 'xlsx' and engine == 'row':
+        try:
+            sheet_names, _ = xlsx_sheet_names(file_content)
+        except Exception as e:
+            return {'success': False, 'inserted_count': 0, 'errors': [str(e)]}
+        if len(sheet_names) == 1:
+            return process_excel_file(file_content, company_name, db, month, timer=timer)
+
+    try:
+        with timer.stage("file_list"):
+            sources = list_plan_sources(file_content, filename)
+    except Exception as e:
+        return {'success': False, 'inserted_count': 0, 'errors': [f"Could not read {file_format.upper()} file: {e}"]}
+    if not sources:
+        return {'success': False, 'inserted_count': 0, 'errors': ["No plan files (.xlsx, .csv, .parquet) found"]}
+    return import_plan_sources(sources, company_name, db, month, timer=timer)
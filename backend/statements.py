@@ -0,0 +1,344 @@
+"""
+Card/Click Statement Reconciliation
+Matches the transactions of a payment processor export (CSV/XLSX, every sheet,
+or a zip of them) to a company's plans for one month with in-memory hash joins:
+card number first, then phone, narrowed by amount when several plans share
+them. Matches become Payment rows in one bulk insert, with their transaction
+IDs, followed by one totals / status update for the plans they touch.
+
+Unmatched transactions are reported back; their receipts go through per-image
+AI verification as before. A receipt whose transaction was already reconciled
+is then rejected as a duplicate by its transaction ID.
+"""
+import json
+import re
+import zlib
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.orm import Session
+
+from .metrics import NULL_TIMER
+from .models import MasterPlan, Payment
+from .payments import recompute_payment_totals
+from .plan_status import status_for_balance
+from .prompts import payment_mode
+from .search_keys import phone9
+from .services import clean_amount, list_plan_sources, read_source_rows
+
+plan_table = MasterPlan.__table__
+payment_table = Payment.__table__
+
+# Field -> header fragments. A header takes the first field that matches, in this order
+# ("Сумма чека" is the amount, "Transaction date" the date); fragments of 3 letters or
+# fewer must be the whole header
+STATEMENT_HEADER_MAP = {
+    'amount': ['сумма', 'amount', 'summa', 'сум', 'sum'],
+    'date': ['дата', 'date', 'sana', 'время', 'time'],
+    'name': ['фио', 'name', 'имя', 'ism'],
+    'card_number': ['номер карты', 'карт', 'card', 'karta', 'pan'],
+    'phone': ['номер телефо', 'телефон', 'phone', 'tel', 'mobile'],
+    'transaction_id': ['id транзакции', 'транзакц', 'transaction', 'tranzaksiya', 'чек', 'receipt', 'rrn', 'txn', 'id'],
+}
+REQUIRED_FIELDS = ('transaction_id', 'amount')
+
+# Unmatched transactions listed in the response (the counts cover all of them)
+MAX_REPORTED = 200
+# SQLite bound-parameter budget per IN (...) query
+ID_CHUNK = 900
+
+_MASK = re.compile(r'[*xX•]')
+_DAY_FIRST = re.compile(r'(?<!\d)(\d{1,2})[./\-](\d{1,2})[./\-](\d{4})(?!\d)')
+_ISO_DATE = re.compile(r'(?<!\d)(\d{4})-(\d{1,2})-(\d{1,2})(?!\d)')
+
+
+class StatementError(Exception):
+    """Statement file unreadable or without the required columns"""
+
+
+# ==================== PARSING ====================
+
+def find_statement_header(first_rows: List[tuple]) -> Tuple[int, Dict[str, int]]:
+    """(header row number, field -> 0-based column) or (0, {}) when no header is recognised"""
+    for row_idx, row in enumerate(first_rows[:10], 1):
+        col_map: Dict[str, int] = {}
+        for col_idx, cell_value in enumerate(row):
+            if cell_value is None:
+                continue
+            cell = str(cell_value).lower().strip()
+            for field, patterns in STATEMENT_HEADER_MAP.items():
+                if field in col_map:
+                    continue
+                if any(cell == p if len(p) <= 3 else p in cell for p in patterns):
+                    col_map[field] = col_idx
+                    break
+        if all(field in col_map for field in REQUIRED_FIELDS) and ('card_number' in col_map or 'phone' in col_map):
+            return row_idx, col_map
+    return 0, {}
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))  # Excel stores long IDs / card numbers as floats
+    return str(value).strip()
+
+
+def card_key(value: Any) -> Optional[Tuple[str, str]]:
+    """
+    (known leading digits, last 4) of a card number. Fully printed numbers keep
+    every digit as the prefix; masked ones ("8600 12** **** 3456") only the part
+    before the mask.
+    """
+    text = _text(value)
+    digits = re.sub(r'[^0-9]', '', text)
+    if len(digits) < 4:
+        return None
+    mask = _MASK.search(text)
+    prefix = re.sub(r'[^0-9]', '', text[:mask.start()]) if mask else digits
+    return prefix, digits[-4:]
+
+
+def statement_date(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = _text(value)
+    match = _DAY_FIRST.search(text)
+    try:
+        if match:
+            return date(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+        match = _ISO_DATE.search(text)
+        if match:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        pass
+    return None
+
+
+def parse_statement(content: bytes, filename: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Statement file -> transactions [{ref, transaction_id, amount, card, phone, date, name}], errors"""
+    transactions: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    for source in list_plan_sources(content, filename):
+        rows = read_source_rows(source)
+        header_row, col_map = find_statement_header(rows[:10])
+        if not header_row:
+            if source.required:
+                errors.append(f"{source.label}: no statement header (needs transaction ID, amount and card or phone)")
+            continue
+
+        def cell(row, field):
+            col = col_map.get(field)
+            return row[col] if col is not None and col < len(row) else None
+
+        for n, row in enumerate(rows[header_row:], header_row + 1):
+            if not any(v is not None and str(v).strip() for v in row):
+                continue
+            transactions.append({
+                'ref': f"{source.label} row {n}",
+                'transaction_id': _text(cell(row, 'transaction_id')),
+                'amount': clean_amount(cell(row, 'amount')),
+                'card': card_key(cell(row, 'card_number')),
+                'phone': phone9(_text(cell(row, 'phone'))),
+                'date': statement_date(cell(row, 'date')),
+                'name': _text(cell(row, 'name')),
+            })
+    return transactions, errors
+
+
+# ==================== MATCHING ====================
+
+class PlanIndex:
+    """Hash tables over a company's plans for a month: full card, card last 4, phone"""
+
+    def __init__(self, rows):
+        self.plans: Dict[int, Tuple[int, int]] = {}  # id -> (target_amount, paid_total)
+        self.by_card: Dict[str, List[int]] = defaultdict(list)
+        self.by_card_tail: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        self.by_phone: Dict[str, List[int]] = defaultdict(list)
+        for plan_id, card_number, phone_key, target_amount, paid_total in rows:
+            self.plans[plan_id] = (target_amount, paid_total or 0)
+            card = re.sub(r'[^0-9]', '', card_number or '')
+            if len(card) >= 4:
+                self.by_card[card].append(plan_id)
+                self.by_card_tail[card[-4:]].append((card, plan_id))
+            if phone_key:
+                self.by_phone[phone_key].append(plan_id)
+
+    def candidates(self, transaction: Dict[str, Any]) -> Tuple[List[int], Optional[str]]:
+        card = transaction['card']
+        if card:
+            prefix, last4 = card
+            if len(prefix) >= 12:
+                plan_ids = self.by_card.get(prefix, [])
+            else:
+                plan_ids = [plan_id for number, plan_id in self.by_card_tail.get(last4, [])
+                            if number.startswith(prefix)]
+            if plan_ids:
+                return plan_ids, 'card'
+        if transaction['phone'] and transaction['phone'] in self.by_phone:
+            return self.by_phone[transaction['phone']], 'phone'
+        return [], None
+
+    def narrow_by_amount(self, plan_ids: List[int], amount: int) -> List[int]:
+        """Plans whose target - or what is still owed - equals the amount"""
+        exact = [p for p in plan_ids if self.plans[p][0] == amount]
+        if exact:
+            return exact
+        return [p for p in plan_ids if self.plans[p][0] - self.plans[p][1] == amount]
+
+
+def _existing_transaction_ids(db: Session, transaction_ids: List[str]) -> set:
+    found = set()
+    for i in range(0, len(transaction_ids), ID_CHUNK):
+        chunk = transaction_ids[i:i + ID_CHUNK]
+        found.update(db.execute(
+            select(payment_table.c.transaction_id).where(payment_table.c.transaction_id.in_(chunk))
+        ).scalars())
+    return found
+
+
+def match_transactions(db: Session, company_name: str, month: int, transactions: List[Dict[str, Any]]):
+    """(matched [(transaction, plan_id, matched_by)], unmatched [(transaction, reason)])"""
+    index = PlanIndex(db.execute(
+        select(plan_table.c.id, plan_table.c.card_number, plan_table.c.phone9,
+               plan_table.c.target_amount, plan_table.c.paid_total)
+        .where(plan_table.c.company == company_name, plan_table.c.month == month)
+    ))
+    already = _existing_transaction_ids(db, sorted({t['transaction_id'] for t in transactions if t['transaction_id']}))
+
+    matched: List[Tuple[Dict[str, Any], int, str]] = []
+    unmatched: List[Tuple[Dict[str, Any], str]] = []
+    seen = set()
+    for transaction in transactions:
+        transaction_id = transaction['transaction_id']
+        if not transaction_id:
+            unmatched.append((transaction, 'no_transaction_id'))
+            continue
+        if transaction_id in already or transaction_id in seen:
+            unmatched.append((transaction, 'duplicate'))
+            continue
+        seen.add(transaction_id)
+        if transaction['amount'] <= 0:
+            unmatched.append((transaction, 'not_a_payment'))
+            continue
+        if transaction['date'] and transaction['date'].month != month:
+            unmatched.append((transaction, 'other_month'))
+            continue
+
+        plan_ids, matched_by = index.candidates(transaction)
+        if len(plan_ids) > 1:
+            plan_ids = index.narrow_by_amount(plan_ids, transaction['amount'])
+            matched_by += '+amount'
+        if len(plan_ids) == 1:
+            matched.append((transaction, plan_ids[0], matched_by))
+        else:
+            unmatched.append((transaction, 'ambiguous' if plan_ids or matched_by else 'no_plan'))
+    return matched, unmatched
+
+
+# ==================== RECORDING ====================
+
+def _payment_row(transaction: Dict[str, Any], plan_id: int, matched_by: str, statement: str,
+                 now: datetime) -> Dict[str, Any]:
+    log = {
+        'source': 'statement', 'statement': statement, 'row': transaction['ref'], 'matched_by': matched_by,
+        'extracted_amount': transaction['amount'], 'extracted_transaction_id': transaction['transaction_id'],
+        'extracted_name': transaction['name'],
+    }
+    paid_on = transaction['date']
+    return {
+        'plan_id': plan_id,
+        'amount_paid': transaction['amount'],
+        'proof_image_path': None,
+        'payment_method': payment_mode('card'),
+        'verified_at': datetime(paid_on.year, paid_on.month, paid_on.day) if paid_on else now,
+        'ai_log_gz': zlib.compress(json.dumps(log, ensure_ascii=False).encode('utf-8'), 6),
+        'transaction_id': transaction['transaction_id'],
+        'image_hash': None,
+        'superseded_by_id': None,
+    }
+
+
+def record_payments(db: Session, matched, statement: str) -> List[int]:
+    """Bulk-insert the matched payments and refresh totals / status of their plans. The caller commits."""
+    now = datetime.utcnow()
+    db.execute(insert(payment_table), [
+        _payment_row(transaction, plan_id, matched_by, statement, now) for transaction, plan_id, matched_by in matched
+    ])
+    plan_ids = sorted({plan_id for _, plan_id, _ in matched})
+    for i in range(0, len(plan_ids), ID_CHUNK):
+        recompute_payment_totals(db, plan_ids[i:i + ID_CHUNK])
+
+    statuses = []
+    for i in range(0, len(plan_ids), ID_CHUNK):
+        for plan_id, target_amount, paid_total in db.execute(
+            select(plan_table.c.id, plan_table.c.target_amount, plan_table.c.paid_total)
+            .where(plan_table.c.id.in_(plan_ids[i:i + ID_CHUNK]))
+        ):
+            statuses.append({'b_id': plan_id, 'v_status': int(status_for_balance(target_amount, paid_total))})
+    db.execute(
+        update(plan_table).where(plan_table.c.id == bindparam('b_id'))
+        .values(status_code=bindparam('v_status'), status_note=None),
+        statuses
+    )
+    return plan_ids
+
+
+def reconcile_statement(db: Session, content: bytes, filename: str, company_name: str, month: int,
+                        dry_run: bool = False, timer=NULL_TIMER) -> Dict[str, Any]:
+    """
+    Parse, match and (unless dry_run) record a statement in one transaction.
+    Returns counts, the matched total and up to MAX_REPORTED unmatched transactions.
+    """
+    with timer.stage("statement_parse"):
+        try:
+            transactions, errors = parse_statement(content, filename)
+        except Exception as e:
+            raise StatementError(f"Could not read statement file: {e}")
+    if not transactions and errors:
+        raise StatementError("; ".join(errors))
+
+    with timer.stage("statement_match"):
+        matched, unmatched = match_transactions(db, company_name, month, transactions)
+
+    plan_ids: List[int] = []
+    if matched and not dry_run:
+        try:
+            with timer.stage("payments_insert"):
+                plan_ids = record_payments(db, matched, filename or 'statement')
+            with timer.stage("db_commit"):
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    matched_by: Dict[str, int] = defaultdict(int)
+    for _, _, method in matched:
+        matched_by[method] += 1
+    reasons: Dict[str, int] = defaultdict(int)
+    for _, reason in unmatched:
+        reasons[reason] += 1
+    return {
+        'success': True,
+        'dry_run': dry_run,
+        'transactions': len(transactions),
+        'matched': len(matched),
+        'matched_amount': sum(t['amount'] for t, _, _ in matched),
+        'matched_by': dict(matched_by),
+        'plans_updated': len(plan_ids),
+        'unmatched_count': len(unmatched),
+        'unmatched_reasons': dict(reasons),
+        'unmatched': [
+            {'row': t['ref'], 'transaction_id': t['transaction_id'], 'amount': t['amount'],
+             'phone': t['phone'], 'card_last4': t['card'][1] if t['card'] else None,
+             'name': t['name'], 'reason': reason}
+            for t, reason in unmatched[:MAX_REPORTED]
+        ],
+        'errors': errors,
+    }
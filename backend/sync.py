@@ -0,0 +1,122 @@
+"""
+Delta Sync
+Every transaction that changes plan rows takes the next value of one counter
+(sync_state) and stamps it on the rows it writes as row_version; deleted rows
+leave a tombstone with that version. A client that remembers the highest
+version it has seen asks for rows with a larger one and gets only what changed.
+
+The counter row is locked from the increment until commit, so versions become
+visible in increasing order and a reader never skips a version that commits
+later. Payments have no version of their own: every payment write also updates
+its plan (paid_total, latest_payment_id), which stamps the plan.
+
+ORM changes to MasterPlan are stamped by a before_flush hook. Core statements
+(bulk imports, rollover) stamp explicitly with transaction_version() and delete
+through delete_plans().
+"""
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, event, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from .access_scope import PlanScope
+from .models import MasterPlan, PlanTombstone, SyncState
+
+plan_table = MasterPlan.__table__
+tombstone_table = PlanTombstone.__table__
+
+# Columns copied into a tombstone (the deleted row's scope)
+TOMBSTONE_COLUMNS = ['company', 'region', 'group_name', 'district', 'month']
+
+
+def current_version(db: Session) -> int:
+    """Highest committed version (what a client has after reading everything now visible)"""
+    return db.execute(select(SyncState.version).where(SyncState.id == 1)).scalar() or 0
+
+
+def transaction_version(db: Session) -> int:
+    """
+    The version for everything this transaction writes: the counter is bumped on
+    first use and the value is reused until commit / rollback.
+    """
+    version = db.info.get('sync_version')
+    if version is None:
+        bumped = db.execute(
+            update(SyncState).where(SyncState.id == 1).values(version=SyncState.version + 1)
+        ).rowcount
+        if not bumped:
+            db.execute(insert(SyncState).values(id=1, version=1))
+        version = db.execute(select(SyncState.version).where(SyncState.id == 1)).scalar()
+        db.info['sync_version'] = version
+    return version
+
+
+def delete_plans(db: Session, *criteria) -> int:
+    """Delete plan rows matching `criteria`, leaving tombstones. The caller commits."""
+    version = transaction_version(db)
+    db.execute(
+        insert(tombstone_table).from_select(
+            ['plan_id'] + TOMBSTONE_COLUMNS + ['row_version'],
+            select(plan_table.c.id, *[plan_table.c[name] for name in TOMBSTONE_COLUMNS], literal(version))
+            .where(*criteria)
+        )
+    )
+    return db.execute(delete(plan_table).where(*criteria)).rowcount
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_plan_versions(session: Session, flush_context, instances) -> None:
+    changed = [obj for obj in session.new if isinstance(obj, MasterPlan)]
+    changed += [
+        obj for obj in session.dirty
+        if isinstance(obj, MasterPlan) and session.is_modified(obj, include_collections=False)
+    ]
+    deleted = [obj for obj in session.deleted if isinstance(obj, MasterPlan)]
+    if not changed and not deleted:
+        return
+    version = transaction_version(session)
+    for plan in changed:
+        plan.row_version = version
+    for plan in deleted:
+        session.add(PlanTombstone(
+            plan_id=plan.id, row_version=version,
+            **{name: getattr(plan, name) for name in TOMBSTONE_COLUMNS}
+        ))
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_version(session: Session) -> None:
+    session.info.pop('sync_version', None)
+
+
+def plan_changes(db: Session, scope: PlanScope, since: int, month: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Rows of `scope` changed after version `since`: {'version', 'reset', 'query',
+    'deleted'}. 'query' is the MasterPlan query for the changed rows (the caller
+    renders it); apply 'deleted' before them, since a plan id can be reused.
+    A `since` ahead of the server (database rebuilt) is answered with everything
+    and reset=True.
+    """
+    # Read the high-water mark first: anything at or below it is already committed
+    version = current_version(db)
+    reset = since > version
+    if reset:
+        since = 0
+
+    query = scope.apply(db.query(MasterPlan))
+    if month:
+        query = query.filter(MasterPlan.month == month)
+    if since:
+        query = query.filter(MasterPlan.row_version > since)
+
+    deleted = []
+    if since:
+        tombstones = scope.apply(db.query(PlanTombstone.plan_id), PlanTombstone).filter(
+            PlanTombstone.row_version > since
+        )
+        if month:
+            tombstones = tombstones.filter(PlanTombstone.month == month)
+        deleted = sorted({plan_id for (plan_id,) in tombstones.all()})
+
+    return {'version': version, 'reset': reset, 'query': query, 'deleted': deleted}
@@ -0,0 +1,129 @@
+"""
+AI Client Breaker Check: Drive the circuit breaker through open -> half-open with
+an in-process transport and make sure a half-open trial always reports back -
+including when the trial call is cancelled (hedge loser, client disconnect) - and
+that bad requests (400) neither reset the failure count nor close the breaker.
+
+Usage:
+    python backend/verify_ai_client.py
+"""
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.ai_client import AIClient, AIClientError, CircuitBreaker
+
+RESET_TIMEOUT = 0.05
+
+
+class ScriptedTransport:
+    """Fails, hangs or answers depending on `mode`"""
+
+    def __init__(self):
+        self.mode = "fail"
+
+    async def __call__(self, model_name, parts, timeout, system_instruction=None):
+        if self.mode == "fail":
+            raise AIClientError("HTTP 503: Service Unavailable", status=503, retryable=True)
+        if self.mode == "hang":
+            await asyncio.sleep(3600)
+        if self.mode == "bad_request":
+            raise AIClientError("HTTP 400: INVALID_ARGUMENT", status=400)
+        return '{"ok": true}'
+
+
+def _client(transport: ScriptedTransport) -> AIClient:
+    return AIClient(transport=transport, max_retries=0, rate_per_second=0, queue_timeout=0.5,
+                    breaker=CircuitBreaker(failure_threshold=1, reset_timeout=RESET_TIMEOUT))
+
+
+async def _open_breaker(client: AIClient) -> None:
+    try:
+        await client.generate(["prompt"])
+    except AIClientError:
+        pass
+    await asyncio.sleep(RESET_TIMEOUT * 2)
+
+
+async def check_cancelled_trial() -> bool:
+    transport = ScriptedTransport()
+    client = _client(transport)
+    await _open_breaker(client)
+
+    transport.mode = "hang"
+    trial = asyncio.create_task(client.generate(["prompt"]))
+    await asyncio.sleep(0.01)
+    if not client.breaker._trial_in_flight:
+        print("❌ cancelled trial: trial call did not take the half-open slot")
+        return False
+    trial.cancel()
+    await asyncio.gather(trial, return_exceptions=True)
+    if client.breaker._trial_in_flight:
+        print(f"❌ cancelled trial: breaker stuck {client.breaker.state} with the trial still held")
+        return False
+
+    transport.mode = "ok"
+    try:
+        await client.generate(["prompt"])
+    except AIClientError as e:
+        print(f"❌ cancelled trial: healthy upstream still rejected ({e})")
+        return False
+    if client.breaker.state != CircuitBreaker.CLOSED:
+        print(f"❌ cancelled trial: breaker {client.breaker.state} after a successful call")
+        return False
+    print("✅ cancelled trial releases the half-open slot")
+    return True
+
+
+async def check_failed_trial() -> bool:
+    transport = ScriptedTransport()
+    client = _client(transport)
+    await _open_breaker(client)
+    try:
+        await client.generate(["prompt"])
+    except AIClientError:
+        pass
+    if client.breaker.state != CircuitBreaker.OPEN or client.breaker._trial_in_flight:
+        print(f"❌ failed trial: breaker {client.breaker.state}, expected open")
+        return False
+    print("✅ failed trial re-opens the breaker")
+    return True
+
+
+async def _call(client: AIClient) -> None:
+    try:
+        await client.generate(["prompt"])
+    except AIClientError:
+        pass
+
+
+async def check_bad_requests() -> bool:
+    transport = ScriptedTransport()
+    client = AIClient(transport=transport, max_retries=0, rate_per_second=0, queue_timeout=0,
+                      breaker=CircuitBreaker(failure_threshold=3, reset_timeout=RESET_TIMEOUT))
+    # 503, 400, 503, 400, 503: three upstream failures in a row as far as the breaker is concerned
+    for mode in ("fail", "bad_request", "fail", "bad_request", "fail"):
+        transport.mode = mode
+        await _call(client)
+    if client.breaker.state != CircuitBreaker.OPEN:
+        print(f"❌ bad requests: 503s mixed with 400s left the breaker {client.breaker.state}")
+        return False
+
+    await asyncio.sleep(RESET_TIMEOUT * 2)
+    transport.mode = "bad_request"
+    await _call(client)
+    if client.breaker.state != CircuitBreaker.HALF_OPEN or client.breaker._trial_in_flight:
+        print(f"❌ bad requests: a 400 trial left the breaker {client.breaker.state}, expected half_open and free")
+        return False
+    print("✅ bad requests neither reset the failure count nor close the breaker")
+    return True
+
+
+async def verify_ai_client() -> bool:
+    results = [await check_cancelled_trial(), await check_failed_trial(), await check_bad_requests()]
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(verify_ai_client()) else 1)
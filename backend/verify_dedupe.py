@@ -0,0 +1,126 @@
+"""
+Duplicate Image Check: Render Click-style payment screenshots from one template
+(only amount, transaction ID and date differ) and make sure the pre-AI duplicate
+gate rejects an exact resubmission - also one recorded by another worker after
+this process loaded its index - but lets the other real payments through, even
+though their perceptual hashes are nearly identical.
+
+Usage:
+    python backend/verify_dedupe.py
+"""
+import asyncio
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# backend.main creates its tables and upload folder on import; keep them in a scratch dir
+SCRATCH = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(SCRATCH, 'dedupe.db')}"
+os.environ["UPLOADS_DIR"] = os.path.join(SCRATCH, "uploads")
+
+from io import BytesIO
+
+from fastapi import HTTPException
+from PIL import Image, ImageDraw, ImageFont
+
+from backend.database import SessionLocal
+from backend.dedupe import dhash, hamming, hash_to_hex, proof_index, DUPLICATE_MAX_DISTANCE
+from backend.main import check_duplicate_image, UPLOADS_DIR
+from backend.metrics import NULL_TIMER
+from backend.models import MasterPlan, Payment, PlanStatus
+
+# (amount, transaction id, date) of three real payments to the same doctor
+PAYMENTS = [
+    ("1 200 000,00 so'm", "ID 4812 7730 1194", "03.12.2025 10:14"),
+    ("850 000,00 so'm", "ID 4812 9051 2267", "11.12.2025 16:42"),
+    ("1 500 000,00 so'm", "ID 4813 0148 7702", "19.12.2025 09:05"),
+]
+
+
+def screenshot(amount: str, transaction_id: str, date: str) -> bytes:
+    """A Click payment confirmation screen as a phone would capture it"""
+    image = Image.new("RGB", (540, 960), (245, 246, 250))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 540, 140), fill=(0, 122, 255))
+    draw.text((30, 50), "CLICK", fill="white", font=ImageFont.load_default(48))
+    draw.ellipse((220, 200, 320, 300), fill=(52, 199, 89))
+    draw.text((170, 330), "To'lov muvaffaqiyatli", fill=(30, 30, 30), font=ImageFont.load_default(22))
+    draw.text((110, 390), amount, fill=(20, 20, 20), font=ImageFont.load_default(38))
+    body = ImageFont.load_default(20)
+    for i, (label, value) in enumerate([("Qabul qiluvchi", "SAIDOVA NILUFAR"),
+                                        ("Karta", "8600 **** **** 4521"),
+                                        ("Tranzaksiya", transaction_id), ("Sana", date)]):
+        draw.text((40, 500 + i * 60), label, fill=(120, 120, 120), font=body)
+        draw.text((280, 500 + i * 60), value, fill=(20, 20, 20), font=body)
+    draw.rounded_rectangle((40, 840, 500, 910), radius=20, fill=(0, 122, 255))
+    buffer = BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def reencoded(content: bytes) -> bytes:
+    buffer = BytesIO()
+    Image.open(BytesIO(content)).convert("RGB").save(buffer, "JPEG", quality=80)
+    return buffer.getvalue()
+
+
+async def _rejected(db, content: bytes) -> bool:
+    try:
+        await check_duplicate_image(db, content, NULL_TIMER)
+    except HTTPException as e:
+        return e.status_code == 400
+    return False
+
+
+async def verify_dedupe() -> bool:
+    shots = [screenshot(*payment) for payment in PAYMENTS]
+    hashes = [dhash(shot) for shot in shots]
+    distances = [hamming(hashes[i], hashes[j]) for i in range(3) for j in range(i + 1, 3)]
+    print(f"ℹ️  Pairwise dHash distances of distinct payments: {distances} "
+          f"(near-match threshold {DUPLICATE_MAX_DISTANCE})")
+
+    db = SessionLocal()
+    try:
+        plan = MasterPlan(company="Synergy", region="NAMANGAN", group_name="A", doctor_name="Saidova Nilufar",
+                          phone="901234567", target_amount=5000000, planned_type="Card", month=12,
+                          status_code=PlanStatus.PENDING)
+        db.add(plan)
+        db.flush()
+        (UPLOADS_DIR / "first.png").write_bytes(shots[0])
+        db.add(Payment(plan_id=plan.id, amount_paid=1200000, proof_image_path="first.png",
+                       payment_method="card", transaction_id="481277301194", image_hash=hash_to_hex(hashes[0])))
+        db.commit()
+        proof_index.reset()
+
+        ok = True
+        cases = [
+            ("exact resubmission is rejected", shots[0], True),
+            ("second payment from the same template passes", shots[1], False),
+            ("third payment from the same template passes", shots[2], False),
+            ("re-encoded copy is left to review, not rejected", reencoded(shots[0]), False),
+        ]
+        for label, content, expect_rejected in cases:
+            if await _rejected(db, content) == expect_rejected:
+                print(f"✅ {label}")
+            else:
+                print(f"❌ {label}")
+                ok = False
+
+        # Another worker records the second payment; this process's tree is already loaded
+        (UPLOADS_DIR / "second.png").write_bytes(shots[1])
+        db.add(Payment(plan_id=plan.id, amount_paid=850000, proof_image_path="second.png",
+                       payment_method="card", transaction_id="481290512267", image_hash=hash_to_hex(hashes[1])))
+        db.commit()
+        if await _rejected(db, shots[1]):
+            print("✅ exact resubmission of another worker's payment is rejected")
+        else:
+            print("❌ exact resubmission of another worker's payment is rejected")
+            ok = False
+        return ok
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(verify_dedupe()) else 1)
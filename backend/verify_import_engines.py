@@ -0,0 +1,163 @@
+"""
+Import Engine Parity Check: Import the same workbooks with the row engine and the
+columnar engine - and the same sheets exported as CSV / Parquet - into fresh
+in-memory databases and compare the resulting master_plan rows (every column,
+ids included) and the reported counts/errors.
+
+Usage:
+    python backend/verify_import_engines.py                   # built-in sample workbooks
+    python backend/verify_import_engines.py plan1.xlsx ...    # plus real plan files
+"""
+import csv
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from io import BytesIO, StringIO
+from datetime import datetime
+
+from openpyxl import Workbook
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models import MasterPlan
+from backend.services import import_plan_file
+
+HEADERS = ['ФИО', 'Регион', 'Район', 'Сумма', 'Форма', 'Место работы', 'Специальность',
+           'Номер телефона', 'Группа', 'МП']
+
+
+def _workbook(rows) -> bytes:
+    wb = Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def _export_text(value) -> str:
+    """Cell as a spreadsheet export writes it (whole floats without '.0')"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _csv(rows, delimiter=',', encoding='utf-8') -> bytes:
+    buffer = StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter)
+    for row in rows:
+        writer.writerow([_export_text(v) for v in row])
+    return buffer.getvalue().encode(encoding)
+
+
+def _parquet(rows) -> bytes:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    header, data = rows[0], rows[1:]
+    # Mixed-type columns as strings, the way a BI export of a messy sheet would type them
+    columns = {
+        name: pa.array([None if i >= len(r) or r[i] is None else _export_text(r[i]) for r in data], pa.string())
+        for i, name in enumerate(header)
+    }
+    buffer = BytesIO()
+    pq.write_table(pa.table(columns), buffer)
+    return buffer.getvalue()
+
+
+def sample_sheets():
+    """name -> sheet rows covering the layouts and messy values seen in real uploads"""
+    messy = [
+        ['Саидова Нилуфар', 'Ташкент (обл)', ' Бектемир ', '1 200 000', 'Карта', 'QVP', 'Терапевт', '+998 (90) 123-45-67', 'a2', 'RM 1'],
+        ['Karimov Aziz', 'г.Ташкент', None, 600000, None, None, None, 901234567, None, None],
+        ['Karimov Aziz', 'Samarqand', 'Urgut', 600000.0, 'Cash', 'ГКБ №1', 'LOR', '90 123 45 67', 'B', 'RM 2'],
+        [None, None, None, None, None, None, None, None, None, None],                   # empty
+        ['ФИО', 'Регион', None, None, None, None, None, None, None, None],             # repeated header
+        [None, 'NAMANGAN', None, '3 000 000 сум', 'Dollar', None, None, None, 'C', None],  # no name, has amount
+        ['Tursunov Bobur', 'Chirchiq sh.', 'Markaz', 'нет', 'Cash', 1, 1.0, None, 1, True],  # odd types
+        ['Юсупова Гулчехра', '  qashqadaryo  ', 'Markaz', -500000, 'Card', 'QVP', 'Pediatr', '998-93-555-00-11', ' b ', 'RM 3'],
+        ['Short Row', 'Bux'],
+        ['Date Cell', 'Nukus', datetime(2025, 12, 1), 100000, 'Cash', None, None, None, 'A', None],
+    ]
+    return {
+        'header': [HEADERS] + messy,
+        'header_after_title_rows': [['Plan December'], [], HEADERS + ['Номер карты']] +
+                                   [row + ['8600 1234 5678 9012'] for row in messy],
+        'headerless': [
+            ['Rahimova Dilnoza', 'Andijon', 'Markaz', 500000, 'Card', 'QVP', 'Терапевт', '901112233', 'A', 'RM 9'],
+        ] + messy,
+        'reordered_columns': [['Phone', 'Amount', 'Doctor', 'Region', 'Group']] +
+                             [[r[7], r[3], r[0], r[1], r[8]] for r in messy if len(r) == 10],
+        'empty': [],
+    }
+
+
+def sample_cases():
+    """name -> (reference xlsx, [(label, engine, content)]) to compare against the row engine"""
+    cases = {}
+    for name, rows in sample_sheets().items():
+        variants = [('columnar', 'columnar', _workbook(rows))]
+        if rows:
+            variants.append(('csv', 'row', _csv(rows)))
+            variants.append(('csv;cp1251', 'row', _csv(rows, ';', 'cp1251')))
+        if rows and name == 'header':
+            try:
+                variants.append(('parquet', 'row', _parquet(rows)))
+            except ImportError:
+                print("⚠️  pyarrow not installed - skipping the Parquet check")
+        cases[name] = (_workbook(rows), variants)
+    return cases
+
+
+def import_rows(content: bytes, engine: str):
+    db_engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=db_engine)
+    db = sessionmaker(bind=db_engine)()
+    try:
+        result = import_plan_file(content, 'Synergy', db, month=12, engine=engine)
+        result.pop('sources', None)  # Per-sheet report of the columnar pipeline
+        columns = [c.name for c in MasterPlan.__table__.columns]
+        rows = [tuple(row) for row in db.execute(
+            MasterPlan.__table__.select().order_by(MasterPlan.__table__.c.id)
+        )]
+        return result, columns, rows
+    finally:
+        db.close()
+        db_engine.dispose()
+
+
+def verify(cases) -> bool:
+    ok = True
+    for name, (reference, variants) in cases.items():
+        row_result, columns, row_rows = import_rows(reference, 'row')
+        for label, engine, content in variants:
+            result, _, rows = import_rows(content, engine)
+            if result != row_result:
+                print(f"❌ {name} [{label}]: results differ\n   row:   {row_result}\n   {label}: {result}")
+                ok = False
+                continue
+            if rows != row_rows:
+                print(f"❌ {name} [{label}]: rows differ")
+                for a, b in zip(row_rows, rows):
+                    if a != b:
+                        diff = {col: (x, y) for col, x, y in zip(columns, a, b) if x != y}
+                        print(f"   id {a[0]}: {diff}")
+                if len(row_rows) != len(rows):
+                    print(f"   row engine: {len(row_rows)} rows, {label}: {len(rows)} rows")
+                ok = False
+                continue
+            print(f"✅ {name} [{label}]: {len(rows)} identical rows")
+    return ok
+
+
+if __name__ == "__main__":
+    cases = sample_cases()
+    for path in sys.argv[1:]:
+        with open(path, 'rb') as f:
+            content = f.read()
+        cases[os.path.basename(path)] = (content, [('columnar', 'columnar', content)])
+    sys.exit(0 if verify(cases) else 1)
@@ -0,0 +1,76 @@
+"""
+Golden Prompt Check: Render the forensic prompt for fixed sample plans and
+compare it byte-for-byte with the pinned files in golden_prompts/
+
+Usage:
+    python backend/verify_prompts.py            # check
+    python backend/verify_prompts.py --update   # re-pin after an intentional prompt change
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models import MasterPlan
+from backend.prompts import build_forensic_prompt, SYSTEM_INSTRUCTIONS
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden_prompts')
+
+# name -> (plan, payment_method)
+CASES = {
+    'uzs_card': (
+        MasterPlan(doctor_name="Саидова Нилуфар", phone="901234567", target_amount=1200000,
+                   planned_type="Card", month=12),
+        "card"
+    ),
+    'uzs_cash': (
+        MasterPlan(doctor_name="Karimov Aziz", phone="809039992", target_amount=3000000,
+                   planned_type="Cash", month=11),
+        "cash"
+    ),
+    'usd_cash': (
+        MasterPlan(doctor_name="Rahimova Dilnoza", phone="", target_amount=150,
+                   planned_type="Dollar", month=1),
+        "cash"
+    ),
+    'unknown_month_no_phone': (
+        MasterPlan(doctor_name="Unknown", phone=None, target_amount=0,
+                   planned_type="Cash", month=13),
+        "cash"
+    ),
+}
+
+
+def verify_prompts(update: bool = False) -> bool:
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    ok = True
+
+    # Static prefix must not contain anything plan-specific
+    for currency, text in SYSTEM_INSTRUCTIONS.items():
+        if '{' in text.split('OUTPUT STRICTLY AS JSON')[0]:
+            print(f"❌ {currency} system instruction contains an unrendered placeholder")
+            ok = False
+
+    for name, (plan, payment_method) in CASES.items():
+        rendered = build_forensic_prompt(plan, payment_method).full_text()
+        path = os.path.join(GOLDEN_DIR, f'{name}.txt')
+        if update:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(rendered)
+            print(f"📝 Pinned {name}")
+            continue
+        if not os.path.exists(path):
+            print(f"❌ {name}: golden file missing (run with --update)")
+            ok = False
+            continue
+        with open(path, encoding='utf-8') as f:
+            expected = f.read()
+        if rendered == expected:
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}: rendered prompt differs from {path}")
+            ok = False
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_prompts(update='--update' in sys.argv) else 1)
@@ -3,6 +3,7 @@ import { StatsCard } from './StatsCard';
 import { User } from '../services/authService';
 import { Company } from '../types';
 import { apiGet, apiPostFormData, apiPutFormData, apiPost, getStaticUrl } from '../services/api';
+import { subscribeToPlanEvents, applyPlanEvent } from '../services/dataService';
 import { useLanguage } from '../context/LanguageContext';
 import {
   DollarSign, AlertCircle, CheckCircle2, FileSpreadsheet, LayoutDashboard,
@@ -141,6 +142,20 @@ export const AdminDashboard: React.FC<AdminDashboardProps> = ({ user, currentCom
     }
   }, [auditRegion, auditGroup]);
 
+  // Live updates for the live view and correction lists
+  useEffect(() => {
+    return subscribeToPlanEvents({
+      onPlan: (event) => {
+        setLiveData(prev => applyPlanEvent(prev, event));
+        setCorrectionData(prev => applyPlanEvent(prev, event));
+      },
+      onReload: () => {
+        if (activeTab === 'live' && liveRegion && liveGroup) loadLiveData();
+        if (activeTab === 'correction' && correctionRegion) loadCorrectionData();
+      },
+    }, selectedMonth, selectedCompany);
+  }, [selectedCompany, selectedMonth, activeTab, liveRegion, liveGroup, correctionRegion, correctionGroup]);
+
   // Load regions and groups for filters
   useEffect(() => {
     loadFilters();
@@ -161,12 +176,12 @@ export const AdminDashboard: React.FC<AdminDashboardProps> = ({ user, currentCom
   const loadDashboardData = async () => {
     setDashboardLoading(true);
     try {
-      const [statsData, leaderboardData] = await Promise.all([
-        apiGet<AdminStats>(`/admin/stats?company=${selectedCompany}&month=${selectedMonth}`),
-        apiGet<LeaderboardItem[]>(`/admin/leaderboard?company=${selectedCompany}&month=${selectedMonth}`)
-      ]);
-      setStats(statsData);
-      setLeaderboard(leaderboardData);
+      // Totals and leaderboard in one request (one query on the server)
+      const bundle = await apiGet<{ stats: AdminStats; leaderboard: LeaderboardItem[] }>(
+        `/admin/dashboard?company=${selectedCompany}&month=${selectedMonth}&sections=stats,leaderboard`
+      );
+      setStats(bundle.stats);
+      setLeaderboard(bundle.leaderboard);
     } catch (err: any) {
       setError(err.message || 'Failed to load dashboard data');
     } finally {
@@ -268,6 +283,7 @@ export const AdminDashboard: React.FC<AdminDashboardProps> = ({ user, currentCom
 
       setSuccessMsg('✅ Payment updated successfully');
       setEditingId(null);
+      // Don't rely on the live stream for our own edit (a proxy may buffer /events)
       loadCorrectionData();
     } catch (err: any) {
       setError(err.message || 'Failed to update payment');
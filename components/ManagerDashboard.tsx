@@ -1,6 +1,6 @@
 import React, { useEffect, useState, useRef } from 'react';
 import { StatsCard } from './StatsCard';
-import { getManagerDoctors, verifyPayment, DoctorFromAPI } from '../services/dataService';
+import { getManagerDoctorChanges, applyDoctorChanges, verifyPayment, verifyPaymentAuto, DoctorFromAPI, subscribeToPlanEvents, applyPlanEvent } from '../services/dataService';
 import { User } from '../services/authService';
 import { DollarSign, ListChecks, PieChart, Upload, Search, CheckCircle, AlertTriangle, FileText, Smartphone, Loader2, Calendar } from 'lucide-react';
 
@@ -59,12 +59,24 @@ export const ManagerDashboard: React.FC<ManagerDashboardProps> = ({ user }) => {
     loadDoctors();
   }, [selectedMonth]);
 
+  // Live updates: patch changed rows in place instead of re-fetching the list
+  useEffect(() => {
+    return subscribeToPlanEvents({
+      onPlan: (event) => setDoctors(prev => applyPlanEvent(prev, event)),
+      onReload: () => syncDoctors(),
+    }, selectedMonth);
+  }, [selectedMonth]);
+
+  // Highest sync version applied to `doctors`
+  const syncVersionRef = useRef(0);
+
   const loadDoctors = async () => {
     try {
       setIsLoading(true);
       setError('');
-      const data = await getManagerDoctors(selectedMonth);
-      setDoctors(data);
+      const changes = await getManagerDoctorChanges(0, selectedMonth);
+      syncVersionRef.current = changes.version;
+      setDoctors(changes.upserted);
       // Reset selected doctor when month changes
       setSelectedDoctorId(null);
     } catch (err: any) {
@@ -74,6 +86,17 @@ export const ManagerDashboard: React.FC<ManagerDashboardProps> = ({ user }) => {
     }
   };
 
+  // Fetch only the rows changed since the last load
+  const syncDoctors = async () => {
+    try {
+      const changes = await getManagerDoctorChanges(syncVersionRef.current, selectedMonth);
+      syncVersionRef.current = changes.version;
+      setDoctors(prev => applyDoctorChanges(prev, changes));
+    } catch (err: any) {
+      setError(err.message || 'Failed to load doctors');
+    }
+  };
+
   // Calculate stats
   const stats = {
     myTotalBudget: doctors.reduce((acc, curr) => acc + curr.target_amount, 0),
@@ -96,21 +119,25 @@ export const ManagerDashboard: React.FC<ManagerDashboardProps> = ({ user }) => {
 
   // Handle verification
   const handleVerify = async () => {
-    if (!selectedDoctorId || !verificationFile) return;
+    if (!verificationFile) return;
 
     setIsAnalyzing(true);
     setAnalysisResult(null);
 
     try {
-      const result = await verifyPayment(verificationFile, selectedDoctorId, paymentMethod);
+      // No doctor chosen: the server matches the receipt's phone to one of our plans
+      const result = selectedDoctorId
+        ? await verifyPayment(verificationFile, selectedDoctorId, paymentMethod)
+        : await verifyPaymentAuto(verificationFile, paymentMethod, selectedMonth);
 
+      const matched = result.plan_id ? doctors.find(d => d.id === result.plan_id) : undefined;
       setAnalysisResult({
         success: true,
-        message: result.message
+        message: matched ? `${matched.doctor_name}: ${result.message}` : result.message
       });
 
-      // Reload doctors to get updated status
-      await loadDoctors();
+      // Pull our own change now; the live stream may be buffered or reconnecting
+      await syncDoctors();
 
       // Reset form
       setSelectedDoctorId(null);
@@ -249,7 +276,7 @@ export const ManagerDashboard: React.FC<ManagerDashboardProps> = ({ user }) => {
               <select
                 className="w-full rounded-lg border-slate-300 border p-2.5 text-sm focus:ring-2 focus:ring-indigo-500 outline-none"
                 value={selectedDoctorId || ''}
-                onChange={(e) => setSelectedDoctorId(Number(e.target.value))}
+                onChange={(e) => setSelectedDoctorId(e.target.value ? Number(e.target.value) : null)}
               >
                 <option value="">{t('chooseDoctor')}</option>
                 {sortedDropdown.map(d => (
@@ -301,9 +328,9 @@ export const ManagerDashboard: React.FC<ManagerDashboardProps> = ({ user }) => {
 
             <button
               onClick={handleVerify}
-              disabled={!selectedDoctorId || !verificationFile || isAnalyzing}
+              disabled={!verificationFile || isAnalyzing}
               className={`w-full py-3 rounded-lg font-medium text-white shadow-sm flex items-center justify-center space-x-2
-                  ${(!selectedDoctorId || !verificationFile || isAnalyzing) ? 'bg-slate-400 cursor-not-allowed' : 'bg-indigo-600 hover:bg-indigo-700'}`}
+                  ${(!verificationFile || isAnalyzing) ? 'bg-slate-400 cursor-not-allowed' : 'bg-indigo-600 hover:bg-indigo-700'}`}
             >
               {isAnalyzing ? (
                 <>
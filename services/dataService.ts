@@ -3,7 +3,7 @@
  * Handles all data operations with the Backend API
  */
 
-import { apiGet, apiPostFormData, API_BASE_URL, getStaticUrl } from './api';
+import { apiGet, apiPost, apiPostFormData, API_BASE_URL, getStaticUrl } from './api';
 import { MasterPlanItem, DashboardStats, ManagerPermission } from '../types';
 
 // ==================== LOCAL STORAGE KEYS ====================
@@ -28,8 +28,10 @@ export interface DoctorFromAPI {
   planned_type: string;
   month: number;
   status: string;
+  status_code?: string;  // 'pending', 'verified', ... (stable key of `status`)
   proof_image?: string;  // Path to proof image (if verified)
   amount_paid?: number;  // Amount paid (for stats calculation)
+  payment_count?: number;
 }
 
 export interface VerifyResult {
@@ -37,6 +39,9 @@ export interface VerifyResult {
   message: string;
   extracted_amount: number;
   new_status: string;
+  review_id?: number | null;
+  plan_id?: number | null;     // verifyPaymentAuto: the plan the receipt was matched to
+  matched_by?: string | null;  // 'phone', 'last4', 'phone+name' or 'last4+name'
 }
 
 export interface AdminStats {
@@ -158,6 +163,33 @@ export const getManagerDoctors = async (month?: number): Promise<DoctorFromAPI[]
   return apiGet<DoctorFromAPI[]>(endpoint);
 };
 
+export interface DoctorChanges {
+  version: number;
+  reset: boolean;
+  upserted: DoctorFromAPI[];
+  deleted: number[];
+}
+
+/**
+ * Rows changed since `since` (0 = everything) and the version to ask from next time
+ * @param since - Highest version already applied
+ * @param month - Optional month filter (1-12)
+ */
+export const getManagerDoctorChanges = async (since: number, month?: number): Promise<DoctorChanges> => {
+  let endpoint = `/manager/doctors/changes?since=${since}`;
+  if (month) {
+    endpoint += `&month=${month}`;
+  }
+  return apiGet<DoctorChanges>(endpoint);
+};
+
+/** Apply a delta to a loaded list: deletes first (ids can be reused), then upserts */
+export const applyDoctorChanges = (rows: DoctorFromAPI[], changes: DoctorChanges): DoctorFromAPI[] => {
+  if (changes.reset) return changes.upserted;
+  const changed = new Set([...changes.deleted, ...changes.upserted.map(d => d.id)]);
+  return [...rows.filter(d => !changed.has(d.id)), ...changes.upserted].sort((a, b) => a.id - b.id);
+};
+
 /**
  * Verify a payment using AI
  * @param file - The proof image/PDF
@@ -177,6 +209,118 @@ export const verifyPayment = async (
   return apiPostFormData<VerifyResult>('/manager/verify', formData);
 };
 
+/**
+ * Verify a payment without choosing the doctor: the server matches the phone
+ * on the receipt to one of the manager's plans for the month
+ * @param file - The proof image/PDF
+ * @param paymentMethod - 'Card' or 'Cash'
+ * @param month - Plan month (1-12)
+ */
+export const verifyPaymentAuto = async (
+  file: File,
+  paymentMethod: string,
+  month: number
+): Promise<VerifyResult> => {
+  const formData = new FormData();
+  formData.append('file', file);
+  formData.append('payment_method', paymentMethod);
+  formData.append('month', month.toString());
+
+  return apiPostFormData<VerifyResult>('/manager/verify/auto', formData);
+};
+
+// ==================== LIVE EVENTS ====================
+
+/** A plan's new state, pushed by the server after a verification or correction */
+export interface PlanEvent {
+  plan_id: number;
+  month: number;
+  status: string;
+  status_code: string;
+  amount_paid: number;
+  payment_count: number;
+  proof_image?: string | null;
+}
+
+export interface PlanEventHandlers {
+  onPlan: (event: PlanEvent) => void;
+  /** Import, rollover, or missed events: re-fetch the list */
+  onReload: () => void;
+}
+
+// Wait before reopening a stream the browser gave up on (e.g. its token expired)
+const STREAM_RETRY_MS = 5000;
+
+/**
+ * Open the server-sent events stream (only events this user may see).
+ * The URL carries a short-lived stream token, never the login token. EventSource
+ * reconnects by itself and resumes from the last event id; once it gives up,
+ * the stream is reopened with a fresh token and the list is re-fetched.
+ * @param month - Optional month filter (1-12)
+ * @param company - Admins: only this company
+ * @returns a function that closes the stream
+ */
+export const subscribeToPlanEvents = (
+  handlers: PlanEventHandlers,
+  month?: number,
+  company?: string
+): (() => void) => {
+  let source: EventSource | null = null;
+  let retryTimer: ReturnType<typeof setTimeout> | undefined;
+  let closed = false;
+
+  const retry = () => {
+    if (!closed) retryTimer = setTimeout(() => open(true), STREAM_RETRY_MS);
+  };
+
+  const open = async (reopened: boolean) => {
+    let streamToken: string;
+    try {
+      streamToken = (await apiPost<{ stream_token: string }>('/events/token', {})).stream_token;
+    } catch {
+      retry();
+      return;
+    }
+    if (closed) return;
+
+    const params = new URLSearchParams({ access_token: streamToken });
+    if (month) params.append('month', month.toString());
+    if (company) params.append('company', company);
+
+    source = new EventSource(`${API_BASE_URL}/events?${params.toString()}`);
+    source.addEventListener('plan', (e) => handlers.onPlan(JSON.parse((e as MessageEvent).data)));
+    source.addEventListener('reload', () => handlers.onReload());
+    source.addEventListener('resync', () => handlers.onReload());
+    // A new stream cannot replay what was missed in between
+    if (reopened) source.addEventListener('open', () => handlers.onReload(), { once: true });
+    source.onerror = () => {
+      if (source?.readyState === EventSource.CLOSED) retry();
+    };
+  };
+
+  open(false);
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    source?.close();
+  };
+};
+
+/** Apply a plan event to a loaded list (rows not in the list are ignored) */
+export const applyPlanEvent = <T extends { id: number }>(rows: T[], event: PlanEvent): T[] =>
+  rows.map(row => row.id === event.plan_id
+    ? {
+      ...row,
+      month: event.month,
+      status: event.status,
+      status_code: event.status_code,
+      amount_paid: event.amount_paid,
+      payment_count: event.payment_count,
+      proof_image: event.proof_image ?? undefined,
+    }
+    : row
+  );
+
 // ==================== ADMIN API FUNCTIONS ====================
 
 /**
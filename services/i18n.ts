@@ -31,7 +31,7 @@ export const translations = {
         // Verification Section
         paymentVerification: "Payment Verification (AI Forensic Scan)",
         selectDoctor: "Select Doctor",
-        chooseDoctor: "-- Choose Doctor to Verify --",
+        chooseDoctor: "-- Match doctor from receipt (auto) --",
         paymentMethod: "Payment Method",
         cardClick: "Card / Click",
         cashReceipt: "Cash / Receipt",
@@ -145,7 +145,7 @@ export const translations = {
         // Verification Section
         paymentVerification: "To'lovni tasdiqlash (AI Forensik tahlil)",
         selectDoctor: "Shifokorni tanlang",
-        chooseDoctor: "-- Tasdiqlash uchun shifokorni tanlang --",
+        chooseDoctor: "-- Shifokorni chekdan aniqlash (avto) --",
         paymentMethod: "To'lov usuli",
         cardClick: "Karta / Click",
         cashReceipt: "Naqd / Chek",
@@ -259,7 +259,7 @@ export const translations = {
         // Verification Section
         paymentVerification: "Подтверждение оплаты (AI сканирование)",
         selectDoctor: "Выберите врача",
-        chooseDoctor: "-- Выберите врача для проверки --",
+        chooseDoctor: "-- Определить врача по чеку (авто) --",
         paymentMethod: "Метод оплаты",
         cardClick: "Карта / Click",
         cashReceipt: "Наличные / Чек",